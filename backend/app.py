@@ -1,5 +1,6 @@
 import os
 import ssl
+import click
 from flask import Flask
 from flask_cors import CORS
 from dotenv import load_dotenv
@@ -61,16 +62,21 @@ def create_app():
     app.config['JWT_ACCESS_TOKEN_EXPIRES'] = False  # Tokens don't expire
     
     # Enhanced SQLAlchemy configuration for connection stability
-    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
-        'pool_size': 10,
-        'pool_recycle': 120,  # Recycle connections every 2 minutes
-        'pool_pre_ping': True,  # Verify connections before use
-        'pool_reset_on_return': 'commit',
-        'connect_args': {
-            'connect_timeout': 10,
-            'application_name': 'journal_app'
+    if database_url and database_url.startswith('sqlite'):
+        # SQLite takes its own options; pragmas are applied on connect below
+        from services import sqlite_profile
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = sqlite_profile.engine_options()
+    else:
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+            'pool_size': 10,
+            'pool_recycle': 120,  # Recycle connections every 2 minutes
+            'pool_pre_ping': True,  # Verify connections before use
+            'pool_reset_on_return': 'commit',
+            'connect_args': {
+                'connect_timeout': 10,
+                'application_name': 'journal_app'
+            }
         }
-    }
     
     # Add PostgreSQL-specific connection args if using PostgreSQL
     if database_url and database_url.startswith('postgresql'):
@@ -96,6 +102,9 @@ def create_app():
     bcrypt.init_app(app)
     jwt.init_app(app)
     
+    if database_url and database_url.startswith('sqlite'):
+        sqlite_profile.init_app(app, db)
+    
     @app.teardown_appcontext
     def cleanup_db_session(error):
         """Clean up database session after each request"""
@@ -130,6 +139,25 @@ def create_app():
     with app.app_context():
         db.create_all()
     
+    # Background embedding pipeline: the workers start with the first request
+    from services.embedding_worker import embedding_worker
+    embedding_worker.init_app(app)
+    
+    @app.cli.command('backfill-chunks')
+    @click.option('--drain', is_flag=True, help='Embed the queued entries now instead of leaving them to the workers')
+    def backfill_chunks(drain):
+        """Queue already-embedded entries that have no chunk embeddings yet"""
+        queued = embedding_worker.queue_missing_chunks()
+        print(f"🧩 Queued {queued} entries for chunk embeddings")
+        if drain:
+            processed = 0
+            while True:
+                batch = embedding_worker.process_batch()
+                if not batch:
+                    break
+                processed += batch
+            print(f"🧩 Processed {processed} entries")
+    
     # Register blueprints
     from routes.auth_routes import auth_bp
     from routes.entry_routes import entry_bp
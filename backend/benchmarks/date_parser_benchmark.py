@@ -0,0 +1,81 @@
+"""
+Accuracy and latency benchmark for the local date-expression parser.
+
+Runs every query in date_parser_corpus.json against a fixed "today" and checks
+the parsed range, the "no date filter" short circuit, or the hand-off to the
+LLM. Then times the parser over the corpus and reports how many AI searches
+would skip the LLM date-extraction round trip.
+
+Usage:
+    python benchmarks/date_parser_benchmark.py [--iterations 200] [--verbose]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import date
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.date_parser import extract_date_filter  # noqa: E402
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'date_parser_corpus.json')
+
+
+def outcome(result):
+    if result is None:
+        return 'llm'
+    if not result['has_date_filter']:
+        return 'none'
+    return (result['start_date'], result['end_date'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', default=CORPUS)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--verbose', action='store_true', help='Print every case, not only failures')
+    args = parser.parse_args()
+
+    with open(args.corpus) as f:
+        corpus = json.load(f)
+    today = date.fromisoformat(corpus['today'])
+    cases = corpus['cases']
+
+    failures = 0
+    outcomes = {'range': 0, 'none': 0, 'llm': 0}
+    for case in cases:
+        expected = case.get('expect') or (case['start'], case['end'])
+        actual = outcome(extract_date_filter(case['query'], today))
+        outcomes['range' if isinstance(actual, tuple) else actual] += 1
+        ok = actual == expected
+        failures += not ok
+        if args.verbose or not ok:
+            print(f"{'ok  ' if ok else 'FAIL'} {case['query']!r:50} expected={expected} actual={actual}")
+
+    print(f"\nAccuracy: {len(cases) - failures}/{len(cases)} ({(len(cases) - failures) / len(cases):.1%})")
+    print(
+        f"Resolved locally: {outcomes['range']} with a date range, {outcomes['none']} with no date filter; "
+        f"{outcomes['llm']} deferred to the LLM ({(outcomes['range'] + outcomes['none']) / len(cases):.1%} skip the LLM call)"
+    )
+
+    latencies = []
+    for _ in range(args.iterations):
+        for case in cases:
+            started = time.perf_counter()
+            extract_date_filter(case['query'], today)
+            latencies.append((time.perf_counter() - started) * 1e6)
+    latencies = np.array(latencies)
+    print(
+        f"Latency over {len(latencies)} parses: mean {latencies.mean():.1f}us, "
+        f"p50 {np.percentile(latencies, 50):.1f}us, p95 {np.percentile(latencies, 95):.1f}us, "
+        f"{1e6 / latencies.mean():,.0f} queries/s"
+    )
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
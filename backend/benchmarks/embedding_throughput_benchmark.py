@@ -0,0 +1,104 @@
+"""
+Throughput benchmark: per-text embedding loop vs the batch embedding API.
+
+Embeds the same synthetic journal texts three ways, bypassing the embedding
+cache: one request per text in a loop (the old backfill behaviour), the
+chunked concurrent fallback (one text per request, EMBEDDING_REQUEST_CONCURRENCY
+in flight), and the provider's native batch requests where it has them.
+
+Without a provider, a simulated one sleeps --latency-ms per request plus
+--per-text-ms per text, which is roughly how hosted embedding endpoints behave.
+
+Usage:
+    python benchmarks/embedding_throughput_benchmark.py --texts 500
+    LLM_PROVIDER=gemini GOOGLE_AI_API_KEY=... python benchmarks/embedding_throughput_benchmark.py --provider gemini --texts 200
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.llm_service import LLMFactory, LLMProvider  # noqa: E402
+
+WORDS = (
+    'today went walk work coffee friends family dinner morning evening read book '
+    'call meeting gym tired happy weekend rain park music cooked lunch office'
+).split()
+
+
+class SimulatedProvider(LLMProvider):
+    """Fixed request latency plus a small per-text cost; batches up to 100 texts per request"""
+
+    provider_name = 'simulated'
+    embedding_batch_size = 100
+
+    def __init__(self, latency_ms: float, per_text_ms: float, native_batch: bool = True):
+        self.latency = latency_ms / 1000
+        self.per_text = per_text_ms / 1000
+        if not native_batch:
+            self.embedding_batch_size = 1
+
+    def generate_text(self, prompt: str) -> str:
+        return ''
+
+    def _extract_date_filter(self, query: str):
+        return {'has_date_filter': False}
+
+    def _generate_embedding(self, text: str):
+        return self._embed_batch([text])[0]
+
+    def _embed_batch(self, texts):
+        time.sleep(self.latency + self.per_text * len(texts))
+        return [[float(len(text))] * 768 for text in texts]
+
+
+def synthetic_texts(count: int, seed: int):
+    rng = np.random.default_rng(seed)
+    return [' '.join(rng.choice(WORDS, size=int(rng.integers(20, 120)))) for _ in range(count)]
+
+
+def measure(label: str, embed, texts, baseline=None):
+    started = time.perf_counter()
+    embeddings = embed(texts)
+    elapsed = time.perf_counter() - started
+    assert len(embeddings) == len(texts)
+    rate = len(texts) / elapsed
+    speedup = f'{rate / baseline:>8.1f}x' if baseline else f'{"1.0x":>9}'
+    print(f'{label:<28}{elapsed:>10.2f}{rate:>12.1f}{speedup}')
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--provider', help='Benchmark a real provider (gemini, groq, ...) instead of the simulated one')
+    parser.add_argument('--texts', type=int, default=300)
+    parser.add_argument('--latency-ms', type=float, default=80, help='Simulated per-request latency')
+    parser.add_argument('--per-text-ms', type=float, default=0.5, help='Simulated per-text cost')
+    parser.add_argument('--seed', type=int, default=11)
+    args = parser.parse_args()
+
+    texts = synthetic_texts(args.texts, args.seed)
+    if args.provider:
+        provider = LLMFactory.create_provider(args.provider, require_text=False)
+        fallback = None
+    else:
+        provider = SimulatedProvider(args.latency_ms, args.per_text_ms)
+        fallback = SimulatedProvider(args.latency_ms, args.per_text_ms, native_batch=False)
+
+    print(f'{len(texts)} texts, provider {provider.provider_name}, '
+          f'batch size {provider.embedding_batch_size}, concurrency {provider.embedding_concurrency}\n')
+    print(f'{"strategy":<28}{"seconds":>10}{"texts/s":>12}{"speedup":>9}')
+    baseline = measure('per-text loop', lambda items: [provider._generate_embedding(text) for text in items], texts)
+    if fallback is not None:
+        measure('chunked concurrent fallback', fallback._generate_embeddings, texts, baseline)
+    if provider.embedding_batch_size > 1:
+        measure('native batch', provider._generate_embeddings, texts, baseline)
+    elif fallback is None:
+        measure('chunked concurrent fallback', provider._generate_embeddings, texts, baseline)
+
+
+if __name__ == '__main__':
+    main()
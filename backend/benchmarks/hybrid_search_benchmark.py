@@ -0,0 +1,166 @@
+"""
+Latency/recall benchmark: vector-only vs hybrid (full-text + vector, RRF) search.
+
+Builds a synthetic corpus in a scratch table where every row mentions one rare
+word (a stand-in for names like "Priya" or "dentist") among common filler
+words. Each query asks for one target row by its rare word, with an embedding
+that is only loosely related to the target's, which is the case where vector
+search alone misses. Reports hit@k for the target and p50/p95 latency of the
+same statements DatabaseService runs.
+
+Usage (PostgreSQL with the vector extension required):
+    DATABASE_URL=postgresql://... python benchmarks/hybrid_search_benchmark.py --rows 50000
+"""
+import argparse
+import os
+import time
+import numpy as np
+from sqlalchemy import create_engine, text
+
+DIMENSIONS = 768
+TABLE = 'bench_hybrid_search'
+FILLER = (
+    'today went walk work coffee friends family dinner morning evening read book '
+    'call meeting gym tired happy weekend rain park music cooked lunch office'
+).split()
+
+VECTOR_ONLY = f"""
+SELECT id FROM {TABLE}
+WHERE user_id = :user_id
+ORDER BY embedding_vector <=> CAST(:embedding AS vector)
+LIMIT :k
+"""
+
+HYBRID = f"""
+WITH vector_ranked AS (
+    SELECT id, row_number() OVER (ORDER BY embedding_vector <=> CAST(:embedding AS vector)) AS rank
+    FROM {TABLE}
+    WHERE user_id = :user_id
+    ORDER BY embedding_vector <=> CAST(:embedding AS vector)
+    LIMIT :candidates
+), keyword_ranked AS (
+    SELECT id, row_number() OVER (ORDER BY ts_rank_cd(content_tsv, to_tsquery('english', :terms)) DESC) AS rank
+    FROM {TABLE}
+    WHERE user_id = :user_id AND content_tsv @@ to_tsquery('english', :terms)
+    ORDER BY ts_rank_cd(content_tsv, to_tsquery('english', :terms)) DESC
+    LIMIT :candidates
+)
+SELECT coalesce(v.id, k.id) AS id,
+       coalesce(1.0 / (:rrf_k + v.rank), 0) + coalesce(1.0 / (:rrf_k + k.rank), 0) AS score
+FROM vector_ranked v FULL OUTER JOIN keyword_ranked k ON v.id = k.id
+ORDER BY score DESC
+LIMIT :k
+"""
+
+
+def synthetic_corpus(rows: int, clusters: int, seed: int):
+    """Clustered unit vectors plus content with filler words and one rare word per row"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, DIMENSIONS)).astype(np.float32)
+    assignments = rng.integers(0, clusters, size=rows)
+    vectors = centers[assignments] + 0.35 * rng.normal(size=(rows, DIMENSIONS)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    contents = [
+        ' '.join(list(rng.choice(FILLER, size=30)) + [f'rare{i}'])
+        for i in range(rows)
+    ]
+    return vectors, contents
+
+
+def to_literal(vector: np.ndarray) -> str:
+    return '[' + ','.join(f'{x:.6f}' for x in vector) + ']'
+
+
+def load_corpus(engine, vectors: np.ndarray, contents, users: int):
+    with engine.begin() as conn:
+        conn.execute(text('CREATE EXTENSION IF NOT EXISTS vector'))
+        conn.execute(text(f'DROP TABLE IF EXISTS {TABLE}'))
+        conn.execute(text(
+            f'CREATE TABLE {TABLE} (id serial PRIMARY KEY, user_id integer NOT NULL, '
+            f'content text NOT NULL, embedding_vector vector({DIMENSIONS}) NOT NULL, '
+            f"content_tsv tsvector GENERATED ALWAYS AS (to_tsvector('english', content)) STORED)"
+        ))
+        batch = 1000
+        for offset in range(0, len(vectors), batch):
+            conn.execute(
+                text(f'INSERT INTO {TABLE} (user_id, content, embedding_vector) VALUES (:user_id, :content, :embedding)'),
+                [
+                    {'user_id': (offset + i) % users, 'content': contents[offset + i], 'embedding': to_literal(vector)}
+                    for i, vector in enumerate(vectors[offset:offset + batch])
+                ]
+            )
+        conn.execute(text(f'CREATE INDEX ON {TABLE} (user_id)'))
+
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        conn.execute(text(
+            f'CREATE INDEX ON {TABLE} USING hnsw (embedding_vector vector_cosine_ops) '
+            'WITH (m = 16, ef_construction = 64)'
+        ))
+        conn.execute(text(f'CREATE INDEX ON {TABLE} USING gin (content_tsv)'))
+        conn.execute(text(f'ANALYZE {TABLE}'))
+    print(f'Built HNSW and GIN indexes over {len(vectors)} rows in {time.perf_counter() - started:.1f}s')
+
+
+def run_queries(engine, statement, queries, params):
+    """Run every query in its own transaction; returns ranked ids and latencies"""
+    results, latencies = [], []
+    for embedding, terms in queries:
+        with engine.begin() as conn:
+            conn.execute(text(f'SET LOCAL hnsw.ef_search = {params["ef_search"]}'))
+            started = time.perf_counter()
+            rows = conn.execute(text(statement), dict(params, embedding=to_literal(embedding), terms=terms)).all()
+            latencies.append((time.perf_counter() - started) * 1000)
+        results.append([row.id for row in rows])
+    return results, np.array(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', default=os.getenv('DATABASE_URL'))
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--queries', type=int, default=100)
+    parser.add_argument('--clusters', type=int, default=50)
+    parser.add_argument('--users', type=int, default=1, help='Spread rows over N users and filter by one')
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--candidates', type=int, default=50, help='Candidates per ranking before fusion')
+    parser.add_argument('--rrf-k', type=int, default=60)
+    parser.add_argument('--ef-search', type=int, default=40)
+    parser.add_argument('--query-noise', type=float, default=1.5,
+                        help='Noise mixed into the target embedding; higher means vector search alone misses more')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--keep', action='store_true', help='Keep the scratch table afterwards')
+    args = parser.parse_args()
+
+    if not args.database_url or not args.database_url.startswith('postgresql'):
+        parser.error('A PostgreSQL DATABASE_URL with pgvector is required')
+
+    engine = create_engine(args.database_url)
+    vectors, contents = synthetic_corpus(args.rows, args.clusters, args.seed)
+    load_corpus(engine, vectors, contents, args.users)
+
+    # Targets belong to user 0, the user every query filters on
+    rng = np.random.default_rng(args.seed + 1)
+    targets = rng.choice(np.arange(0, args.rows, args.users), size=args.queries, replace=False)
+    queries = []
+    for target in targets:
+        embedding = vectors[target] + args.query_noise * rng.normal(size=DIMENSIONS).astype(np.float32) / np.sqrt(DIMENSIONS)
+        terms = ' | '.join([f'rare{target}'] + list(rng.choice(FILLER, size=2)))
+        queries.append((embedding / np.linalg.norm(embedding), terms))
+    params = {'user_id': 0, 'k': args.k, 'candidates': args.candidates, 'rrf_k': args.rrf_k, 'ef_search': args.ef_search}
+
+    try:
+        print(f'\n{"search":<16}{"hit@" + str(args.k):>10}{"p50 ms":>10}{"p95 ms":>10}')
+        for label, statement in (('vector only', VECTOR_ONLY), ('hybrid (RRF)', HYBRID)):
+            results, latency = run_queries(engine, statement, queries, params)
+            # serial ids start at 1
+            hit_rate = np.mean([target + 1 in found for target, found in zip(targets, results)])
+            print(f'{label:<16}{hit_rate:>10.3f}{np.percentile(latency, 50):>10.2f}{np.percentile(latency, 95):>10.2f}')
+    finally:
+        if not args.keep:
+            with engine.begin() as conn:
+                conn.execute(text(f'DROP TABLE IF EXISTS {TABLE}'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,217 @@
+"""
+Stub OpenAI-compatible server for exercising OpenAIProvider without a model.
+
+Serves POST /v1/chat/completions (plain and streamed as Server-Sent Events) and
+POST /v1/embeddings on HTTP/1.1 keep-alive connections. Embeddings come from the
+local hashed n-gram embedder, so they are deterministic and searchable; date
+extraction prompts are answered with the local date parser, and other prompts
+with a canned answer. GET /stats reports how many connections served how many
+requests, which shows whether clients reuse connections.
+
+Usage:
+    python benchmarks/openai_stub_server.py --port 8081 [--latency-ms 50]
+    OPENAI_BASE_URL=http://127.0.0.1:8081/v1 LLM_PROVIDER=openai python app.py
+
+    python benchmarks/openai_stub_server.py --self-test
+        starts the stub on a free port and checks OpenAIProvider against it
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.date_parser import extract_date_filter  # noqa: E402
+from services.local_embedder import HashedNgramEmbedder  # noqa: E402
+
+DATE_PROMPT_MARKER = 'extract date/time filtering information'
+
+
+class StubState:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.connections = 0
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.embedders = {}
+
+    def embedder(self, dimensions: int) -> HashedNgramEmbedder:
+        with self.lock:
+            if dimensions not in self.embedders:
+                self.embedders[dimensions] = HashedNgramEmbedder(dimensions=dimensions)
+            return self.embedders[dimensions]
+
+
+def answer(prompt: str) -> str:
+    if DATE_PROMPT_MARKER in prompt:
+        query = prompt.split('Query: "', 1)[-1].split('"\n', 1)[0]
+        date_filter = extract_date_filter(query) or {
+            'has_date_filter': False, 'start_date': None, 'end_date': None,
+            'filter_type': None, 'explanation': 'No date filter'
+        }
+        date_filter.pop('source', None)
+        return json.dumps(date_filter)
+    question = prompt.rsplit('Question:', 1)[-1].split('\n', 1)[0].strip() or prompt[:60]
+    return f'This is the stub model answering: {question}'
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    state: StubState = None
+
+    def setup(self):
+        super().setup()
+        with self.state.lock:
+            self.state.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _write_chunk(self, data: bytes):
+        # Chunked transfer encoding keeps the connection usable after a stream
+        self.wfile.write(f'{len(data):x}\r\n'.encode('ascii') + data + b'\r\n')
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/stats':
+            with self.state.lock:
+                return self._send_json(200, {'connections': self.state.connections, 'requests': self.state.requests})
+        self._send_json(404, {'error': {'message': f'Unknown path {self.path}'}})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length) or b'{}')
+        with self.state.lock:
+            self.state.requests += 1
+        if self.state.latency:
+            time.sleep(self.state.latency)
+
+        if self.path == '/v1/embeddings':
+            inputs = body.get('input', [])
+            inputs = [inputs] if isinstance(inputs, str) else inputs
+            matrix = self.state.embedder(int(body.get('dimensions') or 768)).embed_many(inputs)
+            return self._send_json(200, {
+                'object': 'list',
+                'model': body.get('model'),
+                'data': [
+                    {'object': 'embedding', 'index': index, 'embedding': vector.tolist()}
+                    for index, vector in enumerate(matrix)
+                ]
+            })
+
+        if self.path == '/v1/chat/completions':
+            text = answer(body['messages'][-1]['content'])
+            if not body.get('stream'):
+                return self._send_json(200, {
+                    'object': 'chat.completion',
+                    'model': body.get('model'),
+                    'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': text}, 'finish_reason': 'stop'}]
+                })
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for word in text.split(' '):
+                chunk = {'object': 'chat.completion.chunk', 'choices': [{'index': 0, 'delta': {'content': word + ' '}}]}
+                self._write_chunk(f'data: {json.dumps(chunk)}\n\n'.encode('utf-8'))
+            self._write_chunk(b'data: [DONE]\n\n')
+            self._write_chunk(b'')
+            return
+
+        self._send_json(404, {'error': {'message': f'Unknown path {self.path}'}})
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients that time out hang up mid-response; that is expected here
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)
+
+
+def serve(host: str, port: int, latency_ms: float) -> ThreadingHTTPServer:
+    handler = type('StubHandler', (Handler,), {'state': StubState(latency_ms / 1000)})
+    server = StubServer((host, port), handler)
+    return server
+
+
+def self_test(latency_ms: float) -> int:
+    server = serve('127.0.0.1', 0, latency_ms)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ['OPENAI_BASE_URL'] = f'http://127.0.0.1:{server.server_address[1]}/v1'
+    os.environ.setdefault('OPENAI_API_KEY', 'stub')
+
+    from services.llm_service import OpenAIProvider
+
+    provider = OpenAIProvider()
+    failures = 0
+
+    def check(label, condition):
+        nonlocal failures
+        failures += not condition
+        print(f"{'ok  ' if condition else 'FAIL'} {label}")
+
+    check('generate_text', 'stub model' in provider.generate_text('Question: how was my week?\nAnswer:'))
+    check('generate_text_stream', 'stub model' in ''.join(provider.generate_text_stream('Question: and today?\nAnswer:')))
+
+    texts = [f'entry {i} about walking the dog' for i in range(300)]
+    started = time.perf_counter()
+    embeddings = provider._generate_embeddings(texts)
+    elapsed = time.perf_counter() - started
+    check(f'batched embeddings ({len(texts)} texts in {-(-len(texts) // provider.embedding_batch_size)} requests, '
+          f'{elapsed * 1000:.0f}ms)', len(embeddings) == len(texts) and len(embeddings[0]) == 768)
+
+    date_filter = provider._extract_date_filter('what did I do last week')
+    check('date filter', date_filter.get('has_date_filter') is True)
+
+    provider.text_timeout = max(latency_ms / 2000, 0.05)
+    server.RequestHandlerClass.state.latency = provider.text_timeout * 3
+    try:
+        provider.generate_text('too slow')
+        check('per-call timeout', False)
+    except Exception as e:
+        check(f'per-call timeout ({type(e).__name__})', 'timed out' in str(e).lower() or 'timeout' in str(e).lower())
+    server.RequestHandlerClass.state.latency = latency_ms / 1000
+
+    state = server.RequestHandlerClass.state
+    check(f'keep-alive ({state.requests} requests over {state.connections} connections)',
+          state.connections < state.requests)
+
+    server.shutdown()
+    return 1 if failures else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency-ms', type=float, default=0, help='Delay added to every request')
+    parser.add_argument('--self-test', action='store_true', help='Check OpenAIProvider against a stub on a free port')
+    args = parser.parse_args()
+
+    if args.self_test:
+        sys.exit(self_test(args.latency_ms))
+
+    server = serve(args.host, args.port, args.latency_ms)
+    print(f'Stub OpenAI-compatible server on http://{args.host}:{args.port}/v1')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""
+Recall/latency benchmark: exact vs ANN-indexed pgvector cosine search.
+
+Builds a synthetic clustered corpus in a scratch table, then compares exact
+search (index scans disabled) against the HNSW or IVFFlat index at several
+ef_search / probes settings, reporting recall@k and p50/p95 latency.
+
+Usage (PostgreSQL with the vector extension required):
+    DATABASE_URL=postgresql://... python benchmarks/vector_search_benchmark.py --rows 50000
+"""
+import argparse
+import os
+import time
+import numpy as np
+from sqlalchemy import create_engine, text
+
+DIMENSIONS = 768
+TABLE = 'bench_vector_search'
+
+
+def synthetic_corpus(rows: int, clusters: int, seed: int) -> np.ndarray:
+    """Gaussian clusters on the unit sphere, closer to real embeddings than uniform noise"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, DIMENSIONS)).astype(np.float32)
+    assignments = rng.integers(0, clusters, size=rows)
+    vectors = centers[assignments] + 0.35 * rng.normal(size=(rows, DIMENSIONS)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def to_literal(vector: np.ndarray) -> str:
+    return '[' + ','.join(f'{x:.6f}' for x in vector) + ']'
+
+
+def load_corpus(engine, vectors: np.ndarray, users: int, index_type: str):
+    with engine.begin() as conn:
+        conn.execute(text('CREATE EXTENSION IF NOT EXISTS vector'))
+        conn.execute(text(f'DROP TABLE IF EXISTS {TABLE}'))
+        conn.execute(text(
+            f'CREATE TABLE {TABLE} (id serial PRIMARY KEY, user_id integer NOT NULL, '
+            f'embedding_vector vector({DIMENSIONS}) NOT NULL)'
+        ))
+        batch = 1000
+        for offset in range(0, len(vectors), batch):
+            conn.execute(
+                text(f'INSERT INTO {TABLE} (user_id, embedding_vector) VALUES (:user_id, :embedding)'),
+                [
+                    {'user_id': (offset + i) % users, 'embedding': to_literal(vector)}
+                    for i, vector in enumerate(vectors[offset:offset + batch])
+                ]
+            )
+        conn.execute(text(f'CREATE INDEX ON {TABLE} (user_id)'))
+
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        if index_type == 'hnsw':
+            options = 'm = 16, ef_construction = 64'
+        else:
+            options = f'lists = {max(1, len(vectors) // 1000)}'
+        conn.execute(text(
+            f'CREATE INDEX ON {TABLE} USING {index_type} (embedding_vector vector_cosine_ops) WITH ({options})'
+        ))
+        conn.execute(text(f'ANALYZE {TABLE}'))
+    print(f'Built {index_type} index over {len(vectors)} rows in {time.perf_counter() - started:.1f}s')
+
+
+def run_queries(engine, queries, k: int, user_id, settings):
+    """Run every query in its own transaction with the given SET LOCAL settings"""
+    user_filter = 'WHERE user_id = :user_id' if user_id is not None else ''
+    statement = text(
+        f'SELECT id FROM {TABLE} {user_filter} '
+        f'ORDER BY embedding_vector <=> CAST(:embedding AS vector) LIMIT :k'
+    )
+    results, latencies = [], []
+    for query in queries:
+        with engine.begin() as conn:
+            for name, value in settings:
+                conn.execute(text(f'SET LOCAL {name} = {value}'))
+            started = time.perf_counter()
+            rows = conn.execute(statement, {'embedding': to_literal(query), 'k': k, 'user_id': user_id}).all()
+            latencies.append((time.perf_counter() - started) * 1000)
+        results.append({row.id for row in rows})
+    return results, np.array(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', default=os.getenv('DATABASE_URL'))
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--queries', type=int, default=100)
+    parser.add_argument('--clusters', type=int, default=50)
+    parser.add_argument('--users', type=int, default=1, help='Spread rows over N users and filter by one')
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--index', choices=['hnsw', 'ivfflat'], default='hnsw')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--keep', action='store_true', help='Keep the scratch table afterwards')
+    args = parser.parse_args()
+
+    if not args.database_url or not args.database_url.startswith('postgresql'):
+        parser.error('A PostgreSQL DATABASE_URL with pgvector is required')
+
+    engine = create_engine(args.database_url)
+    corpus = synthetic_corpus(args.rows + args.queries, args.clusters, args.seed)
+    vectors, queries = corpus[:args.rows], corpus[args.rows:]
+    user_id = 0 if args.users > 1 else None
+
+    load_corpus(engine, vectors, args.users, args.index)
+    try:
+        exact, exact_latency = run_queries(
+            engine, queries, args.k, user_id,
+            [('enable_indexscan', 'off'), ('enable_bitmapscan', 'off')]
+        )
+        print(f'\n{"setting":<24}{"recall@" + str(args.k):>12}{"p50 ms":>10}{"p95 ms":>10}')
+        print(f'{"exact":<24}{1.0:>12.3f}{np.percentile(exact_latency, 50):>10.2f}{np.percentile(exact_latency, 95):>10.2f}')
+
+        if args.index == 'hnsw':
+            sweep = [('hnsw.ef_search', value) for value in (10, 20, 40, 80, 160)]
+        else:
+            sweep = [('ivfflat.probes', value) for value in (1, 5, 10, 20, 50)]
+
+        for name, value in sweep:
+            approximate, latency = run_queries(engine, queries, args.k, user_id, [(name, value)])
+            recall = np.mean([
+                len(found & truth) / max(len(truth), 1)
+                for found, truth in zip(approximate, exact)
+            ])
+            label = f'{name}={value}'
+            print(f'{label:<24}{recall:>12.3f}{np.percentile(latency, 50):>10.2f}{np.percentile(latency, 95):>10.2f}')
+    finally:
+        if not args.keep:
+            with engine.begin() as conn:
+                conn.execute(text(f'DROP TABLE IF EXISTS {TABLE}'))
+
+
+if __name__ == '__main__':
+    main()
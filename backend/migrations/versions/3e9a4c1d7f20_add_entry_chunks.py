@@ -0,0 +1,75 @@
+"""add entry_chunks table for passage-level embeddings
+
+Revision ID: 3e9a4c1d7f20
+Revises: 5775bb094b91
+Create Date: 2026-10-17 15:02:41.318207
+
+"""
+import os
+from alembic import op
+import sqlalchemy as sa
+from pgvector.sqlalchemy import Vector
+
+
+# revision identifiers, used by Alembic.
+revision = '3e9a4c1d7f20'
+down_revision = '5775bb094b91'
+branch_labels = None
+depends_on = None
+
+
+def _vector_index_type(bind):
+    """VECTOR_INDEX_TYPE, defaulting to HNSW where the installed pgvector has it (>= 0.5)"""
+    index_type = os.getenv('VECTOR_INDEX_TYPE')
+    if index_type:
+        return index_type.lower()
+    version = bind.exec_driver_sql("SELECT extversion FROM pg_extension WHERE extname = 'vector'").scalar()
+    major_minor = tuple(int(part) for part in (version or '0.0').split('.')[:2])
+    return 'hnsw' if major_minor >= (0, 5) else 'ivfflat'
+
+
+def _vector_index_options(index_type):
+    if index_type == 'hnsw':
+        return "m = 16, ef_construction = 64"
+    if index_type == 'ivfflat':
+        return f"lists = {int(os.getenv('VECTOR_INDEX_LISTS', 100))}"
+    raise ValueError(f"Unsupported VECTOR_INDEX_TYPE: {index_type}")
+
+
+def upgrade():
+    bind = op.get_bind()
+    is_postgres = bind.dialect.name == 'postgresql'
+
+    if not sa.inspect(bind).has_table('entry_chunks'):
+        op.create_table(
+            'entry_chunks',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('entry_id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('chunk_index', sa.Integer(), nullable=False),
+            sa.Column('content', sa.Text(), nullable=False),
+            sa.Column('embedding_vector', Vector(768) if is_postgres else sa.LargeBinary(), nullable=True),
+            sa.Column('embedding_blob', sa.LargeBinary(), nullable=True),
+            sa.ForeignKeyConstraint(['entry_id'], ['entries.id'], ondelete='CASCADE'),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('id')
+        )
+    op.create_index('ix_entry_chunks_entry_id', 'entry_chunks', ['entry_id'], if_not_exists=True)
+    op.create_index('ix_entry_chunks_user_id', 'entry_chunks', ['user_id'], if_not_exists=True)
+
+    if is_postgres:
+        # Same index type as ix_entries_embedding_ann
+        index_type = _vector_index_type(bind)
+        options = _vector_index_options(index_type)
+        with op.get_context().autocommit_block():
+            op.execute(
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_entry_chunks_embedding_ann "
+                f"ON entry_chunks USING {index_type} (embedding_vector vector_cosine_ops) "
+                f"WITH ({options})"
+            )
+
+    # Existing entries get their chunks via `flask backfill-chunks`
+
+
+def downgrade():
+    op.drop_table('entry_chunks')
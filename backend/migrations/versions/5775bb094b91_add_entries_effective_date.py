@@ -0,0 +1,43 @@
+"""add generated effective_date column with (user_id, effective_date) index
+
+Revision ID: 5775bb094b91
+Revises: 7b78b6b1621c
+Create Date: 2026-10-17 14:18:09.772341
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5775bb094b91'
+down_revision = '7b78b6b1621c'
+branch_labels = None
+depends_on = None
+
+EXPRESSION = 'COALESCE(entry_date, date(created_at))'
+
+
+def upgrade():
+    bind = op.get_bind()
+    existing = {column['name'] for column in sa.inspect(bind).get_columns('entries')}
+
+    if 'effective_date' not in existing:
+        if bind.dialect.name == 'postgresql':
+            # Rewrites the table once; date(timestamp) is immutable so it can be stored
+            op.execute(f"ALTER TABLE entries ADD COLUMN effective_date DATE GENERATED ALWAYS AS ({EXPRESSION}) STORED")
+        else:
+            # SQLite can only add VIRTUAL generated columns; they are still indexable
+            op.execute(f"ALTER TABLE entries ADD COLUMN effective_date DATE GENERATED ALWAYS AS ({EXPRESSION}) VIRTUAL")
+
+    op.create_index(
+        'ix_entries_user_effective_date',
+        'entries',
+        ['user_id', 'effective_date'],
+        if_not_exists=True
+    )
+
+
+def downgrade():
+    op.drop_index('ix_entries_user_effective_date', table_name='entries', if_exists=True)
+    op.execute("ALTER TABLE entries DROP COLUMN effective_date")
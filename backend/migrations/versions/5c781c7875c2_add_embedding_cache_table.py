@@ -0,0 +1,36 @@
+"""add content-addressed embedding cache table
+
+Revision ID: 5c781c7875c2
+Revises: f212bfb0d8de
+Create Date: 2026-10-17 11:21:06.904417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c781c7875c2'
+down_revision = 'f212bfb0d8de'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # db.create_all() may already have created the table on fresh databases
+    if sa.inspect(op.get_bind()).has_table('embedding_cache'):
+        return
+
+    op.create_table(
+        'embedding_cache',
+        sa.Column('provider', sa.String(length=32), nullable=False),
+        sa.Column('model', sa.String(length=128), nullable=False),
+        sa.Column('text_hash', sa.String(length=64), nullable=False),
+        sa.Column('embedding', sa.LargeBinary(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('provider', 'model', 'text_hash')
+    )
+
+
+def downgrade():
+    op.drop_table('embedding_cache')
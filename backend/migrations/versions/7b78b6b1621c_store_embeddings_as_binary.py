@@ -0,0 +1,107 @@
+"""store embeddings once in a compact binary format and drop embedding_json
+
+Embeddings used to be written twice: to embedding_vector and as JSON text in
+embedding_json. PostgreSQL now keeps only the native pgvector column and other
+databases keep a float32/float16 blob in embedding_blob.
+
+The conversion runs online in small committed batches, so deploy the code that
+no longer writes embedding_json before running this migration.
+
+Revision ID: 7b78b6b1621c
+Revises: bcba5e7121e6
+Create Date: 2026-10-17 13:37:52.640218
+
+"""
+import json
+import os
+from alembic import op
+import numpy as np
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b78b6b1621c'
+down_revision = 'bcba5e7121e6'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+# Mirrors models.encode_embedding; migrations must not import application code
+DTYPE_CODES = {'float32': (1, '<f4'), 'float16': (2, '<f2')}
+
+
+def encode_embedding(values):
+    code, dtype = DTYPE_CODES[os.getenv('EMBEDDING_STORAGE_DTYPE', 'float32')]
+    return bytes([code]) + np.asarray(values, dtype=dtype).tobytes()
+
+
+def upgrade():
+    bind = op.get_bind()
+    existing = {column['name'] for column in sa.inspect(bind).get_columns('entries')}
+
+    if 'embedding_blob' not in existing:
+        with op.batch_alter_table('entries') as batch_op:
+            batch_op.add_column(sa.Column('embedding_blob', sa.LargeBinary(), nullable=True))
+
+    if 'embedding_json' not in existing:
+        return
+
+    # Commit each batch separately so the table is never locked for the whole conversion
+    with op.get_context().autocommit_block():
+        if bind.dialect.name == 'postgresql':
+            # JSON arrays use the same text format as pgvector literals
+            while True:
+                result = bind.execute(sa.text(
+                    "UPDATE entries SET embedding_vector = embedding_json::vector "
+                    "WHERE id IN (SELECT id FROM entries WHERE embedding_vector IS NULL "
+                    "AND embedding_json IS NOT NULL LIMIT :batch)"
+                ), {'batch': BATCH_SIZE})
+                if result.rowcount == 0:
+                    break
+        else:
+            last_id = 0
+            while True:
+                rows = bind.execute(sa.text(
+                    "SELECT id, embedding_json FROM entries "
+                    "WHERE id > :last_id AND embedding_json IS NOT NULL AND embedding_blob IS NULL "
+                    "ORDER BY id LIMIT :batch"
+                ), {'last_id': last_id, 'batch': BATCH_SIZE}).all()
+                if not rows:
+                    break
+                updates = []
+                for entry_id, embedding_json in rows:
+                    try:
+                        updates.append({'id': entry_id, 'blob': encode_embedding(json.loads(embedding_json))})
+                    except (TypeError, ValueError):
+                        continue
+                if updates:
+                    # The text copy in embedding_vector is redundant without pgvector
+                    bind.execute(sa.text(
+                        "UPDATE entries SET embedding_blob = :blob, embedding_vector = NULL WHERE id = :id"
+                    ), updates)
+                last_id = rows[-1][0]
+
+    with op.batch_alter_table('entries') as batch_op:
+        batch_op.drop_column('embedding_json')
+
+
+def downgrade():
+    bind = op.get_bind()
+    with op.batch_alter_table('entries') as batch_op:
+        batch_op.add_column(sa.Column('embedding_json', sa.Text(), nullable=True))
+
+    if bind.dialect.name == 'postgresql':
+        op.execute("UPDATE entries SET embedding_json = embedding_vector::text WHERE embedding_vector IS NOT NULL")
+    else:
+        rows = bind.execute(sa.text("SELECT id, embedding_blob FROM entries WHERE embedding_blob IS NOT NULL")).all()
+        for entry_id, blob in rows:
+            dtype = {1: '<f4', 2: '<f2'}[blob[0]]
+            values = np.frombuffer(blob, dtype=dtype, offset=1).astype(float).tolist()
+            bind.execute(
+                sa.text("UPDATE entries SET embedding_json = :embedding WHERE id = :id"),
+                {'id': entry_id, 'embedding': json.dumps(values)}
+            )
+
+    with op.batch_alter_table('entries') as batch_op:
+        batch_op.drop_column('embedding_blob')
@@ -0,0 +1,36 @@
+"""make entries.updated_at non-nullable for keyset pagination
+
+Revision ID: 9d3f5b2a6c11
+Revises: d6b2f08e41a7
+Create Date: 2026-10-17 18:41:09.204517
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d3f5b2a6c11'
+down_revision = 'd6b2f08e41a7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The listing cursor compares (entry_date, updated_at, id) as a row value,
+    # which is NULL (so matches nothing) for any row without updated_at
+    op.execute(
+        "UPDATE entries SET updated_at = COALESCE(created_at, CURRENT_TIMESTAMP) "
+        "WHERE updated_at IS NULL"
+    )
+
+    # SQLite cannot change nullability without rebuilding the table, which would
+    # drop its FTS5 triggers; every insert path sets updated_at there, and
+    # databases created by db.create_all() get the constraint from the model
+    if op.get_bind().dialect.name == 'postgresql':
+        op.alter_column('entries', 'updated_at', existing_type=sa.DateTime(), nullable=False)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.alter_column('entries', 'updated_at', existing_type=sa.DateTime(), nullable=True)
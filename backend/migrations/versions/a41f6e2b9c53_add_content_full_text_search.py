@@ -0,0 +1,44 @@
+"""add generated content_tsv columns with GIN indexes for full-text search
+
+Revision ID: a41f6e2b9c53
+Revises: 3e9a4c1d7f20
+Create Date: 2026-10-17 15:41:12.604519
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a41f6e2b9c53'
+down_revision = '3e9a4c1d7f20'
+branch_labels = None
+depends_on = None
+
+TABLES = ('entries', 'entry_chunks')
+
+
+def upgrade():
+    # tsvector and GIN only exist on PostgreSQL
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    for table in TABLES:
+        # Rewrites the table once to compute the stored column
+        op.execute(
+            f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS content_tsv tsvector "
+            "GENERATED ALWAYS AS (to_tsvector('english', content)) STORED"
+        )
+
+    # Build without blocking writes
+    with op.get_context().autocommit_block():
+        for table in TABLES:
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_{table}_content_tsv ON {table} USING gin (content_tsv)")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for table in TABLES:
+        op.execute(f"DROP INDEX IF EXISTS ix_{table}_content_tsv")
+        op.execute(f"ALTER TABLE {table} DROP COLUMN IF EXISTS content_tsv")
@@ -0,0 +1,61 @@
+"""add approximate nearest-neighbour index on entries.embedding_vector
+
+Revision ID: bcba5e7121e6
+Revises: 5c781c7875c2
+Create Date: 2026-10-17 12:02:48.113975
+
+"""
+import os
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'bcba5e7121e6'
+down_revision = '5c781c7875c2'
+branch_labels = None
+depends_on = None
+
+
+def _vector_index_type(bind):
+    """VECTOR_INDEX_TYPE, defaulting to HNSW where the installed pgvector has it (>= 0.5)"""
+    index_type = os.getenv('VECTOR_INDEX_TYPE')
+    if index_type:
+        return index_type.lower()
+    version = bind.exec_driver_sql("SELECT extversion FROM pg_extension WHERE extname = 'vector'").scalar()
+    major_minor = tuple(int(part) for part in (version or '0.0').split('.')[:2])
+    return 'hnsw' if major_minor >= (0, 5) else 'ivfflat'
+
+
+def _vector_index_options(index_type):
+    if index_type == 'hnsw':
+        return "m = 16, ef_construction = 64"
+    if index_type == 'ivfflat':
+        return f"lists = {int(os.getenv('VECTOR_INDEX_LISTS', 100))}"
+    raise ValueError(f"Unsupported VECTOR_INDEX_TYPE: {index_type}")
+
+
+def upgrade():
+    # pgvector indexes only exist on PostgreSQL
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    # HNSW (pgvector >= 0.5) gives the best recall/latency trade-off and needs no
+    # training data; IVFFlat builds faster and smaller but should be created once
+    # the table holds representative data (lists ~ rows / 1000).
+    index_type = _vector_index_type(op.get_bind())
+    options = _vector_index_options(index_type)
+
+    # Build without blocking writes to entries
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_entries_embedding_ann "
+            f"ON entries USING {index_type} (embedding_vector vector_cosine_ops) "
+            f"WITH ({options})"
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute("DROP INDEX IF EXISTS ix_entries_embedding_ann")
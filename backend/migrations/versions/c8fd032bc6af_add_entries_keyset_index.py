@@ -0,0 +1,40 @@
+"""add composite index for keyset-paginated entry listing
+
+Revision ID: c8fd032bc6af
+Revises: 
+Create Date: 2026-10-17 09:12:41.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8fd032bc6af'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Build concurrently on PostgreSQL so existing deployments keep accepting writes
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            op.create_index(
+                'ix_entries_user_date_updated_id',
+                'entries',
+                ['user_id', 'entry_date', 'updated_at', 'id'],
+                postgresql_concurrently=True,
+                if_not_exists=True
+            )
+    else:
+        op.create_index(
+            'ix_entries_user_date_updated_id',
+            'entries',
+            ['user_id', 'entry_date', 'updated_at', 'id'],
+            if_not_exists=True
+        )
+
+
+def downgrade():
+    op.drop_index('ix_entries_user_date_updated_id', table_name='entries', if_exists=True)
@@ -0,0 +1,60 @@
+"""add FTS5 shadow tables for entry and chunk content on SQLite
+
+Revision ID: d6b2f08e41a7
+Revises: a41f6e2b9c53
+Create Date: 2026-10-17 16:20:37.915830
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd6b2f08e41a7'
+down_revision = 'a41f6e2b9c53'
+branch_labels = None
+depends_on = None
+
+TABLES = ('entries', 'entry_chunks')
+
+
+def _has_fts5(bind):
+    return any(row[0] == 'ENABLE_FTS5' for row in bind.exec_driver_sql('PRAGMA compile_options'))
+
+
+def upgrade():
+    bind = op.get_bind()
+    # PostgreSQL uses the tsvector columns instead; SQLite builds without FTS5
+    # fall back to substring search
+    if bind.dialect.name != 'sqlite' or not _has_fts5(bind):
+        return
+
+    for table in TABLES:
+        op.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts USING fts5("
+            f"content, content='{table}', content_rowid='id', tokenize='porter unicode61')"
+        )
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {table}_fts_insert AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {table}_fts(rowid, content) VALUES (new.id, new.content); END"
+        )
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {table}_fts_delete AFTER DELETE ON {table} BEGIN "
+            f"INSERT INTO {table}_fts({table}_fts, rowid, content) VALUES ('delete', old.id, old.content); END"
+        )
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {table}_fts_update AFTER UPDATE OF content ON {table} BEGIN "
+            f"INSERT INTO {table}_fts({table}_fts, rowid, content) VALUES ('delete', old.id, old.content); "
+            f"INSERT INTO {table}_fts(rowid, content) VALUES (new.id, new.content); END"
+        )
+        # Index the rows that already exist
+        op.execute(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for table in TABLES:
+        for trigger in ('insert', 'delete', 'update'):
+            op.execute(f"DROP TRIGGER IF EXISTS {table}_fts_{trigger}")
+        op.execute(f"DROP TABLE IF EXISTS {table}_fts")
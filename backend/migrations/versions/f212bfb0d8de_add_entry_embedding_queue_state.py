@@ -0,0 +1,48 @@
+"""add embedding queue state to entries
+
+Revision ID: f212bfb0d8de
+Revises: c8fd032bc6af
+Create Date: 2026-10-17 10:04:27.551930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f212bfb0d8de'
+down_revision = 'c8fd032bc6af'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # db.create_all() may already have added the columns on fresh databases
+    existing = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('entries')}
+
+    with op.batch_alter_table('entries') as batch_op:
+        if 'embedding_status' not in existing:
+            batch_op.add_column(sa.Column('embedding_status', sa.String(length=16), nullable=False, server_default='pending'))
+        if 'embedding_attempts' not in existing:
+            batch_op.add_column(sa.Column('embedding_attempts', sa.Integer(), nullable=False, server_default='0'))
+        if 'embedding_next_attempt_at' not in existing:
+            batch_op.add_column(sa.Column('embedding_next_attempt_at', sa.DateTime(), nullable=True))
+
+    # Entries that already have a vector are done; the rest are queued for the worker
+    if 'embedding_json' in existing:
+        op.execute("UPDATE entries SET embedding_status = 'ready' WHERE embedding_json IS NOT NULL")
+
+    op.create_index(
+        'ix_entries_embedding_queue',
+        'entries',
+        ['embedding_status', 'embedding_next_attempt_at'],
+        if_not_exists=True
+    )
+
+
+def downgrade():
+    op.drop_index('ix_entries_embedding_queue', table_name='entries', if_exists=True)
+    with op.batch_alter_table('entries') as batch_op:
+        batch_op.drop_column('embedding_next_attempt_at')
+        batch_op.drop_column('embedding_attempts')
+        batch_op.drop_column('embedding_status')
@@ -1,8 +1,12 @@
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from extensions import db
-import json
+import os
 import secrets
+import numpy as np
 from pgvector.sqlalchemy import Vector
+from sqlalchemy import DDL, column, event, literal_column, table
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import deferred
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -53,59 +57,230 @@ class User(db.Model):
             'created_at': self.created_at.isoformat()
         }
 
+# Define IST timezone (UTC+5:30)
+IST = timezone(timedelta(hours=5, minutes=30))
+
+# Binary embedding format: one header byte naming the dtype, then little-endian values
+EMBEDDING_DTYPES = {1: np.dtype('<f4'), 2: np.dtype('<f2')}
+EMBEDDING_DTYPE_CODES = {'float32': 1, 'float16': 2}
+EMBEDDING_STORAGE_DTYPE = os.getenv('EMBEDDING_STORAGE_DTYPE', 'float32')
+
+def encode_embedding(values, dtype: str = None) -> bytes:
+    """Pack an embedding as a dtype header byte followed by float32/float16 values"""
+    code = EMBEDDING_DTYPE_CODES[dtype or EMBEDDING_STORAGE_DTYPE]
+    return bytes([code]) + np.asarray(values, dtype=EMBEDDING_DTYPES[code]).tobytes()
+
+def decode_embedding(blob: bytes) -> np.ndarray:
+    """Unpack encode_embedding output as a float32 array (zero-copy for float32)"""
+    array = np.frombuffer(blob, dtype=EMBEDDING_DTYPES[blob[0]], offset=1)
+    return array if array.dtype == np.float32 else array.astype(np.float32)
+
+def uses_pgvector() -> bool:
+    """Whether embeddings live in the native pgvector column (PostgreSQL only)"""
+    return db.engine.dialect.name == 'postgresql'
+
 class Entry(db.Model):
     __tablename__ = 'entries'
+    __table_args__ = (
+        # Matches the listing order so keyset pagination is a single index range scan
+        db.Index('ix_entries_user_date_updated_id', 'user_id', 'entry_date', 'updated_at', 'id'),
+        # Lets the embedding worker find due work without scanning the table
+        db.Index('ix_entries_embedding_queue', 'embedding_status', 'embedding_next_attempt_at'),
+        # Date-filtered searches are a single range scan on this index
+        db.Index('ix_entries_user_effective_date', 'user_id', 'effective_date'),
+    )
+    
+    # Embedding lifecycle states
+    EMBEDDING_PENDING = 'pending'
+    EMBEDDING_READY = 'ready'
+    EMBEDDING_FAILED = 'failed'
+    
+    # Public fields exposed by to_dict, mapped to the columns each one needs
+    SERIALIZABLE_FIELDS = {
+        'id': ('id',),
+        'content': ('content',),
+        'entry_date': ('entry_date',),
+        'created_at': ('created_at',),
+        'updated_at': ('updated_at',),
+        'created_at_ist': ('created_at',),
+        'updated_at_ist': ('updated_at',),
+        'user_id': ('user_id',),
+        'embedding_status': ('embedding_status',),
+    }
     
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
     entry_date = db.Column(db.Date, nullable=False, default=datetime.utcnow().date)  # Date for the journal entry
     created_at = db.Column(db.DateTime, default=datetime.utcnow)  # When it was created in the system
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Non-null: part of the keyset listing cursor (entry_date, updated_at, id)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    # Store embedding as JSON text for backward compatibility
-    embedding_json = db.Column(db.Text, nullable=True)
-    # Native pgvector embedding for efficient similarity search
-    embedding_vector = db.Column(Vector(768), nullable=True)  # 768 is typical for text embeddings
+    # entry_date, falling back to the day the entry was created; computed by the database
+    # (date() is valid on both PostgreSQL and SQLite) so date filters stay sargable
+    effective_date = db.Column(db.Date, db.Computed('COALESCE(entry_date, date(created_at))', persisted=True))
+    # Native pgvector embedding for efficient similarity search (PostgreSQL).
+    # Deferred so listing and loading entries never pulls vectors off disk.
+    # Its ANN index is created by the migrations (flask db upgrade), which pick
+    # an index type the installed pgvector supports.
+    embedding_vector = deferred(db.Column(Vector(768), nullable=True))  # 768 is typical for text embeddings
+    # Compact binary embedding (see encode_embedding) for databases without pgvector
+    embedding_blob = deferred(db.Column(db.LargeBinary, nullable=True))
+    # Embedding queue state, drained by services.embedding_worker
+    embedding_status = db.Column(db.String(16), nullable=False, default=EMBEDDING_PENDING, server_default=EMBEDDING_PENDING)
+    embedding_attempts = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    embedding_next_attempt_at = db.Column(db.DateTime, nullable=True)
+    
+    # Passage-level embeddings, rebuilt by the embedding worker whenever content changes
+    chunks = db.relationship('EntryChunk', backref='entry', lazy=True, cascade='all, delete-orphan',
+                             order_by='EntryChunk.chunk_index')
+    
+    @staticmethod
+    def embedding_column_values(value):
+        """Column values that store the given embedding (used by the setter and bulk updates)"""
+        if value is None or len(value) == 0:
+            return {'embedding_vector': None, 'embedding_blob': None}
+        if uses_pgvector():
+            return {'embedding_vector': value, 'embedding_blob': None}
+        return {'embedding_vector': None, 'embedding_blob': encode_embedding(value)}
     
     @property
-    def embedding(self):
-        """Get embedding as list of floats - prefer vector column, fallback to JSON"""
+    def embedding_array(self):
+        """Embedding as a float32 NumPy array, decoded on access"""
         if self.embedding_vector is not None:
-            return list(self.embedding_vector)
-        elif self.embedding_json:
-            try:
-                return json.loads(self.embedding_json)
-            except json.JSONDecodeError:
-                return None
+            return np.asarray(self.embedding_vector, dtype=np.float32)
+        if self.embedding_blob is not None:
+            return decode_embedding(self.embedding_blob)
         return None
     
+    @property
+    def has_embedding(self):
+        return self.embedding_vector is not None or self.embedding_blob is not None
+    
+    @property
+    def embedding(self):
+        """Get embedding as list of floats from whichever column holds it"""
+        array = self.embedding_array
+        return array.tolist() if array is not None else None
+    
     @embedding.setter
     def embedding(self, value):
-        """Set embedding from list of floats - store in both vector and JSON columns"""
-        if value:
-            self.embedding_vector = value  # pgvector column for efficient search
-            self.embedding_json = json.dumps(value)  # JSON backup for compatibility
-        else:
-            self.embedding_vector = None
-            self.embedding_json = None
+        """Set embedding from list of floats - stored once, in the column for this database"""
+        for column_name, column_value in self.embedding_column_values(value).items():
+            setattr(self, column_name, column_value)
+        if value is not None and len(value):
+            self.embedding_status = self.EMBEDDING_READY
+            self.embedding_attempts = 0
+            self.embedding_next_attempt_at = None
     
-    def to_dict(self):
-        from datetime import timezone, timedelta
-        
-        # Define IST timezone (UTC+5:30)
-        ist = timezone(timedelta(hours=5, minutes=30))
+    def mark_embedding_pending(self):
+        """Queue this entry for (re-)embedding by the background worker"""
+        self.embedding_status = self.EMBEDDING_PENDING
+        self.embedding_attempts = 0
+        self.embedding_next_attempt_at = None
+    
+    @classmethod
+    def columns_for_fields(cls, fields):
+        """Return the column attributes needed to serialize the given public fields"""
+        names = []
+        for field in fields:
+            for name in cls.SERIALIZABLE_FIELDS[field]:
+                if name not in names:
+                    names.append(name)
+        return [getattr(cls, name) for name in names]
+    
+    def to_dict(self, fields=None):
+        """Serialize the entry, optionally restricted to a subset of SERIALIZABLE_FIELDS"""
+        if fields is None:
+            fields = self.SERIALIZABLE_FIELDS.keys()
         
-        # Convert UTC times to IST
-        created_at_ist = self.created_at.replace(tzinfo=timezone.utc).astimezone(ist) if self.created_at else None
-        updated_at_ist = self.updated_at.replace(tzinfo=timezone.utc).astimezone(ist) if self.updated_at else None
+        # Convert UTC times to IST only when a timestamp field was requested
+        created_at_ist = None
+        updated_at_ist = None
+        if 'created_at' in fields or 'created_at_ist' in fields:
+            created_at_ist = self.created_at.replace(tzinfo=timezone.utc).astimezone(IST) if self.created_at else None
+        if 'updated_at' in fields or 'updated_at_ist' in fields:
+            updated_at_ist = self.updated_at.replace(tzinfo=timezone.utc).astimezone(IST) if self.updated_at else None
         
-        return {
-            'id': self.id,
-            'content': self.content,
-            'entry_date': self.entry_date.isoformat() if self.entry_date else None,
-            'created_at': created_at_ist.isoformat() if created_at_ist else None,
-            'updated_at': updated_at_ist.isoformat() if updated_at_ist else None,
-            'created_at_ist': created_at_ist.strftime('%Y-%m-%d %I:%M:%S %p IST') if created_at_ist else None,
-            'updated_at_ist': updated_at_ist.strftime('%Y-%m-%d %I:%M:%S %p IST') if updated_at_ist else None,
-            'user_id': self.user_id
-        }
+        data = {}
+        for field in fields:
+            if field == 'entry_date':
+                data[field] = self.entry_date.isoformat() if self.entry_date else None
+            elif field == 'created_at':
+                data[field] = created_at_ist.isoformat() if created_at_ist else None
+            elif field == 'updated_at':
+                data[field] = updated_at_ist.isoformat() if updated_at_ist else None
+            elif field == 'created_at_ist':
+                data[field] = created_at_ist.strftime('%Y-%m-%d %I:%M:%S %p IST') if created_at_ist else None
+            elif field == 'updated_at_ist':
+                data[field] = updated_at_ist.strftime('%Y-%m-%d %I:%M:%S %p IST') if updated_at_ist else None
+            else:
+                data[field] = getattr(self, field)
+        return data
+
+class EntryChunk(db.Model):
+    """A passage of a long entry with its own embedding, for passage-level retrieval"""
+    __tablename__ = 'entry_chunks'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    entry_id = db.Column(db.Integer, db.ForeignKey('entries.id', ondelete='CASCADE'), nullable=False, index=True)
+    # Denormalized from the entry so searches filter chunks without a join
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    chunk_index = db.Column(db.Integer, nullable=False)  # Position within the entry
+    content = db.Column(db.Text, nullable=False)
+    # Same storage scheme as Entry: pgvector on PostgreSQL, binary blob elsewhere
+    embedding_vector = deferred(db.Column(Vector(768), nullable=True))
+    embedding_blob = deferred(db.Column(db.LargeBinary, nullable=True))
+
+# Full-text search. PostgreSQL: a stored tsvector generated from content with a
+# GIN index. SQLite: an external-content FTS5 shadow table (<table>_fts, rowid =
+# row id) kept in sync by triggers. Neither is mapped, since each exists on one
+# dialect only; queries reach them through content_tsv() and full_text_table().
+TEXT_SEARCH_CONFIG = 'english'
+
+def _sqlite_has_fts5(ddl, target, bind, **kw):
+    if bind.dialect.name != 'sqlite':
+        return False
+    return any(row[0] == 'ENABLE_FTS5' for row in bind.exec_driver_sql('PRAGMA compile_options'))
+
+def _attach_full_text_index(target):
+    name = target.name
+    for statement in (
+        f"ALTER TABLE {name} ADD COLUMN IF NOT EXISTS content_tsv tsvector "
+        f"GENERATED ALWAYS AS (to_tsvector('{TEXT_SEARCH_CONFIG}', content)) STORED",
+        f"CREATE INDEX IF NOT EXISTS ix_{name}_content_tsv ON {name} USING gin (content_tsv)"
+    ):
+        event.listen(target, 'after_create', DDL(statement).execute_if(dialect='postgresql'))
+    
+    for statement in (
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {name}_fts USING fts5("
+        f"content, content='{name}', content_rowid='id', tokenize='porter unicode61')",
+        f"CREATE TRIGGER IF NOT EXISTS {name}_fts_insert AFTER INSERT ON {name} BEGIN "
+        f"INSERT INTO {name}_fts(rowid, content) VALUES (new.id, new.content); END",
+        f"CREATE TRIGGER IF NOT EXISTS {name}_fts_delete AFTER DELETE ON {name} BEGIN "
+        f"INSERT INTO {name}_fts({name}_fts, rowid, content) VALUES ('delete', old.id, old.content); END",
+        f"CREATE TRIGGER IF NOT EXISTS {name}_fts_update AFTER UPDATE OF content ON {name} BEGIN "
+        f"INSERT INTO {name}_fts({name}_fts, rowid, content) VALUES ('delete', old.id, old.content); "
+        f"INSERT INTO {name}_fts(rowid, content) VALUES (new.id, new.content); END"
+    ):
+        event.listen(target, 'after_create', DDL(statement).execute_if(callable_=_sqlite_has_fts5))
+
+_attach_full_text_index(Entry.__table__)
+_attach_full_text_index(EntryChunk.__table__)
+
+def content_tsv(model):
+    """SQL expression for a model's unmapped content_tsv column (PostgreSQL)"""
+    return literal_column(f'{model.__tablename__}.content_tsv', type_=TSVECTOR)
+
+def full_text_table(model):
+    """Lightweight table construct for a model's FTS5 shadow table (SQLite)"""
+    return table(f'{model.__tablename__}_fts', column('rowid'))
+
+class EmbeddingCacheEntry(db.Model):
+    """Content-addressed embedding cache, keyed by provider, model and sha256 of the text"""
+    __tablename__ = 'embedding_cache'
+    
+    provider = db.Column(db.String(32), primary_key=True)
+    model = db.Column(db.String(128), primary_key=True)
+    text_hash = db.Column(db.String(64), primary_key=True)  # hex sha256 of the embedded text
+    embedding = db.Column(db.LargeBinary, nullable=False)  # float32 little-endian
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
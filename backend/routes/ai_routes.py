@@ -1,10 +1,212 @@
-from flask import Blueprint, request, jsonify
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from services.llm_service import llm_service
+from services.llm_service import FALLBACK_PREFIX, CoalescingProvider, RouterProvider, llm_service
 from services.database_service import DatabaseService
+from services.answer_cache import answer_cache
+from services.date_filter_cache import date_filter_cache
+from services.embedding_cache import embedding_cache
+from services.vector_store import vector_store
+from services.context_builder import ELLIPSIS, build_context, count_tokens
+from services import date_parser
 
 ai_bp = Blueprint('ai', __name__)
 
+# The provider behind the request-coalescing layer, if there is one
+_provider = llm_service.provider if isinstance(llm_service, CoalescingProvider) else llm_service
+
+# Shared budget for the concurrent pre-retrieval provider calls of one search
+AI_SEARCH_DEADLINE_SECONDS = float(os.getenv('AI_SEARCH_DEADLINE_SECONDS', 20))
+
+# Pool for fanning out independent provider calls within a request
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('AI_SEARCH_WORKERS', 8)),
+    thread_name_prefix='ai-search'
+)
+
+# Passages fetched by chunk search before grouping them into at most
+# AI_SEARCH_MAX_ENTRIES entries
+AI_SEARCH_CHUNK_LIMIT = int(os.getenv('AI_SEARCH_CHUNK_LIMIT', 30))
+AI_SEARCH_MAX_ENTRIES = int(os.getenv('AI_SEARCH_MAX_ENTRIES', 10))
+
+# POST /search/plan returns compiled SQL and schema details: off unless debugging
+SEARCH_PLAN_DEBUG = os.getenv('SEARCH_PLAN_DEBUG', 'false').lower() == 'true'
+
+def _submit(fn, *args):
+    """Run fn on the shared pool inside the current app context (for db-backed caches)"""
+    app = current_app._get_current_object()
+    
+    def run():
+        with app.app_context():
+            return fn(*args)
+    
+    return _executor.submit(run)
+
+def _no_date_filter(explanation):
+    return {
+        'has_date_filter': False,
+        'start_date': None,
+        'end_date': None,
+        'filter_type': None,
+        'explanation': explanation
+    }
+
+def _remaining(deadline):
+    return max(0.0, deadline - time.monotonic())
+
+def _extract_date_filter_and_embedding(query):
+    """
+    Run date extraction and query embedding concurrently under one deadline.
+    
+    The local date parser answers first; the LLM is only asked when the query
+    mentions dates the parser cannot resolve. A failed or late date extraction
+    degrades to "no date filter"; a failed or late embedding returns None.
+    Calls still running at the deadline are abandoned (their threads finish in
+    the background).
+    """
+    deadline = time.monotonic() + AI_SEARCH_DEADLINE_SECONDS
+    embedding_future = _submit(llm_service.generate_embedding, query)
+    
+    local_filter = date_parser.extract_date_filter(query) if date_parser.LOCAL_DATE_PARSER_ENABLED else None
+    date_future = None if local_filter is not None else _submit(llm_service.extract_date_filter, query)
+    
+    try:
+        date_filter = local_filter if date_future is None else date_future.result(timeout=_remaining(deadline))
+    except FuturesTimeoutError:
+        print("⏱️ Date extraction missed the search deadline, continuing without a date filter")
+        date_filter = _no_date_filter('Timed out')
+    except Exception as e:
+        print(f"Warning: Could not extract date filter: {str(e)}")
+        date_filter = _no_date_filter(f'Error: {str(e)}')
+    
+    query_embedding = None
+    try:
+        query_embedding = embedding_future.result(timeout=_remaining(deadline))
+    except FuturesTimeoutError:
+        print("⏱️ Query embedding missed the search deadline")
+    except Exception as e:
+        print(f"Warning: Could not generate search embedding: {str(e)}")
+    
+    return date_filter, query_embedding
+
+def _find_relevant_entries(user_id, query, date_filter, query_embedding):
+    """
+    Run the search strategy for a query: similarity search (within the LLM date
+    range if there is one), falling back to the date range alone or to dates
+    parsed from the query. The planner runs the whole chain as one statement.
+    """
+    relevant_entries, plan = DatabaseService.planned_search(
+        user_id=user_id,
+        query=query,
+        embedding=query_embedding,
+        date_filter=date_filter,
+        limit=10,
+        keywords=query
+    )
+    print(f"🔎 Planned search ({plan.engine}) found {len(relevant_entries)} entries via {plan.chosen}")
+    return relevant_entries
+
+def _entry_label(entry):
+    # Use entry_date if available, fallback to created_at
+    return entry.entry_date.strftime('%m-%d') if entry.entry_date else entry.created_at.strftime('%m-%d')
+
+def _find_relevant_passages(user_id, query, date_filter, query_embedding):
+    """
+    Retrieve (label, content, score) passages for the prompt, best first.
+    
+    Chunk search runs first so a long entry contributes only the passages that
+    match; chunks are grouped per entry in their original order. Entries without
+    chunks yet (just written or edited, or awaiting the backfill) are found by
+    the entry-level fallback chain and merged in by rank.
+    """
+    chunks = DatabaseService.find_similar_chunks(
+        embedding=query_embedding,
+        user_id=user_id,
+        date_filter=date_filter if date_filter.get('has_date_filter') else None,
+        limit=AI_SEARCH_CHUNK_LIMIT,
+        keywords=query
+    )
+    if not chunks:
+        relevant_entries = _find_relevant_entries(user_id, query, date_filter, query_embedding)
+        return [
+            (_entry_label(entry), entry.content, 1.0 / (rank + 1))
+            for rank, entry in enumerate(relevant_entries)
+        ]
+    
+    grouped = {}
+    for chunk, effective_date, similarity in chunks:
+        if chunk.entry_id not in grouped:
+            if len(grouped) >= AI_SEARCH_MAX_ENTRIES:
+                continue
+            grouped[chunk.entry_id] = (effective_date.strftime('%m-%d'), similarity, [])
+        grouped[chunk.entry_id][2].append(chunk)
+    print(f"🧩 Chunk search found {len(chunks)} passages from {len(grouped)} entries")
+    passages = [
+        (
+            label,
+            f' {ELLIPSIS} '.join(chunk.content for chunk in sorted(entry_chunks, key=lambda c: c.chunk_index)),
+            similarity
+        )
+        for label, similarity, entry_chunks in grouped.values()
+    ]
+    
+    if DatabaseService.chunkless_entry_ids(user_id, limit=1):
+        passages = _merge_chunkless_entries(passages, set(grouped), user_id, query, date_filter, query_embedding)
+    return passages
+
+def _merge_chunkless_entries(passages, chunked_entry_ids, user_id, query, date_filter, query_embedding):
+    """
+    Interleave entry-level matches that have no chunks with the chunk passages:
+    the entry ranked r-th is placed r-th and weighted like the passage above it
+    """
+    candidates = [
+        entry for entry in _find_relevant_entries(user_id, query, date_filter, query_embedding)
+        if entry.id not in chunked_entry_ids
+    ]
+    if not candidates:
+        return passages
+    chunkless = set(DatabaseService.chunkless_entry_ids(user_id, [entry.id for entry in candidates]))
+    
+    merged = list(passages)
+    for rank, entry in enumerate(candidates):
+        if entry.id not in chunkless:
+            continue
+        position = min(rank, len(merged))
+        score = merged[position - 1][2] if position else merged[0][2] if merged else 1.0
+        merged.insert(position, (_entry_label(entry), entry.content, score))
+    print(f"🧩 Merged {len(chunkless)} entries without chunks into the passages")
+    return merged[:AI_SEARCH_MAX_ENTRIES]
+
+def _build_prompt(query, passages):
+    """Build the answer prompt from the retrieved passages within the context token budget"""
+    # Compact format: just date and content, no labels.
+    context, token_report = build_context(
+        query,
+        [(label, content) for label, content, _ in passages],
+        scores=[score for _, _, score in passages]
+    )
+    
+    # Create prompt for the LLM (optimized for fewer tokens)
+    prompt = f"""Answer based on these journal entries. Be conversational and mention dates when relevant.
+
+Entries:
+{context}
+
+Question: {query}
+
+Answer:"""
+    
+    token_report['prompt_tokens'] = count_tokens(prompt)
+    print(f"🧮 Prompt tokens: {token_report}")
+    return prompt, token_report
+
+def _cacheable(response):
+    # Groq and the router report outages as a canned answer instead of raising
+    return bool(response) and not response.startswith(FALLBACK_PREFIX)
+
 @ai_bp.route('/search', methods=['POST'])
 @jwt_required()
 def ai_search():
@@ -18,59 +220,37 @@ def ai_search():
         query = data['query']
         print(f"🔍 AI Search Request - User: {user_id}, Query: '{query}'")
         
-        # Step 1: Extract date filter using LLM
-        print("🤖 Extracting date filter using LLM...")
-        date_filter = llm_service.extract_date_filter(query)
+        # Steps 1 & 2: Extract the date filter and embed the query concurrently,
+        # so pre-retrieval latency is the slower of the two calls, not their sum
+        print("🤖 Extracting date filter and generating query embedding in parallel...")
+        date_filter, query_embedding = _extract_date_filter_and_embedding(query)
         print(f"📅 LLM Date Filter Result: {date_filter}")
         
-        # Step 2: Generate embedding for the search query
-        query_embedding = None
-        try:
-            query_embedding = llm_service.generate_embedding(query)
-            print(f"🧠 Generated embedding of length {len(query_embedding) if query_embedding else 0}")
-        except Exception as e:
-            print(f"Warning: Could not generate search embedding: {str(e)}")
+        if query_embedding is None:
             # Fall back to basic text search
             return jsonify({
                 'response': "AI search is currently unavailable. Please try again later or use the basic search feature.",
                 'relevant_entries_count': 0,
                 'ai_available': False
             }), 200
+        print(f"🧠 Generated embedding of length {len(query_embedding)}")
+        
+        # A near-identical question over unchanged entries was already answered;
+        # the version is read before retrieval so later writes invalidate this answer
+        data_version = answer_cache.version(user_id)
+        cached = answer_cache.get(user_id, query_embedding, date_filter, data_version)
+        if cached is not None:
+            print(f"💾 Answer cache hit (similarity {cached['similarity']})")
+            return jsonify({
+                'response': cached['response'],
+                'relevant_entries_count': cached['relevant_entries_count'],
+                'ai_available': True,
+                'tokens': cached['tokens'],
+                'cached': True
+            }), 200
 
         # Step 3: Search entries with LLM-extracted date filter
-        relevant_entries = []
-        
-        if date_filter.get('has_date_filter'):
-            print(f"🔍 Using LLM date-filtered search...")
-            # Use LLM date-filtered vector search
-            relevant_entries = DatabaseService.find_similar_entries_with_llm_date_filter(
-                embedding=query_embedding,
-                user_id=user_id,
-                date_filter=date_filter,
-                limit=10
-            )
-            print(f"📅 LLM date-filtered search found {len(relevant_entries)} entries")
-            
-            # If no entries found via embedding with date filter, try pure date search
-            if not relevant_entries:
-                print("🔄 Falling back to pure LLM date search...")
-                relevant_entries = DatabaseService.find_entries_by_llm_date_filter(user_id, date_filter)
-                print(f"� Pure LLM date search found {len(relevant_entries)} entries")
-        else:
-            print(f"🔍 No date filter detected, using regular vector search...")
-            # No date filtering, use regular vector search
-            relevant_entries = DatabaseService.find_similar_entries(
-                embedding=query_embedding,
-                user_id=user_id,
-                limit=10
-            )
-            print(f"🔎 Regular vector search found {len(relevant_entries)} entries")
-            
-            # Fallback to old regex-based date search if no results
-            if not relevant_entries:
-                print("🔄 Falling back to regex date search...")
-                relevant_entries = DatabaseService.find_entries_by_date_query(query, user_id)
-                print(f"📅 Regex date search found {len(relevant_entries)} entries")
+        relevant_entries = _find_relevant_passages(user_id, query, date_filter, query_embedding)
         
         if not relevant_entries:
             return jsonify({
@@ -79,27 +259,7 @@ def ai_search():
                 'ai_available': True
             }), 200
         
-        # Prepare context from relevant entries (optimized for fewer tokens)
-        context_entries = []
-        for entry in relevant_entries:
-            # Use entry_date if available, fallback to created_at
-            entry_date_str = entry.entry_date.strftime('%m-%d') if entry.entry_date else entry.created_at.strftime('%m-%d')
-            # Compact format: just date and content, no labels
-            context_entries.append(f"{entry_date_str}: {entry.content}")
-        
-        context = "\n\n".join(context_entries)
-
-        print(context)
-        
-        # Create prompt for the LLM (optimized for fewer tokens)
-        prompt = f"""Answer based on these journal entries. Be conversational and mention dates when relevant.
-
-Entries:
-{context}
-
-Question: {query}
-
-Answer:"""
+        prompt, token_report = _build_prompt(query, relevant_entries)
         
         # Generate response using LLM
         try:
@@ -109,19 +269,164 @@ Answer:"""
             return jsonify({
                 'response': "I found relevant entries but couldn't generate a response due to AI service issues. Please try again later.",
                 'relevant_entries_count': len(relevant_entries),
-                'ai_available': False
+                'ai_available': False,
+                'tokens': token_report
             }), 200
         
+        if _cacheable(response):
+            answer_cache.put(user_id, query_embedding, date_filter, data_version, {
+                'response': response,
+                'relevant_entries_count': len(relevant_entries),
+                'tokens': token_report
+            })
+        
         return jsonify({
             'response': response,
             'relevant_entries_count': len(relevant_entries),
-            'ai_available': True
+            'ai_available': True,
+            'tokens': token_report,
+            'cached': False
         }), 200
         
     except Exception as e:
         print(f"Error in AI search: {str(e)}")
         return jsonify({'error': 'An error occurred while processing your search'}), 500
 
+def _sse(event, data):
+    """Format one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@ai_bp.route('/search/stream', methods=['POST'])
+@jwt_required()
+def ai_search_stream():
+    """
+    Streaming variant of /search over Server-Sent Events.
+    
+    Emits a `metadata` event as soon as retrieval finishes, then `token` events
+    as the answer is generated, and finally `done` (or `error`).
+    """
+    user_id = int(get_jwt_identity())  # Convert to int
+    data = request.get_json(silent=True)
+    
+    if not data or not data.get('query'):
+        return jsonify({'error': 'Query is required'}), 400
+    
+    query = data['query']
+    print(f"🔍 AI Streaming Search Request - User: {user_id}, Query: '{query}'")
+    
+    def generate():
+        try:
+            date_filter, query_embedding = _extract_date_filter_and_embedding(query)
+            
+            if query_embedding is None:
+                yield _sse('metadata', {'relevant_entries_count': 0, 'ai_available': False})
+                yield _sse('token', {'text': "AI search is currently unavailable. Please try again later or use the basic search feature."})
+                yield _sse('done', {'ai_available': False})
+                return
+            
+            data_version = answer_cache.version(user_id)
+            cached = answer_cache.get(user_id, query_embedding, date_filter, data_version)
+            if cached is not None:
+                print(f"💾 Answer cache hit (similarity {cached['similarity']})")
+                yield _sse('metadata', {
+                    'relevant_entries_count': cached['relevant_entries_count'],
+                    'ai_available': True,
+                    'date_filter': date_filter,
+                    'tokens': cached['tokens'],
+                    'cached': True
+                })
+                yield _sse('token', {'text': cached['response']})
+                yield _sse('done', {'ai_available': True})
+                return
+            
+            relevant_entries = _find_relevant_passages(user_id, query, date_filter, query_embedding)
+            
+            if not relevant_entries:
+                yield _sse('metadata', {
+                    'relevant_entries_count': 0,
+                    'ai_available': True,
+                    'date_filter': date_filter
+                })
+                yield _sse('token', {'text': "I couldn't find any relevant entries to answer your question. Try adding more journal entries first!"})
+                yield _sse('done', {'ai_available': True})
+                return
+            
+            prompt, token_report = _build_prompt(query, relevant_entries)
+            yield _sse('metadata', {
+                'relevant_entries_count': len(relevant_entries),
+                'ai_available': True,
+                'date_filter': date_filter,
+                'tokens': token_report,
+                'cached': False
+            })
+            parts = []
+            try:
+                for text in llm_service.generate_text_stream(prompt):
+                    parts.append(text)
+                    yield _sse('token', {'text': text})
+            except Exception as e:
+                print(f"Warning: Could not stream AI response: {str(e)}")
+                yield _sse('error', {
+                    'message': "I found relevant entries but couldn't generate a response due to AI service issues. Please try again later.",
+                    'ai_available': False
+                })
+                return
+            
+            response = ''.join(parts)
+            if _cacheable(response):
+                answer_cache.put(user_id, query_embedding, date_filter, data_version, {
+                    'response': response,
+                    'relevant_entries_count': len(relevant_entries),
+                    'tokens': token_report
+                })
+            yield _sse('done', {'ai_available': True})
+            
+        except Exception as e:
+            print(f"Error in streaming AI search: {str(e)}")
+            yield _sse('error', {'message': 'An error occurred while processing your search'})
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'  # Don't let proxies buffer the stream
+        }
+    )
+
+@ai_bp.route('/search/plan', methods=['POST'])
+@jwt_required()
+def explain_search_plan():
+    """Debugging aid: run the entry search for a query and return its plan, without generating an answer"""
+    if not SEARCH_PLAN_DEBUG:
+        return jsonify({'error': 'Not found'}), 404
+    try:
+        user_id = int(get_jwt_identity())
+        data = request.get_json(silent=True)
+        
+        if not data or not data.get('query'):
+            return jsonify({'error': 'Query is required'}), 400
+        
+        query = data['query']
+        date_filter, query_embedding = _extract_date_filter_and_embedding(query)
+        entries, plan = DatabaseService.planned_search(
+            user_id=user_id,
+            query=query,
+            embedding=query_embedding,
+            date_filter=date_filter,
+            limit=10,
+            keywords=query
+        )
+        return jsonify({
+            'date_filter': date_filter,
+            'plan': plan.to_dict(include_sql=True),
+            'entry_ids': [entry.id for entry in entries]
+        }), 200
+        
+    except Exception as e:
+        print(f"Error explaining search plan: {str(e)}")
+        return jsonify({'error': 'An error occurred while planning the search'}), 500
+
 @ai_bp.route('/search/test', methods=['GET'])
 @jwt_required()
 def test_ai_search():
@@ -139,3 +444,16 @@ def test_ai_search():
         
     except Exception as e:
         return jsonify({'error': f'AI service error: {str(e)}'}), 500
+
+@ai_bp.route('/search/stats', methods=['GET'])
+@jwt_required()
+def search_stats():
+    """Cache counters for monitoring AI search performance"""
+    return jsonify({
+        'embedding_cache': embedding_cache.stats(),
+        'date_filter_cache': date_filter_cache.stats(),
+        'answer_cache': answer_cache.stats(),
+        'llm_router': _provider.stats() if isinstance(_provider, RouterProvider) else None,
+        'singleflight': llm_service.singleflight.stats() if isinstance(llm_service, CoalescingProvider) else None,
+        'vector_store': vector_store.stats()
+    }), 200
@@ -1,9 +1,17 @@
-from flask import Blueprint, request, jsonify
+import base64
+import binascii
+import json
+import time
+import zlib
+from datetime import date, datetime
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import insert
 from extensions import db
-from models import Entry
-from services.llm_service import llm_service
+from models import Entry, EntryChunk
 from services.database_service import DatabaseService
+from services.embedding_worker import embedding_worker
+from services.vector_search import vector_search_engine
 
 entry_bp = Blueprint('entries', __name__)
 
@@ -40,29 +48,23 @@ def create_entry():
         if entry_date > date.today():
             return jsonify({'error': 'Entry date cannot be in the future'}), 400
         
-        # Try to generate embedding, but don't fail if it doesn't work
-        embedding = None
-        try:
-            embedding = llm_service.generate_embedding(content)
-            print(f"Generated embedding successfully: {len(embedding)} dimensions")
-        except Exception as e:
-            print(f"Warning: Could not generate embedding: {str(e)}")
-            # Continue without embedding - the app should still work
-        
-        # Create entry with entry_date field
+        # Create entry with entry_date field; the embedding is computed in the background
         entry = Entry(
             content=content,
             entry_date=entry_date,
             user_id=user_id,
-            embedding=embedding  # Will be None if AI failed
+            embedding_status=Entry.EMBEDDING_PENDING
         )
         
         db.session.add(entry)
         db.session.commit()
+        vector_search_engine.invalidate(user_id, entry_ids=[entry.id])
+        embedding_worker.notify()
         
         return jsonify({
             'entry': entry.to_dict(),
-            'has_embedding': embedding is not None
+            'has_embedding': False,
+            'embedding_status': entry.embedding_status
         }), 201
         
     except Exception as e:
@@ -70,25 +72,284 @@ def create_entry():
         print(f"Error creating entry: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+# Page size bounds for keyset-paginated listing
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+def _encode_cursor(entry):
+    """Encode an entry's (entry_date, updated_at, id) sort key as an opaque cursor"""
+    payload = [
+        entry.entry_date.isoformat(),
+        entry.updated_at.isoformat(),
+        entry.id
+    ]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+def _decode_cursor(cursor):
+    """Decode a cursor produced by _encode_cursor, raising ValueError if it is malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        entry_date_str, updated_at_str, entry_id = json.loads(base64.urlsafe_b64decode(padded))
+        # Every part is required: a NULL in the row-value comparison would match nothing
+        return (
+            date.fromisoformat(entry_date_str),
+            datetime.fromisoformat(updated_at_str),
+            int(entry_id)
+        )
+    except (TypeError, ValueError, binascii.Error):
+        raise ValueError('Invalid cursor')
+
+def _parse_fields_param():
+    """Parse the optional ?fields= projection, raising ValueError on unknown fields"""
+    fields_param = request.args.get('fields')
+    if not fields_param:
+        return None
+    fields = [field.strip() for field in fields_param.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in Entry.SERIALIZABLE_FIELDS]
+    if unknown:
+        raise ValueError(
+            f"Unknown fields: {', '.join(unknown)}. "
+            f"Available fields: {', '.join(Entry.SERIALIZABLE_FIELDS)}"
+        )
+    return fields
+
 @entry_bp.route('', methods=['GET'])
 @jwt_required()
 def get_entries():
     try:
         user_id = int(get_jwt_identity())  # Convert to int
         
-        # Get all entries for the user, sorted by entry_date (newest first), then by updated_at (newest first)
-        entries = Entry.query.filter_by(user_id=user_id).order_by(
-            Entry.entry_date.desc().nullslast(), 
-            Entry.updated_at.desc()
-        ).all()
+        # Optional field projection, e.g. ?fields=id,entry_date,content
+        try:
+            fields = _parse_fields_param()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Pagination is opt-in: without limit/cursor every entry is returned as before
+        limit_param = request.args.get('limit')
+        cursor_param = request.args.get('cursor')
+        paginated = limit_param is not None or cursor_param is not None
+        
+        limit = None
+        after = None
+        if paginated:
+            try:
+                limit = int(limit_param) if limit_param is not None else DEFAULT_PAGE_SIZE
+            except ValueError:
+                return jsonify({'error': 'limit must be an integer'}), 400
+            if limit < 1 or limit > MAX_PAGE_SIZE:
+                return jsonify({'error': f'limit must be between 1 and {MAX_PAGE_SIZE}'}), 400
+            
+            if cursor_param:
+                try:
+                    after = _decode_cursor(cursor_param)
+                except ValueError as e:
+                    return jsonify({'error': str(e)}), 400
+        
+        # Sorted by entry_date (newest first), then by updated_at (newest first), then id.
+        # Fetch one extra row to know whether another page exists.
+        entries = DatabaseService.list_entries(
+            user_id=user_id,
+            limit=limit + 1 if paginated else None,
+            after=after,
+            fields=fields
+        )
+        
+        if not paginated:
+            return jsonify({
+                'entries': [entry.to_dict(fields) for entry in entries]
+            }), 200
+        
+        has_more = len(entries) > limit
+        entries = entries[:limit]
         
         return jsonify({
-            'entries': [entry.to_dict() for entry in entries]
+            'entries': [entry.to_dict(fields) for entry in entries],
+            'next_cursor': _encode_cursor(entries[-1]) if has_more else None,
+            'has_more': has_more
         }), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Rows fetched per round trip from the server-side cursor during export
+EXPORT_BATCH_SIZE = 500
+
+@entry_bp.route('/export', methods=['GET'])
+@jwt_required()
+def export_entries():
+    try:
+        user_id = int(get_jwt_identity())  # Convert to int
+        
+        try:
+            fields = _parse_fields_param()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        compression = request.args.get('compression')
+        if compression not in (None, 'gzip'):
+            return jsonify({'error': 'compression must be gzip'}), 400
+        
+        def generate_lines():
+            # One NDJSON line per entry, streamed as rows arrive from the cursor
+            for entry in DatabaseService.iter_entries(user_id, fields=fields, batch_size=EXPORT_BATCH_SIZE):
+                yield json.dumps(entry.to_dict(fields)) + '\n'
+        
+        def generate_gzip():
+            # wbits=31 writes a gzip container; flush per batch so bytes go out immediately
+            compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+            pending = []
+            for line in generate_lines():
+                pending.append(line)
+                if len(pending) >= EXPORT_BATCH_SIZE:
+                    yield compressor.compress(''.join(pending).encode()) + compressor.flush(zlib.Z_SYNC_FLUSH)
+                    pending = []
+            yield compressor.compress(''.join(pending).encode()) + compressor.flush()
+        
+        filename = f"journal-export-{date.today().isoformat()}.ndjson"
+        if compression == 'gzip':
+            body = generate_gzip()
+            mimetype = 'application/gzip'
+            filename += '.gz'
+        else:
+            body = generate_lines()
+            mimetype = 'application/x-ndjson'
+        
+        return Response(
+            stream_with_context(body),
+            mimetype=mimetype,
+            headers={
+                'Content-Disposition': f'attachment; filename="{filename}"',
+                'X-Accel-Buffering': 'no'  # Don't let proxies buffer the stream
+            }
+        )
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Bulk import limits
+MAX_BULK_ROWS = 5000
+BULK_INSERT_BATCH_SIZE = 500
+
+def _parse_bulk_body():
+    """Read a bulk import body as a list of rows (JSON array, {"entries": [...]} or NDJSON)"""
+    content_type = (request.content_type or '').lower()
+    if 'ndjson' in content_type or 'jsonlines' in content_type:
+        rows = []
+        for line in request.get_data(as_text=True).splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rows.append(json.loads(line))
+            except ValueError:
+                # Keep the row so it is reported with its position
+                rows.append(None)
+        return rows
+    
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get('entries')
+    if not isinstance(data, list):
+        raise ValueError('Body must be a JSON array of entries or NDJSON')
+    return data
+
+def _validate_bulk_row(row, today):
+    """Validate one import row, returning (content, entry_date) or raising ValueError"""
+    if not isinstance(row, dict):
+        raise ValueError('Row must be a JSON object')
+    
+    content = row.get('content')
+    if not isinstance(content, str) or not content.strip():
+        raise ValueError('Content is required')
+    
+    entry_date_str = row.get('entry_date')
+    if entry_date_str:
+        try:
+            entry_date = datetime.strptime(entry_date_str, '%Y-%m-%d').date()
+        except (TypeError, ValueError):
+            raise ValueError('Invalid date format. Use YYYY-MM-DD')
+        if entry_date > today:
+            raise ValueError('Entry date cannot be in the future')
+    else:
+        entry_date = today
+    
+    return content.strip(), entry_date
+
+@entry_bp.route('/bulk', methods=['POST'])
+@jwt_required()
+def bulk_import_entries():
+    try:
+        user_id = int(get_jwt_identity())  # Convert to int
+        started = time.perf_counter()
+        
+        try:
+            rows = _parse_bulk_body()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        if not rows:
+            return jsonify({'error': 'No entries to import'}), 400
+        if len(rows) > MAX_BULK_ROWS:
+            return jsonify({'error': f'At most {MAX_BULK_ROWS} entries can be imported per request'}), 400
+        
+        # Validate every row up front so the insert is a single pass
+        today = date.today()
+        now = datetime.utcnow()
+        results = []
+        valid_rows = []
+        valid_indexes = []
+        for index, row in enumerate(rows):
+            try:
+                content, entry_date = _validate_bulk_row(row, today)
+            except ValueError as e:
+                results.append({'index': index, 'status': 'error', 'error': str(e)})
+                continue
+            valid_indexes.append(index)
+            valid_rows.append({
+                'content': content,
+                'entry_date': entry_date,
+                'created_at': now,
+                'updated_at': now,
+                'user_id': user_id,
+                'embedding_status': Entry.EMBEDDING_PENDING,
+                'embedding_attempts': 0
+            })
+        
+        if not valid_rows:
+            return jsonify({'error': 'No valid entries to import', 'results': results}), 400
+        
+        # Multi-row INSERT ... RETURNING in fixed-size batches, all in one transaction
+        statement = insert(Entry).returning(Entry.id, sort_by_parameter_order=True)
+        created_ids = []
+        for offset in range(0, len(valid_rows), BULK_INSERT_BATCH_SIZE):
+            batch = valid_rows[offset:offset + BULK_INSERT_BATCH_SIZE]
+            created_ids.extend(db.session.execute(statement, batch).scalars().all())
+        db.session.commit()
+        vector_search_engine.invalidate(user_id, entry_ids=created_ids)
+        
+        # Embeddings are computed by the background worker in provider-sized batches
+        embedding_worker.notify()
+        
+        for index, entry_id in zip(valid_indexes, created_ids):
+            results.append({'index': index, 'status': 'created', 'id': entry_id})
+        results.sort(key=lambda result: result['index'])
+        
+        elapsed = time.perf_counter() - started
+        return jsonify({
+            'created': len(created_ids),
+            'failed': len(rows) - len(created_ids),
+            'embedding_status': Entry.EMBEDDING_PENDING,
+            'results': results,
+            'elapsed_ms': round(elapsed * 1000, 1),
+            'rows_per_second': round(len(created_ids) / elapsed, 1) if elapsed > 0 else None
+        }), 201
+        
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error importing entries: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @entry_bp.route('/<int:entry_id>', methods=['PUT'])
 @jwt_required()
 def update_entry(entry_id):
@@ -125,26 +386,28 @@ def update_entry(entry_id):
             if entry_date > date.today():
                 return jsonify({'error': 'Entry date cannot be in the future'}), 400
         
-        # Try to generate new embedding for updated content
-        embedding = entry.embedding  # Keep existing embedding if AI fails
-        try:
-            new_embedding = llm_service.generate_embedding(content)
-            embedding = new_embedding
-            print(f"Updated embedding successfully: {len(embedding)} dimensions")
-        except Exception as e:
-            print(f"Warning: Could not update embedding: {str(e)}")
-            # Continue with existing embedding
+        # Re-embed in the background only when the text changed; the previous
+        # embedding keeps serving searches until the new one is ready
+        content_changed = content != entry.content
         
         # Update entry
         entry.content = content
         entry.entry_date = entry_date
-        entry.embedding = embedding
+        if content_changed:
+            entry.mark_embedding_pending()
+            # Chunks are verbatim copies of the old text, so they go with it;
+            # until the worker rebuilds them the entry is found at entry level
+            EntryChunk.query.filter_by(entry_id=entry.id).delete(synchronize_session=False)
         
         db.session.commit()
+        vector_search_engine.invalidate(user_id, entry_ids=[entry.id])
+        if content_changed:
+            embedding_worker.notify()
         
         return jsonify({
             'entry': entry.to_dict(),
-            'has_embedding': embedding is not None
+            'has_embedding': entry.has_embedding,
+            'embedding_status': entry.embedding_status
         }), 200
         
     except Exception as e:
@@ -165,6 +428,7 @@ def delete_entry(entry_id):
         
         db.session.delete(entry)
         db.session.commit()
+        vector_search_engine.invalidate(user_id, entry_ids=[entry_id])
         
         return jsonify({'message': 'Entry deleted successfully'}), 200
         
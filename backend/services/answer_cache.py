@@ -0,0 +1,191 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import case, func, select
+from extensions import db
+from models import Entry, EntryChunk
+
+# Minimum cosine similarity between query embeddings for a cached answer to be reused
+ANSWER_CACHE_SIMILARITY = float(os.getenv('ANSWER_CACHE_SIMILARITY', 0.95))
+
+DateRangeKey = Optional[Tuple[Optional[str], Optional[str]]]
+# (entries, last update, embedded entries, chunks) of one user, as stored in the database
+DataVersion = Tuple[int, Optional[str], int, int]
+
+class _UserAnswers:
+    """One user's cached answers: normalized query embeddings plus their payloads"""
+
+    __slots__ = ('vectors', 'answers')
+
+    def __init__(self):
+        self.vectors: Optional[np.ndarray] = None
+        self.answers: List[Tuple[float, DataVersion, DateRangeKey, Dict[str, Any]]] = []
+
+class AnswerCache:
+    """
+    Per-user semantic cache of AI search answers.
+
+    A question hits when its embedding is within ANSWER_CACHE_SIMILARITY of a
+    cached question's, it resolved to the same date range, and the user's data
+    version is unchanged. The data version is read from the database (entry
+    count, latest updated_at, embedded entries and chunks), so a create, edit,
+    delete or (re-)embedding made by any process changes it. The last version
+    seen is memoized per user only to drop stale answers early; bump() clears it
+    after a write in this process.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv('ANSWER_CACHE_ENABLED', 'true').lower() == 'true'
+        self.threshold = ANSWER_CACHE_SIMILARITY
+        self.ttl = float(os.getenv('ANSWER_CACHE_TTL_SECONDS', 15 * 60))
+        self.max_users = int(os.getenv('ANSWER_CACHE_MAX_USERS', 256))
+        self.max_per_user = int(os.getenv('ANSWER_CACHE_MAX_PER_USER', 32))
+        self._users: 'OrderedDict[int, _UserAnswers]' = OrderedDict()
+        self._versions: Dict[int, DataVersion] = {}
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'writes': 0, 'stale': 0}
+
+    @staticmethod
+    def date_range_key(date_filter: Optional[Dict[str, Any]]) -> DateRangeKey:
+        if not date_filter or not date_filter.get('has_date_filter'):
+            return None
+        return date_filter.get('start_date'), date_filter.get('end_date')
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    @staticmethod
+    def _load_version(user_id: int) -> DataVersion:
+        chunks = select(func.count(EntryChunk.id)).where(EntryChunk.user_id == user_id).scalar_subquery()
+        count, updated_at, embedded, chunk_count = db.session.execute(
+            select(
+                func.count(Entry.id),
+                func.max(Entry.updated_at),
+                func.coalesce(func.sum(case((Entry.embedding_status == Entry.EMBEDDING_READY, 1), else_=0)), 0),
+                chunks
+            ).where(Entry.user_id == user_id)
+        ).one()
+        return int(count), updated_at.isoformat() if updated_at else None, int(embedded), int(chunk_count)
+
+    def version(self, user_id: int) -> Optional[DataVersion]:
+        """
+        Current data version, or None if it cannot be read (nothing is cached
+        then). Read it before retrieval and pass it to get() and put().
+        """
+        if not self.enabled:
+            return None
+        try:
+            version = self._load_version(user_id)
+        except Exception as e:
+            print(f"⚠️ Answer cache version lookup failed: {e}")
+            db.session.rollback()
+            return None
+        with self._lock:
+            if self._versions.get(user_id) != version:
+                self._versions[user_id] = version
+                self._users.pop(user_id, None)
+        return version
+
+    def bump(self, user_id: int):
+        """Drop a user's cached answers after an entry write in this process"""
+        with self._lock:
+            self._versions.pop(user_id, None)
+            self._users.pop(user_id, None)
+
+    def get(
+        self,
+        user_id: int,
+        embedding: List[float],
+        date_filter: Optional[Dict[str, Any]],
+        version: Optional[DataVersion]
+    ) -> Optional[Dict[str, Any]]:
+        """The cached answer of the most similar matching question built at `version`, or None"""
+        if not self.enabled or version is None:
+            return None
+        query = self._normalize(embedding)
+        if query is None:
+            return None
+        date_key = self.date_range_key(date_filter)
+        now = time.monotonic()
+
+        with self._lock:
+            answers = self._users.get(user_id)
+            if answers is None or answers.vectors is None or answers.vectors.shape[1] != query.shape[0]:
+                self._counters['misses'] += 1
+                return None
+            self._users.move_to_end(user_id)
+
+            scores = answers.vectors @ query
+            for index in np.argsort(-scores):
+                if scores[index] < self.threshold:
+                    break
+                stored_at, stored_version, stored_date_key, payload = answers.answers[index]
+                if stored_date_key != date_key:
+                    continue
+                if stored_version != version or now - stored_at > self.ttl:
+                    self._counters['stale'] += 1
+                    continue
+                self._counters['hits'] += 1
+                return dict(payload, similarity=round(float(scores[index]), 4))
+
+            self._counters['misses'] += 1
+            return None
+
+    def put(
+        self,
+        user_id: int,
+        embedding: List[float],
+        date_filter: Optional[Dict[str, Any]],
+        version: Optional[DataVersion],
+        payload: Dict[str, Any]
+    ):
+        """Cache an answer built from data at `version`; dropped if the data changed meanwhile"""
+        if not self.enabled or version is None:
+            return
+        query = self._normalize(embedding)
+        if query is None:
+            return
+        entry = (time.monotonic(), version, self.date_range_key(date_filter), dict(payload))
+
+        with self._lock:
+            if version != self._versions.get(user_id):
+                return
+            answers = self._users.get(user_id)
+            if answers is None or (answers.vectors is not None and answers.vectors.shape[1] != query.shape[0]):
+                answers = self._users[user_id] = _UserAnswers()
+            self._users.move_to_end(user_id)
+
+            vectors = [query] if answers.vectors is None else list(answers.vectors) + [query]
+            answers.answers.append(entry)
+            if len(answers.answers) > self.max_per_user:
+                # Oldest first
+                vectors = vectors[-self.max_per_user:]
+                answers.answers = answers.answers[-self.max_per_user:]
+            answers.vectors = np.vstack(vectors)
+            self._counters['writes'] += 1
+
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            counters = dict(self._counters)
+            counters['users'] = len(self._users)
+            counters['answers'] = sum(len(answers.answers) for answers in self._users.values())
+        lookups = counters['hits'] + counters['misses']
+        counters['hit_rate'] = round(counters['hits'] / lookups, 4) if lookups else 0.0
+        return counters
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+
+# Convenience instance for easy import
+answer_cache = AnswerCache()
@@ -0,0 +1,197 @@
+import os
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Token budget for the entries section of an AI search prompt
+CONTEXT_TOKEN_BUDGET = int(os.getenv('AI_CONTEXT_TOKEN_BUDGET', 1500))
+# Entries that would get less than this are dropped rather than shown as a stub
+MIN_ENTRY_TOKENS = int(os.getenv('AI_CONTEXT_MIN_ENTRY_TOKENS', 40))
+# Target size of the passages long entries are split into for chunk embeddings
+CHUNK_TOKENS = int(os.getenv('EMBEDDING_CHUNK_TOKENS', 200))
+
+# Words are split into pieces of at most 6 characters and punctuation counts on its
+# own, which tracks BPE tokenizers (Llama, Gemini) closely for English prose
+# without shipping a tokenizer
+_TOKEN_PATTERN = re.compile(r"\w{1,6}|[^\w\s]")
+_SENTENCE_PATTERN = re.compile(r"[^.!?\n]+(?:[.!?]+|\n+|$)")
+_WORD_PATTERN = re.compile(r"[a-z0-9']+")
+STOPWORDS = frozenset(
+    "a an and are as at be but by did do does for from had has have how i in is it "
+    "me my of on or so that the this to was we were what when where which who why "
+    "with you your about done".split()
+)
+ELLIPSIS = '…'
+
+def count_tokens(text: str) -> int:
+    """Approximate the number of LLM tokens in text"""
+    return len(_TOKEN_PATTERN.findall(text))
+
+def query_terms(query: str) -> set:
+    """Lowercased content words of a query, without stopwords"""
+    return {word for word in _WORD_PATTERN.findall(query.lower()) if word not in STOPWORDS}
+
+def _allocate(costs: Sequence[int], weights: Sequence[float], budget: int) -> List[int]:
+    """
+    Split budget across entries in proportion to weight (water-filling): entries
+    that need less than their share get exactly what they need and the surplus is
+    redistributed among the rest.
+    """
+    allocation = [0] * len(costs)
+    remaining = set(range(len(costs)))
+    remaining_budget = budget
+    while remaining and remaining_budget > 0:
+        total_weight = sum(weights[i] for i in remaining)
+        satisfied = [
+            i for i in remaining
+            if costs[i] <= remaining_budget * weights[i] / total_weight
+        ]
+        if not satisfied:
+            for i in remaining:
+                allocation[i] = int(remaining_budget * weights[i] / total_weight)
+            break
+        for i in satisfied:
+            allocation[i] = costs[i]
+            remaining_budget -= costs[i]
+            remaining.remove(i)
+    return allocation
+
+def excerpt(text: str, query: str, max_tokens: int) -> str:
+    """
+    Trim text to about max_tokens, keeping the sentence with the most query terms
+    and growing the window around it one sentence at a time.
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+
+    sentences = [sentence.strip() for sentence in _SENTENCE_PATTERN.findall(text) if sentence.strip()]
+    if not sentences:
+        return ''
+
+    terms = query_terms(query)
+    scores = [len(terms & set(_WORD_PATTERN.findall(sentence.lower()))) for sentence in sentences]
+    costs = [count_tokens(sentence) for sentence in sentences]
+    best = max(range(len(sentences)), key=lambda i: (scores[i], -i))
+
+    if costs[best] > max_tokens:
+        # A single long sentence: keep its leading words
+        words = sentences[best].split()
+        kept = []
+        used = 0
+        for word in words:
+            used += count_tokens(word)
+            if used > max_tokens:
+                break
+            kept.append(word)
+        return (ELLIPSIS if best > 0 else '') + ' '.join(kept) + ELLIPSIS
+
+    lo = hi = best
+    used = costs[best]
+    while True:
+        # Prefer the neighbour that mentions more query terms
+        candidates = []
+        if lo > 0:
+            candidates.append((scores[lo - 1], lo - 1))
+        if hi < len(sentences) - 1:
+            candidates.append((scores[hi + 1], hi + 1))
+        candidates = [c for c in candidates if used + costs[c[1]] <= max_tokens]
+        if not candidates:
+            break
+        _, index = max(candidates)
+        used += costs[index]
+        lo, hi = min(lo, index), max(hi, index)
+
+    result = ' '.join(sentences[lo:hi + 1])
+    if lo > 0:
+        result = ELLIPSIS + result
+    if hi < len(sentences) - 1:
+        result += ELLIPSIS
+    return result
+
+def chunk_text(text: str, max_tokens: Optional[int] = None, overlap_sentences: int = 1) -> List[str]:
+    """
+    Split text into passages of about max_tokens along sentence boundaries, each
+    repeating the last overlap_sentences of the previous one for continuity.
+    Text that fits is returned as a single chunk.
+    """
+    max_tokens = CHUNK_TOKENS if max_tokens is None else max_tokens
+    if count_tokens(text) <= max_tokens:
+        return [text]
+
+    sentences = [sentence.strip() for sentence in _SENTENCE_PATTERN.findall(text) if sentence.strip()]
+    chunks = []
+    current: List[str] = []
+    used = 0
+    for sentence in sentences:
+        cost = count_tokens(sentence)
+        if current and used + cost > max_tokens:
+            chunks.append(' '.join(current))
+            current = current[-overlap_sentences:] if overlap_sentences else []
+            used = sum(count_tokens(kept) for kept in current)
+        current.append(sentence)
+        used += cost
+    if current:
+        chunks.append(' '.join(current))
+    return chunks
+
+def build_context(
+    query: str,
+    entries: Sequence[Tuple[str, str]],
+    budget: Optional[int] = None,
+    scores: Optional[Sequence[float]] = None
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    Assemble the entries section of a prompt within a token budget.
+
+    Args:
+        query: The user's question (used to pick excerpts)
+        entries: (label, content) pairs, most relevant first
+        budget: Token budget for the whole section (defaults to AI_CONTEXT_TOKEN_BUDGET)
+        scores: Relevance scores aligned with entries; defaults to 1/rank
+
+    Returns:
+        (context, report) where report counts tokens and trimmed/dropped entries
+    """
+    budget = CONTEXT_TOKEN_BUDGET if budget is None else budget
+    if scores is None:
+        scores = [1.0 / (rank + 1) for rank in range(len(entries))]
+    weights = [max(score, 1e-6) for score in scores]
+
+    prefixes = [f"{label}: " for label, _ in entries]
+    prefix_costs = [count_tokens(prefix) + 2 for prefix in prefixes]  # + separator
+    content_costs = [count_tokens(content) for _, content in entries]
+    allocation = _allocate(
+        [prefix + content for prefix, content in zip(prefix_costs, content_costs)],
+        weights,
+        budget
+    )
+
+    parts = []
+    trimmed = 0
+    dropped = 0
+    for (label, content), prefix, prefix_cost, content_cost, allowed in zip(
+        entries, prefixes, prefix_costs, content_costs, allocation
+    ):
+        content_budget = allowed - prefix_cost
+        if content_budget >= content_cost:
+            parts.append(prefix + content)
+        elif content_budget >= MIN_ENTRY_TOKENS:
+            parts.append(prefix + excerpt(content, query, content_budget))
+            trimmed += 1
+        else:
+            dropped += 1
+
+    if not parts and entries:
+        # Always answer from at least the most relevant entry
+        label, content = entries[0]
+        parts.append(prefixes[0] + excerpt(content, query, max(budget - prefix_costs[0], 1)))
+        trimmed += 1
+        dropped -= 1
+
+    context = "\n\n".join(parts)
+    return context, {
+        'budget': budget,
+        'context_tokens': count_tokens(context),
+        'entries_included': len(parts),
+        'entries_trimmed': trimmed,
+        'entries_dropped': dropped
+    }
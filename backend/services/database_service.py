@@ -1,14 +1,31 @@
 from extensions import db
-from models import Entry
-from typing import List, Dict, Any, Optional, Union, Tuple
+from models import Entry, EntryChunk, TEXT_SEARCH_CONFIG, content_tsv, full_text_table
+from services.context_builder import query_terms
+from services.date_parser import parse_date_range
+from services.vector_search import vector_search_engine
+from typing import List, Dict, Any, Optional, Union, Tuple, Iterator
 from datetime import datetime, date
 from pgvector.sqlalchemy import Vector
-from sqlalchemy import text
+from sqlalchemy import func, literal, literal_column, or_, select, text, tuple_, union_all
+from sqlalchemy.orm import load_only
 from sqlalchemy.exc import DisconnectionError, OperationalError
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
+# ANN index tuning applied per transaction in _vector_search (PostgreSQL + pgvector)
+VECTOR_SEARCH_EF_SEARCH = int(os.getenv('VECTOR_SEARCH_EF_SEARCH', 40))
+VECTOR_SEARCH_PROBES = int(os.getenv('VECTOR_SEARCH_PROBES', 10))
+VECTOR_SEARCH_ITERATIVE_SCAN = os.getenv('VECTOR_SEARCH_ITERATIVE_SCAN', '')
+if VECTOR_SEARCH_ITERATIVE_SCAN not in ('', 'off', 'relaxed_order', 'strict_order'):
+    raise ValueError(f"Invalid VECTOR_SEARCH_ITERATIVE_SCAN: {VECTOR_SEARCH_ITERATIVE_SCAN}")
+
+# Hybrid search: candidates taken from each ranking, and the reciprocal-rank
+# fusion constant (score = sum of 1 / (k + rank)); 60 is the usual default
+HYBRID_SEARCH_CANDIDATES = int(os.getenv('HYBRID_SEARCH_CANDIDATES', 50))
+HYBRID_RRF_K = int(os.getenv('HYBRID_RRF_K', 60))
+
 def handle_db_connection_error(func):
     """Decorator to handle database connection errors gracefully - only when they occur"""
     def wrapper(*args, **kwargs):
@@ -33,6 +50,45 @@ def handle_db_connection_error(func):
             raise
     return wrapper
 
+class SearchPlan:
+    """
+    The fallback chain of one search as ordered tiers; the first tier that
+    finds anything answers. Records how it ran and which tier answered.
+    """
+    
+    def __init__(self, user_id: int, limit: int):
+        self.user_id = user_id
+        self.limit = limit
+        # (name, start_date, end_date); name is 'hybrid', 'vector', 'date_filter' or 'query_dates'
+        self.tiers: List[Tuple[str, Optional[date], Optional[date]]] = []
+        self.engine: Optional[str] = None
+        self.chosen: Optional[str] = None
+        self.rows = 0
+        # The single statement, when one ran; compiled to SQL only on request
+        self.statement = None
+    
+    def add_tier(self, name: str, start_date: Optional[date] = None, end_date: Optional[date] = None):
+        self.tiers.append((name, start_date, end_date))
+    
+    def to_dict(self, include_sql: bool = False) -> Dict[str, Any]:
+        """Plan summary; include_sql adds the compiled statement, which exposes the schema"""
+        data = {
+            'tiers': [
+                {
+                    'name': name,
+                    'start_date': start_date.isoformat() if start_date else None,
+                    'end_date': end_date.isoformat() if end_date else None
+                }
+                for name, start_date, end_date in self.tiers
+            ],
+            'engine': self.engine,
+            'chosen': self.chosen,
+            'rows': self.rows
+        }
+        if include_sql:
+            data['sql'] = str(self.statement.compile(dialect=db.engine.dialect)) if self.statement is not None else None
+        return data
+
 class DatabaseService:
     """Refactored database service with unified search functionality"""
     
@@ -45,11 +101,14 @@ class DatabaseService:
         date_filter: Optional[Dict[str, Any]] = None,
         start_date: Optional[date] = None,
         end_date: Optional[date] = None,
-        limit: int = 10
+        limit: int = 10,
+        keywords: Optional[str] = None
     ) -> List[Entry]:
         """
         Unified search method that handles all search scenarios:
         - Vector similarity search (with embedding)
+        - Hybrid keyword + vector search (with embedding and keywords)
+        - Keyword search (with keywords but no embedding or dates)
         - Date-based search (with query parsing or explicit dates) 
         - Combined vector + date filtering
         - Pure date range search
@@ -62,6 +121,7 @@ class DatabaseService:
             start_date: Explicit start date for filtering
             end_date: Explicit end date for filtering  
             limit: Maximum number of entries to return
+            keywords: Text matched against entry content by full-text search
             
         Returns:
             List of matching entries, ordered by relevance
@@ -75,12 +135,21 @@ class DatabaseService:
             )
             
             # Step 2: Perform the appropriate search strategy
-            if embedding:
+            if embedding and keywords:
+                # Keyword and vector rankings fused in one statement
+                entries = DatabaseService._hybrid_search(
+                    embedding, keywords, user_id, search_start_date, search_end_date, limit
+                )
+                print(f"🧬 Hybrid search found {len(entries)} entries")
+            elif embedding:
                 # Vector similarity search (with optional date filtering)
                 entries = DatabaseService._vector_search(
                     embedding, user_id, search_start_date, search_end_date, limit
                 )
                 print(f"🧠 Vector search found {len(entries)} entries")
+            elif keywords and not (search_start_date and search_end_date):
+                entries = DatabaseService._keyword_search(keywords, user_id, None, None, limit)
+                print(f"🔤 Keyword search found {len(entries)} entries")
             else:
                 # Pure date-based search
                 entries = DatabaseService._date_only_search(
@@ -144,30 +213,28 @@ class DatabaseService:
         limit: int
     ) -> List[Entry]:
         """Perform vector similarity search with optional date filtering"""
+        # pgvector operators only exist on PostgreSQL; SQLite and others use the
+        # in-process matrix search
+        if db.engine.dialect.name != 'postgresql':
+            return DatabaseService._in_process_vector_search(
+                embedding, user_id, start_date, end_date, limit
+            )
+        
         try:
             print(f"🧠 Vector search with date filter: {start_date} to {end_date}")
             
+            # Trade recall for latency on the ANN index for this transaction only
+            DatabaseService._configure_vector_index_session()
+            
             # Base query for vector similarity
             query = db.session.query(Entry).filter(
                 Entry.user_id == user_id,
                 Entry.embedding_vector.isnot(None)
             )
             
-            # Add date filtering if specified
+            # Add date filtering if specified (index range scan on user_id, effective_date)
             if start_date and end_date:
-                query = query.filter(
-                    db.or_(
-                        db.and_(
-                            Entry.entry_date >= start_date,
-                            Entry.entry_date <= end_date
-                        ),
-                        db.and_(
-                            Entry.entry_date.is_(None),
-                            db.func.date(Entry.created_at) >= start_date,
-                            db.func.date(Entry.created_at) <= end_date
-                        )
-                    )
-                )
+                query = query.filter(Entry.effective_date.between(start_date, end_date))
             
             # Apply vector similarity ordering
             entries = query.order_by(
@@ -178,66 +245,241 @@ class DatabaseService:
             
         except Exception as e:
             print(f"❌ pgvector search failed: {e}, falling back...")
-            return DatabaseService._fallback_vector_search(
+            # A failed statement aborts the transaction on PostgreSQL
+            db.session.rollback()
+            return DatabaseService._in_process_vector_search(
                 embedding, user_id, start_date, end_date, limit
             )
     
     @staticmethod
-    def _fallback_vector_search(
+    def _text_search_query(keywords: str):
+        """
+        OR of the keyword's content words as a tsquery, or None if nothing is left.
+        Terms are built from [a-z0-9] only, so to_tsquery never sees operators.
+        """
+        terms = sorted({term.replace("'", '') for term in query_terms(keywords)} - {''})
+        if not terms:
+            return None
+        return func.to_tsquery(TEXT_SEARCH_CONFIG, ' | '.join(terms))
+    
+    @staticmethod
+    def _rank_fusion(model, embedding: List[float], ts_query, filters):
+        """
+        Subquery of (id, score) fusing the vector and keyword rankings of model rows
+        with reciprocal-rank fusion. Each side is a CTE that takes its top
+        HYBRID_SEARCH_CANDIDATES from its own index (HNSW / GIN); a full outer join
+        keeps rows found by only one side.
+        """
+        tsv = content_tsv(model)
+        
+        def ranked(order, condition, name):
+            statement = select(model.id, func.row_number().over(order_by=order).label('rank'))
+            if model is EntryChunk:
+                statement = statement.join(Entry, Entry.id == EntryChunk.entry_id)
+            return statement.where(*filters, condition).order_by(order).limit(
+                HYBRID_SEARCH_CANDIDATES
+            ).cte(name)
+        
+        vector = ranked(
+            model.embedding_vector.cosine_distance(embedding),
+            model.embedding_vector.isnot(None),
+            'vector_ranked'
+        )
+        keyword = ranked(
+            func.ts_rank_cd(tsv, ts_query).desc(),
+            tsv.op('@@')(ts_query),
+            'keyword_ranked'
+        )
+        score = (
+            func.coalesce(1.0 / (HYBRID_RRF_K + vector.c.rank), 0.0) +
+            func.coalesce(1.0 / (HYBRID_RRF_K + keyword.c.rank), 0.0)
+        )
+        return select(
+            func.coalesce(vector.c.id, keyword.c.id).label('id'),
+            score.label('score')
+        ).select_from(
+            vector.join(keyword, vector.c.id == keyword.c.id, full=True)
+        ).subquery('fused')
+    
+    @staticmethod
+    def _hybrid_search(
         embedding: List[float],
+        keywords: str,
         user_id: int,
-        start_date: Optional[date], 
+        start_date: Optional[date],
         end_date: Optional[date],
         limit: int
     ) -> List[Entry]:
-        """Fallback vector search using JSON embeddings and Python similarity"""
+        """
+        Keyword + vector search fused with RRF: in a single statement on
+        PostgreSQL, from the in-process vector ranking and FTS5 elsewhere
+        """
+        filters = [Entry.user_id == user_id]
+        if start_date and end_date:
+            filters.append(Entry.effective_date.between(start_date, end_date))
+        
+        if db.engine.dialect.name != 'postgresql':
+            vector_ranked = vector_search_engine.search(
+                embedding, user_id, start_date, end_date, HYBRID_SEARCH_CANDIDATES
+            )
+            keyword_ranked = DatabaseService._keyword_ranked_ids(Entry, keywords, filters, HYBRID_SEARCH_CANDIDATES)
+            fused = DatabaseService._reciprocal_rank_fusion(
+                [entry_id for entry_id, _ in vector_ranked], keyword_ranked
+            )[:limit]
+            return DatabaseService._load_in_order(Entry, [entry_id for entry_id, _ in fused])
+        
+        ts_query = DatabaseService._text_search_query(keywords)
+        if ts_query is None:
+            return DatabaseService._vector_search(embedding, user_id, start_date, end_date, limit)
+        
         try:
-            import math
-            print("🔄 Using fallback vector search")
+            print(f"🧬 Hybrid search with date filter: {start_date} to {end_date}")
+            DatabaseService._configure_vector_index_session()
+            fused = DatabaseService._rank_fusion(Entry, embedding, ts_query, filters)
             
-            # Get base entries
-            query = Entry.query.filter_by(user_id=user_id).filter(Entry.embedding_json.isnot(None))
+            return db.session.scalars(
+                select(Entry).join(fused, fused.c.id == Entry.id).order_by(
+                    fused.c.score.desc(), Entry.id.desc()
+                ).limit(limit)
+            ).all()
             
-            # Apply date filtering
+        except Exception as e:
+            print(f"❌ Hybrid search failed: {e}, falling back to vector search...")
+            db.session.rollback()
+            return DatabaseService._vector_search(embedding, user_id, start_date, end_date, limit)
+    
+    @staticmethod
+    def _reciprocal_rank_fusion(*rankings: List[int]) -> List[Tuple[int, float]]:
+        """Fuse id rankings (best first) into (id, RRF score) pairs, best first"""
+        scores: Dict[int, float] = {}
+        for ranking in rankings:
+            for rank, item_id in enumerate(ranking, start=1):
+                scores[item_id] = scores.get(item_id, 0.0) + 1.0 / (HYBRID_RRF_K + rank)
+        return sorted(scores.items(), key=lambda item: (-item[1], -item[0]))
+    
+    @staticmethod
+    def _load_in_order(model, ids: List[int]) -> list:
+        """Load rows by id in one query, keeping the order of ids"""
+        if not ids:
+            return []
+        rows = {row.id: row for row in model.query.filter(model.id.in_(ids)).all()}
+        return [rows[row_id] for row_id in ids if row_id in rows]
+    
+    @staticmethod
+    def _keyword_ranked_ids(model, keywords: str, filters, limit: int) -> List[int]:
+        """
+        Ids of model rows matching keywords, best first (non-PostgreSQL).
+        
+        Uses the FTS5 shadow table ranked by bm25 when SQLite has it, otherwise
+        a substring match ordered by date.
+        """
+        terms = sorted(query_terms(keywords))
+        if not terms:
+            return []
+        
+        statement = select(model.id)
+        if model is EntryChunk:
+            statement = statement.join(Entry, Entry.id == EntryChunk.entry_id)
+        statement = statement.where(*filters)
+        
+        if db.engine.dialect.name == 'sqlite':
+            fts = full_text_table(model)
+            fts_name = literal_column(fts.name)
+            # Each term is quoted, so FTS5 reads it as a string and not as syntax
+            match = ' OR '.join(f'"{term}"' for term in terms)
+            try:
+                return list(db.session.scalars(
+                    statement.join(fts, fts.c.rowid == model.id).where(
+                        fts_name.op('MATCH')(match)
+                    ).order_by(func.bm25(fts_name)).limit(limit)
+                ))
+            except Exception as e:
+                print(f"⚠️ FTS5 search unavailable, using substring match: {e}")
+                db.session.rollback()
+        
+        # Terms are [a-z0-9'] only, so they need no LIKE escaping
+        return list(db.session.scalars(
+            statement.where(
+                or_(*[model.content.ilike(f'%{term}%') for term in terms])
+            ).order_by(Entry.effective_date.desc(), model.id.desc()).limit(limit)
+        ))
+    
+    @staticmethod
+    def _keyword_search(
+        keywords: str,
+        user_id: int,
+        start_date: Optional[date],
+        end_date: Optional[date],
+        limit: int
+    ) -> List[Entry]:
+        """Full-text search: ts_rank_cd over the GIN index on PostgreSQL, FTS5 bm25 on SQLite"""
+        try:
+            filters = [Entry.user_id == user_id]
             if start_date and end_date:
-                query = query.filter(
-                    db.or_(
-                        db.and_(
-                            Entry.entry_date >= start_date,
-                            Entry.entry_date <= end_date
-                        ),
-                        db.and_(
-                            Entry.entry_date.is_(None),
-                            db.func.date(Entry.created_at) >= start_date,
-                            db.func.date(Entry.created_at) <= end_date
-                        )
-                    )
+                filters.append(Entry.effective_date.between(start_date, end_date))
+            
+            if db.engine.dialect.name != 'postgresql':
+                return DatabaseService._load_in_order(
+                    Entry, DatabaseService._keyword_ranked_ids(Entry, keywords, filters, limit)
                 )
             
-            all_entries = query.all()
+            ts_query = DatabaseService._text_search_query(keywords)
+            if ts_query is None:
+                return []
+            tsv = content_tsv(Entry)
+            return Entry.query.filter(*filters, tsv.op('@@')(ts_query)).order_by(
+                func.ts_rank_cd(tsv, ts_query).desc(), Entry.id.desc()
+            ).limit(limit).all()
+            
+        except Exception as e:
+            print(f"❌ Keyword search failed: {e}")
+            db.session.rollback()
+            return []
+    
+    @staticmethod
+    def _configure_vector_index_session():
+        """
+        Apply ANN search settings with SET LOCAL so they only affect the current
+        transaction. hnsw.ef_search is the HNSW candidate list size and
+        ivfflat.probes the number of IVF lists scanned; higher values raise recall
+        at the cost of latency. hnsw.iterative_scan (pgvector >= 0.8) keeps scanning
+        when the user_id/date filters discard too many candidates.
+        """
+        if db.engine.dialect.name != 'postgresql':
+            return
+        
+        settings = [
+            ('hnsw.ef_search', VECTOR_SEARCH_EF_SEARCH),
+            ('ivfflat.probes', VECTOR_SEARCH_PROBES),
+        ]
+        if VECTOR_SEARCH_ITERATIVE_SCAN:
+            settings.append(('hnsw.iterative_scan', VECTOR_SEARCH_ITERATIVE_SCAN))
+        
+        for name, value in settings:
+            # SET does not accept bind parameters; values come from validated config
+            db.session.execute(text(f"SET LOCAL {name} = {value}"))
+    
+    @staticmethod
+    def _in_process_vector_search(
+        embedding: List[float],
+        user_id: int,
+        start_date: Optional[date], 
+        end_date: Optional[date],
+        limit: int
+    ) -> List[Entry]:
+        """In-process vector search over the user's cached NumPy embedding matrix"""
+        try:
+            print("🔄 Using in-process vector search")
             
-            # Calculate similarities
-            similarities = []
-            for entry in all_entries:
-                if entry.embedding:
-                    try:
-                        # Cosine similarity calculation
-                        a, b = embedding, entry.embedding
-                        dot_product = sum(x * y for x, y in zip(a, b))
-                        magnitude_a = math.sqrt(sum(x * x for x in a))
-                        magnitude_b = math.sqrt(sum(x * x for x in b))
-                        
-                        similarity = dot_product / (magnitude_a * magnitude_b) if magnitude_a and magnitude_b else 0
-                        similarities.append((entry, similarity))
-                    except (ValueError, TypeError):
-                        continue
+            ranked = vector_search_engine.search(embedding, user_id, start_date, end_date, limit)
+            if not ranked:
+                return []
             
-            # Sort by similarity and return top results
-            similarities.sort(key=lambda x: x[1], reverse=True)
-            return [entry for entry, _ in similarities[:limit]]
+            # Load the winning entries in one query and restore similarity order
+            return DatabaseService._load_in_order(Entry, [entry_id for entry_id, _ in ranked])
             
         except Exception as e:
-            print(f"❌ Fallback search failed: {e}")
+            print(f"❌ In-process vector search failed: {e}")
             return []
     
     @staticmethod
@@ -263,21 +505,15 @@ class DatabaseService:
             
             print(f"📅 Date-only search: {start_date} to {end_date}")
             
-            # Search by entry_date first
+            # Single range scan over effective_date (entry_date, falling back to created_at)
             entries = Entry.query.filter(
                 Entry.user_id == user_id,
-                Entry.entry_date >= start_date,
-                Entry.entry_date <= end_date
+                Entry.effective_date.between(start_date, end_date)
+            ).order_by(
+                Entry.effective_date.desc(),
+                Entry.id.desc()
             ).limit(limit).all()
             
-            # Fallback to created_at if no entries found
-            if not entries:
-                entries = Entry.query.filter(
-                    Entry.user_id == user_id,
-                    db.func.date(Entry.created_at) >= start_date,
-                    db.func.date(Entry.created_at) <= end_date
-                ).limit(limit).all()
-            
             return entries
             
         except Exception as e:
@@ -286,77 +522,266 @@ class DatabaseService:
     
     @staticmethod
     def _parse_dates_from_query(query: str) -> Optional[Tuple[date, date]]:
-        """Parse date ranges from natural language query using regex patterns"""
+        """Parse a date range from a natural language query with the precompiled local parser"""
         try:
-            import re
-            from datetime import timedelta
-            import calendar
+            parsed = parse_date_range(query)
+            return (parsed.start, parsed.end) if parsed else None
+        except Exception as e:
+            print(f"❌ Date parsing failed: {e}")
+            return None
+
+    @staticmethod
+    @handle_db_connection_error
+    def find_similar_chunks(
+        embedding: List[float],
+        user_id: int,
+        date_filter: Optional[Dict[str, Any]] = None,
+        limit: int = 20,
+        keywords: Optional[str] = None
+    ) -> List[Tuple[EntryChunk, date, float]]:
+        """
+        Passage-level vector search over entry chunks. With keywords, full-text
+        matches are fused in with reciprocal-rank fusion.
+        
+        Returns:
+            (chunk, effective_date of its entry, relevance score) tuples, best
+            first; the score is the cosine similarity, or the RRF score when fused
+        """
+        try:
+            start_date, end_date = DatabaseService._resolve_date_constraints(None, date_filter, None, None)
             
-            query_lower = query.lower()
-            today = datetime.now().date()
+            if db.engine.dialect.name != 'postgresql':
+                ranked = vector_search_engine.search(
+                    embedding, user_id, start_date, end_date,
+                    HYBRID_SEARCH_CANDIDATES if keywords else limit, source='chunks'
+                )
+                if keywords:
+                    filters = [EntryChunk.user_id == user_id]
+                    if start_date and end_date:
+                        filters.append(Entry.effective_date.between(start_date, end_date))
+                    keyword_ranked = DatabaseService._keyword_ranked_ids(
+                        EntryChunk, keywords, filters, HYBRID_SEARCH_CANDIDATES
+                    )
+                    if keyword_ranked:
+                        ranked = DatabaseService._reciprocal_rank_fusion(
+                            [chunk_id for chunk_id, _ in ranked], keyword_ranked
+                        )
+                    ranked = ranked[:limit]
+                if not ranked:
+                    return []
+                rows = db.session.query(EntryChunk, Entry.effective_date).join(
+                    Entry, Entry.id == EntryChunk.entry_id
+                ).filter(EntryChunk.id.in_([chunk_id for chunk_id, _ in ranked])).all()
+                by_id = {chunk.id: (chunk, effective_date) for chunk, effective_date in rows}
+                return [
+                    by_id[chunk_id] + (similarity,)
+                    for chunk_id, similarity in ranked if chunk_id in by_id
+                ]
             
-            # Relative date patterns
-            if re.search(r'\b(current month|this month)\b', query_lower):
-                start_date = today.replace(day=1)
-                last_day = calendar.monthrange(today.year, today.month)[1]
-                end_date = today.replace(day=last_day)
-                return start_date, end_date
-                
-            elif re.search(r'\b(last month|previous month)\b', query_lower):
-                if today.month == 1:
-                    prev_month, prev_year = 12, today.year - 1
-                else:
-                    prev_month, prev_year = today.month - 1, today.year
-                start_date = date(prev_year, prev_month, 1)
-                last_day = calendar.monthrange(prev_year, prev_month)[1]
-                end_date = date(prev_year, prev_month, last_day)
-                return start_date, end_date
-                
-            elif re.search(r'\b(this week|current week)\b', query_lower):
-                days_since_monday = today.weekday()
-                start_date = today - timedelta(days=days_since_monday)
-                end_date = start_date + timedelta(days=6)
-                return start_date, end_date
-                
-            elif re.search(r'\b(last week|previous week)\b', query_lower):
-                days_since_monday = today.weekday()
-                this_monday = today - timedelta(days=days_since_monday)
-                start_date = this_monday - timedelta(days=7)
-                end_date = start_date + timedelta(days=6)
-                return start_date, end_date
+            DatabaseService._configure_vector_index_session()
+            ts_query = DatabaseService._text_search_query(keywords) if keywords else None
+            if ts_query is not None:
+                filters = [EntryChunk.user_id == user_id]
+                if start_date and end_date:
+                    filters.append(Entry.effective_date.between(start_date, end_date))
+                fused = DatabaseService._rank_fusion(EntryChunk, embedding, ts_query, filters)
+                rows = db.session.execute(
+                    select(EntryChunk, Entry.effective_date, fused.c.score).join(
+                        fused, fused.c.id == EntryChunk.id
+                    ).join(
+                        Entry, Entry.id == EntryChunk.entry_id
+                    ).order_by(fused.c.score.desc(), EntryChunk.id).limit(limit)
+                ).all()
+                return [(chunk, effective_date, float(score)) for chunk, effective_date, score in rows]
             
-            # Specific date patterns (simplified - add more as needed)
-            month_map = {
-                'jan': 1, 'january': 1, 'feb': 2, 'february': 2, 'mar': 3, 'march': 3,
-                'apr': 4, 'april': 4, 'may': 5, 'jun': 6, 'june': 6,
-                'jul': 7, 'july': 7, 'aug': 8, 'august': 8, 'sep': 9, 'september': 9,
-                'oct': 10, 'october': 10, 'nov': 11, 'november': 11, 'dec': 12, 'december': 12
-            }
+            distance = EntryChunk.embedding_vector.cosine_distance(embedding)
+            query = db.session.query(EntryChunk, Entry.effective_date, distance).join(
+                Entry, Entry.id == EntryChunk.entry_id
+            ).filter(
+                EntryChunk.user_id == user_id,
+                EntryChunk.embedding_vector.isnot(None)
+            )
+            if start_date and end_date:
+                query = query.filter(Entry.effective_date.between(start_date, end_date))
             
-            # Match "August 2025" or "aug 2025" patterns
-            month_year_pattern = r'\b(jan|january|feb|february|mar|march|apr|april|may|jun|june|jul|july|aug|august|sep|september|oct|october|nov|november|dec|december)\s+(\d{4})\b'
-            match = re.search(month_year_pattern, query_lower)
-            if match:
-                month_name, year_str = match.groups()
-                month_num = month_map.get(month_name.lower())
-                year = int(year_str)
-                if month_num:
-                    start_date = date(year, month_num, 1)
-                    last_day = calendar.monthrange(year, month_num)[1]
-                    end_date = date(year, month_num, last_day)
-                    return start_date, end_date
+            rows = query.order_by(distance).limit(limit).all()
+            return [(chunk, effective_date, 1 - float(dist)) for chunk, effective_date, dist in rows]
             
-            return None
+        except Exception as e:
+            print(f"❌ Chunk search failed: {e}")
+            db.session.rollback()
+            return []
+    
+    @staticmethod
+    @handle_db_connection_error
+    def chunkless_entry_ids(
+        user_id: int,
+        entry_ids: Optional[List[int]] = None,
+        limit: Optional[int] = None
+    ) -> List[int]:
+        """Ids of the user's entries without chunks yet (new, edited or awaiting the backfill), optionally among entry_ids"""
+        has_chunks = db.session.query(EntryChunk.id).filter(EntryChunk.entry_id == Entry.id).exists()
+        query = db.session.query(Entry.id).filter(Entry.user_id == user_id, ~has_chunks)
+        if entry_ids is not None:
+            query = query.filter(Entry.id.in_(entry_ids))
+        if limit is not None:
+            query = query.limit(limit)
+        return [entry_id for entry_id, in query.all()]
+    
+    # Planned search: the whole AI search fallback chain as one statement
+    @staticmethod
+    def plan_search(
+        user_id: int,
+        query: Optional[str],
+        embedding: Optional[List[float]],
+        date_filter: Optional[Dict[str, Any]] = None,
+        limit: int = 10,
+        keywords: Optional[str] = None
+    ) -> SearchPlan:
+        """
+        Compile the fallback chain into tiers. With an LLM date range: similarity
+        search within it, then every entry in it. Without one: similarity search,
+        then the dates the local parser finds in the query.
+        """
+        plan = SearchPlan(user_id, limit)
+        start_date, end_date = DatabaseService._resolve_date_constraints(None, date_filter, None, None)
+        similarity = 'hybrid' if keywords else 'vector'
+        
+        if start_date and end_date:
+            if embedding:
+                plan.add_tier(similarity, start_date, end_date)
+            plan.add_tier('date_filter', start_date, end_date)
+        else:
+            if embedding:
+                plan.add_tier(similarity)
+            parsed = DatabaseService._parse_dates_from_query(query) if query else None
+            if parsed:
+                plan.add_tier('query_dates', *parsed)
+        return plan
+    
+    @staticmethod
+    @handle_db_connection_error
+    def planned_search(
+        user_id: int,
+        query: Optional[str],
+        embedding: Optional[List[float]],
+        date_filter: Optional[Dict[str, Any]] = None,
+        limit: int = 10,
+        keywords: Optional[str] = None
+    ) -> Tuple[List[Entry], SearchPlan]:
+        """
+        Run the fallback chain of plan_search and return the entries of the first
+        tier that finds any, with the executed plan.
+        
+        On PostgreSQL every tier is a ranked branch of one UNION ALL and only rows
+        of the best non-empty tier are returned, so the chain costs one database
+        round trip. Elsewhere similarity ranking happens in process, so the tiers
+        run in turn.
+        """
+        plan = DatabaseService.plan_search(user_id, query, embedding, date_filter, limit, keywords)
+        try:
+            if not plan.tiers:
+                plan.engine = 'none'
+                return [], plan
+            
+            if db.engine.dialect.name == 'postgresql':
+                try:
+                    entries = DatabaseService._run_plan_statement(plan, embedding, keywords)
+                    logger.debug(f"Search plan {plan.to_dict()['tiers']} answered by {plan.chosen} ({plan.rows} entries)")
+                    return entries, plan
+                except Exception as e:
+                    print(f"❌ Planned search statement failed: {e}, running tiers in turn...")
+                    db.session.rollback()
+            
+            entries = DatabaseService._run_plan_tiers(plan, embedding, keywords)
+            logger.debug(f"Search plan {plan.to_dict()['tiers']} answered by {plan.chosen} ({plan.rows} entries)")
+            return entries, plan
             
         except Exception as e:
-            print(f"❌ Date parsing failed: {e}")
-            return None
-
+            print(f"❌ Error in planned search: {str(e)}")
+            return [], plan
+    
+    @staticmethod
+    def _plan_branch(position: int, tier, user_id: int, embedding, ts_query, limit: int):
+        """One tier as a select of (id, tier, rank), ranked best first"""
+        name, start_date, end_date = tier
+        filters = [Entry.user_id == user_id]
+        if start_date and end_date:
+            filters.append(Entry.effective_date.between(start_date, end_date))
+        
+        if name == 'hybrid' and ts_query is not None:
+            fused = DatabaseService._rank_fusion(Entry, embedding, ts_query, filters)
+            order = (fused.c.score.desc(), fused.c.id.desc())
+            statement = select(fused.c.id, literal(position).label('tier'), func.row_number().over(order_by=order).label('rank'))
+            return statement.order_by(*order).limit(limit)
+        
+        if name in ('hybrid', 'vector'):
+            order = (Entry.embedding_vector.cosine_distance(embedding),)
+            filters.append(Entry.embedding_vector.isnot(None))
+        else:
+            order = (Entry.effective_date.desc(), Entry.id.desc())
+        statement = select(Entry.id, literal(position).label('tier'), func.row_number().over(order_by=order).label('rank'))
+        return statement.where(*filters).order_by(*order).limit(limit)
+    
+    @staticmethod
+    def _run_plan_statement(plan: SearchPlan, embedding, keywords) -> List[Entry]:
+        """Execute all tiers as one ranked UNION ALL (PostgreSQL)"""
+        plan.engine = 'union'
+        ts_query = DatabaseService._text_search_query(keywords) if keywords else None
+        if any(name in ('hybrid', 'vector') for name, _, _ in plan.tiers):
+            DatabaseService._configure_vector_index_session()
+        
+        # Each branch is its own subquery so its ORDER BY/LIMIT stay local to it
+        branches = [
+            select(branch.c.id, branch.c.tier, branch.c.rank).select_from(branch)
+            for branch in (
+                DatabaseService._plan_branch(
+                    position, tier, plan.user_id, embedding, ts_query, plan.limit
+                ).subquery(f'tier_{position}')
+                for position, tier in enumerate(plan.tiers)
+            )
+        ]
+        candidates = union_all(*branches).cte('candidates')
+        best_tier = select(func.min(candidates.c.tier)).scalar_subquery()
+        statement = select(Entry, candidates.c.tier).join(
+            candidates, candidates.c.id == Entry.id
+        ).where(
+            candidates.c.tier == best_tier
+        ).order_by(candidates.c.rank)
+        plan.statement = statement
+        
+        rows = db.session.execute(statement).all()
+        entries = [entry for entry, _ in rows]
+        if rows:
+            plan.chosen = plan.tiers[rows[0].tier][0]
+        plan.rows = len(entries)
+        return entries
+    
+    @staticmethod
+    def _run_plan_tiers(plan: SearchPlan, embedding, keywords) -> List[Entry]:
+        """Execute tiers in turn until one finds entries (non-PostgreSQL, or statement failure)"""
+        plan.engine = 'sequential'
+        for name, start_date, end_date in plan.tiers:
+            if name == 'hybrid':
+                entries = DatabaseService._hybrid_search(embedding, keywords, plan.user_id, start_date, end_date, plan.limit)
+            elif name == 'vector':
+                entries = DatabaseService._vector_search(embedding, plan.user_id, start_date, end_date, plan.limit)
+            else:
+                entries = DatabaseService._date_only_search(None, plan.user_id, start_date, end_date, plan.limit)
+            if entries:
+                plan.chosen = name
+                plan.rows = len(entries)
+                return entries
+        return []
+    
     # Legacy compatibility methods (delegate to unified search)
     @staticmethod
-    def find_similar_entries(embedding: List[float], user_id: int, limit: int = 10) -> List[Entry]:
+    def find_similar_entries(embedding: List[float], user_id: int, limit: int = 10,
+                             keywords: Optional[str] = None) -> List[Entry]:
         """Legacy method - delegates to unified search"""
-        return DatabaseService.search_entries(user_id=user_id, embedding=embedding, limit=limit)
+        return DatabaseService.search_entries(
+            user_id=user_id, embedding=embedding, limit=limit, keywords=keywords
+        )
     
     @staticmethod
     def find_entries_by_date_query(query: str, user_id: int) -> List[Entry]:
@@ -385,10 +810,12 @@ class DatabaseService:
     
     @staticmethod
     def find_similar_entries_with_llm_date_filter(embedding: List[float], user_id: int, 
-                                                  date_filter: Dict[str, Any] = None, limit: int = 10) -> List[Entry]:
+                                                  date_filter: Dict[str, Any] = None, limit: int = 10,
+                                                  keywords: Optional[str] = None) -> List[Entry]:
         """Legacy method - delegates to unified search"""
         return DatabaseService.search_entries(
-            user_id=user_id, embedding=embedding, date_filter=date_filter, limit=limit
+            user_id=user_id, embedding=embedding, date_filter=date_filter, limit=limit,
+            keywords=keywords
         )
     
     @staticmethod
@@ -396,6 +823,76 @@ class DatabaseService:
         """Legacy method - delegates to unified search"""
         return DatabaseService.search_entries(user_id=user_id, date_filter=date_filter)
     
+    # Listing
+    @staticmethod
+    @handle_db_connection_error
+    def list_entries(
+        user_id: int,
+        limit: Optional[int] = None,
+        after: Optional[Tuple[date, datetime, int]] = None,
+        fields: Optional[List[str]] = None
+    ) -> List[Entry]:
+        """
+        List a user's entries newest first, keyset-paginated on (entry_date, updated_at, id).
+
+        Args:
+            user_id: User ID to filter entries
+            limit: Maximum number of entries to return (None returns everything)
+            after: Sort key of the last entry on the previous page
+            fields: Public Entry fields to load; embedding columns are never loaded
+
+        Returns:
+            List of entries with only the requested columns populated
+        """
+        # Sort key columns are always loaded so the caller can build the next cursor
+        columns = Entry.columns_for_fields(
+            list(fields or Entry.SERIALIZABLE_FIELDS) + ['entry_date', 'updated_at', 'id']
+        )
+
+        query = Entry.query.options(load_only(*columns)).filter(Entry.user_id == user_id)
+
+        if after is not None:
+            # Row-value comparison walks the composite index backwards from the cursor
+            query = query.filter(
+                tuple_(Entry.entry_date, Entry.updated_at, Entry.id) < tuple_(*after)
+            )
+
+        query = query.order_by(
+            Entry.entry_date.desc(),
+            Entry.updated_at.desc(),
+            Entry.id.desc()
+        )
+
+        if limit is not None:
+            query = query.limit(limit)
+
+        return query.all()
+
+    @staticmethod
+    def iter_entries(
+        user_id: int,
+        fields: Optional[List[str]] = None,
+        batch_size: int = 500
+    ) -> Iterator[Entry]:
+        """
+        Stream a user's entries oldest first without materializing them.
+
+        Uses yield_per, which fetches through a server-side cursor on PostgreSQL,
+        so memory stays bounded by batch_size regardless of how many entries exist.
+        Embedding columns are never loaded.
+        """
+        columns = Entry.columns_for_fields(list(fields or Entry.SERIALIZABLE_FIELDS))
+        statement = select(Entry).options(load_only(*columns)).where(
+            Entry.user_id == user_id
+        ).order_by(
+            Entry.entry_date.asc(),
+            Entry.updated_at.asc(),
+            Entry.id.asc()
+        ).execution_options(yield_per=batch_size)
+
+        for entry in db.session.execute(statement).scalars():
+            yield entry
+
     # Utility methods
     @staticmethod
     def create_entry_with_embedding(content: str, user_id: int, embedding: List[float]) -> Entry:
@@ -407,6 +904,7 @@ class DatabaseService:
         entry.embedding = embedding
         db.session.add(entry)
         db.session.commit()
+        vector_search_engine.invalidate(user_id, entry_ids=[entry.id])
         return entry
     
     @staticmethod
@@ -416,4 +914,5 @@ class DatabaseService:
         entry.content = content
         entry.embedding = embedding
         db.session.commit()
+        vector_search_engine.invalidate(entry.user_id, entry_ids=[entry.id])
         return entry
\ No newline at end of file
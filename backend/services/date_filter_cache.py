@@ -0,0 +1,93 @@
+import os
+import re
+import time
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Dict, Optional, Tuple
+
+CacheKey = Tuple[str, str]
+
+_WHITESPACE = re.compile(r'\s+')
+_EDGE_PUNCTUATION = re.compile(r'^[\s"\'`.,!?;:]+|[\s"\'`.,!?;:]+$')
+
+class DateFilterCache:
+    """
+    In-process LRU for LLM date-filter extractions.
+
+    Keys are (normalized query, today's date). The answer to a relative phrase
+    such as "last week" depends only on the date, so it is shared by every
+    provider and expires at midnight; the whole cache is dropped when the date
+    rolls over. A TTL bounds how long any result is reused within a day.
+    Only successful extractions are stored, never provider errors.
+    """
+
+    def __init__(self, max_size: Optional[int] = None, ttl_seconds: Optional[int] = None):
+        self.max_size = max_size or int(os.getenv('DATE_FILTER_CACHE_SIZE', 4096))
+        self.ttl_seconds = ttl_seconds or int(os.getenv('DATE_FILTER_CACHE_TTL', 6 * 60 * 60))
+        self.enabled = os.getenv('DATE_FILTER_CACHE_ENABLED', 'true').lower() == 'true'
+        self._memory: 'OrderedDict[CacheKey, Tuple[float, Dict[str, Any]]]' = OrderedDict()
+        self._day: Optional[str] = None
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'writes': 0, 'expired': 0, 'evictions': 0}
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        """Case, surrounding quotes/punctuation and whitespace runs do not change the answer"""
+        return _EDGE_PUNCTUATION.sub('', _WHITESPACE.sub(' ', query.lower()))
+
+    def make_key(self, query: str, today: Optional[date] = None) -> CacheKey:
+        return self.normalize(query), (today or date.today()).isoformat()
+
+    def get(self, key: CacheKey) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            self._roll_over(key[1])
+            cached = self._memory.get(key)
+            if cached is not None and now - cached[0] > self.ttl_seconds:
+                del self._memory[key]
+                self._counters['expired'] += 1
+                cached = None
+            if cached is None:
+                self._counters['misses'] += 1
+                return None
+            self._memory.move_to_end(key)
+            self._counters['hits'] += 1
+            # Callers may annotate the filter they get back
+            return dict(cached[1])
+
+    def put(self, key: CacheKey, date_filter: Dict[str, Any]):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._roll_over(key[1])
+            self._memory[key] = (time.monotonic(), dict(date_filter))
+            self._memory.move_to_end(key)
+            self._counters['writes'] += 1
+            while len(self._memory) > self.max_size:
+                self._memory.popitem(last=False)
+                self._counters['evictions'] += 1
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            counters = dict(self._counters)
+            counters['size'] = len(self._memory)
+        lookups = counters['hits'] + counters['misses']
+        counters['hit_rate'] = round(counters['hits'] / lookups, 4) if lookups else 0.0
+        return counters
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+
+    def _roll_over(self, day: str):
+        # Caller holds the lock; entries from an earlier date can never hit again
+        if day != self._day:
+            self._memory.clear()
+            self._day = day
+
+# Convenience instance for easy import
+date_filter_cache = DateFilterCache()
@@ -0,0 +1,316 @@
+import calendar
+import os
+import re
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+# Answer date questions locally and only ask the LLM about what this parser cannot resolve
+LOCAL_DATE_PARSER_ENABLED = os.getenv('LOCAL_DATE_PARSER_ENABLED', 'true').lower() == 'true'
+
+class DateRange(NamedTuple):
+    start: date
+    end: date
+    filter_type: str  # 'specific_date', 'date_range' or 'relative', as in the LLM filter
+    explanation: str
+
+MONTHS = {
+    'jan': 1, 'january': 1, 'feb': 2, 'february': 2, 'mar': 3, 'march': 3,
+    'apr': 4, 'april': 4, 'may': 5, 'jun': 6, 'june': 6, 'jul': 7, 'july': 7,
+    'aug': 8, 'august': 8, 'sep': 9, 'sept': 9, 'september': 9, 'oct': 10, 'october': 10,
+    'nov': 11, 'november': 11, 'dec': 12, 'december': 12
+}
+# Full names only: "sat" and "sun" are ordinary words
+WEEKDAYS = {
+    'monday': 0, 'tuesday': 1, 'wednesday': 2, 'thursday': 3, 'friday': 4, 'saturday': 5, 'sunday': 6
+}
+NUMBERS = {
+    'a': 1, 'an': 1, 'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6,
+    'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10, 'eleven': 11, 'twelve': 12, 'couple of': 2,
+    'a couple of': 2, 'few': 3, 'a few': 3
+}
+ORDINALS = {'first': 1, '1st': 1, 'second': 2, '2nd': 2, 'third': 3, '3rd': 3, 'fourth': 4, '4th': 4}
+UNITS = {'day': 'day', 'days': 'day', 'week': 'week', 'weeks': 'week', 'month': 'month', 'months': 'month', 'year': 'year', 'years': 'year'}
+
+def _alternation(words) -> str:
+    # Longest first so "september" wins over "sep"
+    return '|'.join(sorted((re.escape(word) for word in words), key=len, reverse=True))
+
+_MONTH = f'(?P<month>{_alternation(MONTHS)})\\.?'
+# On its own only a full month name counts ("Jan" is also a name) and never
+# "may"; with a day, a year or a preposition any form does
+_BARE_MONTH = f'(?P<month>{_alternation({name for name in MONTHS if len(name) > 3} - {"may"})})'
+_WEEKDAY = f'(?P<weekday>{_alternation(WEEKDAYS)})'
+_NUMBER = f'(?P<count>\\d+|{_alternation(NUMBERS)})'
+_UNIT = f'(?P<unit>{_alternation(UNITS)})'
+_DAY = '(?P<day>\\d{1,2})(?:st|nd|rd|th)?'
+_YEAR = '(?P<year>(?:19|20)\\d{2})'
+
+# Words that suggest a date reference; a query without any of them has no date
+# filter and needs no LLM call
+_DATE_HINT = re.compile(
+    r"\b(?:today|tonight|yesterday|tomorrow|morning|evening|night|day|days|week|weeks|weekend|"
+    r"month|months|year|years|quarter|ago|since|recent|recently|lately|past|last|previous|"
+    r"earlier|before|after|during|season|summer|winter|spring|autumn|fall|holiday|holidays|"
+    r"christmas|birthday|"
+    f"{_alternation(MONTHS)}|{_alternation(WEEKDAYS)}"
+    r")\b|\d"
+)
+
+# Range connectors; each side is parsed on its own
+_RANGE = re.compile(
+    r'\b(?:from|between)\s+(?P<left>.+?)\s+(?:to|and|until|till|through|thru)\s+(?P<right>.+?)\s*(?:$|[?.!,;])'
+)
+_DASH_RANGE = re.compile(r'(?P<left>\b\d{4}-\d{1,2}-\d{1,2})\s*(?:-|–|to|\.\.)\s*(?P<right>\d{4}-\d{1,2}-\d{1,2}\b)')
+_SINCE = re.compile(r'\bsince\s+(?P<expression>.+?)\s*(?:$|[?.!,;])')
+
+def _shift_months(day: date, months: int) -> date:
+    index = day.year * 12 + day.month - 1 + months
+    year, month = divmod(index, 12)
+    return date(year, month + 1, min(day.day, calendar.monthrange(year, month + 1)[1]))
+
+def _month_bounds(year: int, month: int) -> Tuple[date, date]:
+    return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+
+def _week_bounds(day: date) -> Tuple[date, date]:
+    monday = day - timedelta(days=day.weekday())
+    return monday, monday + timedelta(days=6)
+
+def _number(text: str) -> int:
+    return int(text) if text.isdigit() else NUMBERS[text]
+
+def _past_year(month: int, day: int, today: date) -> int:
+    """Year of the most recent month/day on or before today (journals look back)"""
+    try:
+        return today.year if date(today.year, month, day) <= today else today.year - 1
+    except ValueError:
+        return today.year - 1
+
+# Rule handlers: (match, today) -> DateRange or None
+
+def _iso(m, today):
+    day = date(int(m['year']), int(m['month_number']), int(m['day']))
+    return DateRange(day, day, 'specific_date', f'{day.isoformat()}')
+
+def _month_day_range(m, today):
+    month = MONTHS[m['month']]
+    year = int(m['year']) if m['year'] else _past_year(month, int(m['day']), today)
+    start, end = date(year, month, int(m['day'])), date(year, month, int(m['end_day']))
+    return DateRange(start, end, 'date_range', f'{m["month"].title()} {m["day"]}-{m["end_day"]}')
+
+def _month_day(m, today):
+    month = MONTHS[m['month']]
+    year = int(m['year']) if m['year'] else _past_year(month, int(m['day']), today)
+    day = date(year, month, int(m['day']))
+    return DateRange(day, day, 'specific_date', day.strftime('%B %d, %Y'))
+
+def _month_year(m, today):
+    start, end = _month_bounds(int(m['year']), MONTHS[m['month']])
+    return DateRange(start, end, 'date_range', start.strftime('%B %Y'))
+
+def _month(m, today):
+    month = MONTHS[m['month']]
+    year = today.year if month <= today.month else today.year - 1
+    start, end = _month_bounds(year, month)
+    return DateRange(start, end, 'date_range', start.strftime('%B %Y'))
+
+def _quarter(m, today):
+    quarter_text = m['quarter']
+    if quarter_text in ('this', 'current'):
+        quarter, year = (today.month - 1) // 3 + 1, today.year
+    elif quarter_text in ('last', 'previous'):
+        quarter, year = (today.month - 1) // 3, today.year
+        if quarter == 0:
+            quarter, year = 4, year - 1
+    else:
+        quarter = ORDINALS.get(quarter_text) or int(quarter_text)
+        if m['year']:
+            year = int(m['year'])
+        else:
+            year = today.year if quarter <= (today.month - 1) // 3 + 1 else today.year - 1
+    start = date(year, 3 * quarter - 2, 1)
+    end = _month_bounds(year, 3 * quarter)[1]
+    return DateRange(start, end, 'date_range', f'Q{quarter} {year}')
+
+def _year(m, today):
+    year = int(m['year'])
+    return DateRange(date(year, 1, 1), date(year, 12, 31), 'date_range', f'Year {year}')
+
+def _relative_year(m, today):
+    year = today.year if m['which'] in ('this', 'current') else today.year - 1
+    return DateRange(date(year, 1, 1), date(year, 12, 31), 'relative', f'{m["which"].title()} year')
+
+def _relative_month(m, today):
+    first = today.replace(day=1) if m['which'] in ('this', 'current') else _shift_months(today.replace(day=1), -1)
+    start, end = _month_bounds(first.year, first.month)
+    return DateRange(start, end, 'relative', f'{m["which"].title()} month')
+
+def _relative_week(m, today):
+    start, end = _week_bounds(today if m['which'] in ('this', 'current') else today - timedelta(days=7))
+    return DateRange(start, end, 'relative', f'{m["which"].title()} week')
+
+def _weekend(m, today):
+    monday, _ = _week_bounds(today)
+    # "last weekend" is the one before the current week
+    saturday = monday + timedelta(days=5) if m['which'] in ('this', 'current') else monday - timedelta(days=2)
+    return DateRange(saturday, saturday + timedelta(days=1), 'relative', f'{m["which"].title()} weekend')
+
+def _today(m, today):
+    return DateRange(today, today, 'specific_date', "Today's entries")
+
+def _yesterday(m, today):
+    day = today - timedelta(days=1)
+    return DateRange(day, day, 'specific_date', "Yesterday's entries")
+
+def _day_before_yesterday(m, today):
+    day = today - timedelta(days=2)
+    return DateRange(day, day, 'specific_date', 'Day before yesterday')
+
+def _ago(m, today):
+    count, unit = _number(m['count']), UNITS[m['unit']]
+    if unit == 'day':
+        day = today - timedelta(days=count)
+        return DateRange(day, day, 'relative', f'{count} days ago')
+    if unit == 'week':
+        start, end = _week_bounds(today - timedelta(weeks=count))
+        return DateRange(start, end, 'relative', f'{count} weeks ago')
+    if unit == 'month':
+        first = _shift_months(today.replace(day=1), -count)
+        start, end = _month_bounds(first.year, first.month)
+        return DateRange(start, end, 'relative', f'{count} months ago')
+    year = today.year - count
+    return DateRange(date(year, 1, 1), date(year, 12, 31), 'relative', f'{count} years ago')
+
+def _last_n(m, today):
+    count = _number(m['count']) if m.groupdict().get('count') else 1
+    unit = UNITS[m['unit']]
+    if unit == 'day':
+        start = today - timedelta(days=count - 1)
+    elif unit == 'week':
+        start = today - timedelta(weeks=count) + timedelta(days=1)
+    else:
+        start = _shift_months(today, -count * (12 if unit == 'year' else 1)) + timedelta(days=1)
+    return DateRange(start, today, 'relative', f'Last {count} {unit}{"s" if count > 1 else ""}')
+
+def _recent(m, today):
+    return DateRange(today - timedelta(days=6), today, 'relative', 'Recent entries (last 7 days)')
+
+def _weekday(m, today):
+    weekday = WEEKDAYS[m['weekday']]
+    which = m['which']
+    if which == 'this':
+        day = _week_bounds(today)[0] + timedelta(days=weekday)
+    else:
+        back = (today.weekday() - weekday) % 7
+        if which in ('last', 'previous') and back == 0:
+            back = 7
+        day = today - timedelta(days=back)
+    return DateRange(day, day, 'specific_date', day.strftime('%A %B %d'))
+
+# Ordered rule table: (compiled pattern, handler). The first rule that matches
+# and yields a valid date wins, so specific forms come before general ones.
+RULES: List[Tuple['re.Pattern', Callable]] = [
+    (re.compile(r'\b(?P<year>\d{4})-(?P<month_number>\d{1,2})-(?P<day>\d{1,2})\b'), _iso),
+    (re.compile(f'\\b{_MONTH}\\s+{_DAY}\\s*(?:-|–|to|through|until)\\s*(?P<end_day>\\d{{1,2}})(?:st|nd|rd|th)?\\b(?:,?\\s+{_YEAR})?'), _month_day_range),
+    (re.compile(f'\\b{_MONTH}\\s+{_DAY}\\b(?!\\s*(?:am|pm|:))(?:,?\\s+{_YEAR})?'), _month_day),
+    (re.compile(f'\\b{_DAY}\\s+(?:of\\s+)?{_MONTH}(?:,?\\s+{_YEAR})?\\b'), _month_day),
+    (re.compile(f'\\b{_MONTH}\\s*,?\\s+{_YEAR}\\b'), _month_year),
+    (re.compile(r'\b(?:the\s+)?day\s+before\s+yesterday\b'), _day_before_yesterday),
+    (re.compile(r'\b(?:today|tonight|this\s+(?:morning|afternoon|evening))\b'), _today),
+    (re.compile(r'\b(?:yesterday|last\s+night)\b'), _yesterday),
+    (re.compile(f'\\b{_NUMBER}\\s+{_UNIT}\\s+ago\\b'), _ago),
+    (re.compile(f'\\b(?:last|past|previous)\\s+{_NUMBER}\\s+{_UNIT}\\b'), _last_n),
+    (re.compile(f'\\bpast\\s+{_UNIT}\\b'), _last_n),
+    (re.compile(r'\b(?P<which>this|current|last|previous)\s+weekend\b'), _weekend),
+    (re.compile(r'\b(?P<which>this|current|last|previous)\s+week\b'), _relative_week),
+    (re.compile(r'\b(?P<which>this|current|last|previous)\s+month\b'), _relative_month),
+    (re.compile(r'\b(?P<which>this|current|last|previous)\s+year\b'), _relative_year),
+    (re.compile(f'\\bq(?P<quarter>[1-4])(?:\\s+{_YEAR})?\\b'), _quarter),
+    (re.compile(f'\\b(?P<quarter>first|second|third|fourth|1st|2nd|3rd|4th|this|current|last|previous)\\s+quarter(?:\\s+(?:of\\s+)?{_YEAR})?\\b'), _quarter),
+    (re.compile(r'\b(?:in|during|of|for|throughout)\s+(?P<year>(?:19|20)\d{2})\b'), _year),
+    (re.compile(f'\\b(?P<which>last|this|on|previous)?\\s*{_WEEKDAY}\\b'), _weekday),
+    (re.compile(f'\\b(?:in|during|of|since|through|throughout)\\s+{_MONTH}\\b'), _month),
+    (re.compile(f'\\b{_BARE_MONTH}\\b'), _month),
+    (re.compile(r'\b(?:recently|lately|these\s+days|past\s+few\s+days)\b'), _recent),
+]
+
+def _match_single(text: str, today: date) -> Optional[DateRange]:
+    for pattern, handler in RULES:
+        for match in pattern.finditer(text):
+            try:
+                result = handler(match, today)
+            except (ValueError, KeyError):
+                continue  # e.g. February 30: try the next occurrence or rule
+            if result is not None:
+                return result
+    return None
+
+_MONTH_ONLY = re.compile(f'^{_MONTH}$')
+_YEAR_ONLY = re.compile(f'^{_YEAR}$')
+
+def _match_side(text: str, today: date) -> Optional[DateRange]:
+    """One end of a range, where a lone month ("may") or year is unambiguous"""
+    text = text.strip(' .')
+    match = _MONTH_ONLY.match(text)
+    if match:
+        return _month(match, today)
+    match = _YEAR_ONLY.match(text)
+    if match:
+        return _year(match, today)
+    return _match_single(text, today)
+
+def parse_date_range(query: str, today: Optional[date] = None) -> Optional[DateRange]:
+    """
+    Resolve the date expression in a query to an inclusive date range, or None
+    if it has none this parser understands. Ambiguous dates resolve to the past.
+    """
+    today = today or datetime.now().date()
+    text = query.lower().strip()
+
+    for pattern in (_DASH_RANGE, _RANGE):
+        match = pattern.search(text)
+        if match:
+            left = _match_side(match['left'], today)
+            right = _match_side(match['right'], today)
+            if left and right and left.start <= right.end:
+                return DateRange(left.start, right.end, 'date_range', f'{left.explanation} to {right.explanation}')
+
+    match = _SINCE.search(text)
+    if match:
+        since = _match_single(match['expression'], today)
+        if since and since.start <= today:
+            return DateRange(since.start, today, 'date_range', f'Since {since.explanation}')
+
+    return _match_single(text, today)
+
+def has_date_hint(query: str) -> bool:
+    """True if the query mentions anything that might be a date"""
+    return _DATE_HINT.search(query.lower()) is not None
+
+def extract_date_filter(query: str, today: Optional[date] = None) -> Optional[Dict[str, Any]]:
+    """
+    Local stand-in for LLMProvider.extract_date_filter, in the same format.
+
+    Returns a filter when a date expression was parsed, a "no filter" result
+    when the query has no date vocabulary at all, and None when it mentions
+    dates this parser cannot resolve (the caller should ask the LLM).
+    """
+    parsed = parse_date_range(query, today)
+    if parsed:
+        return {
+            'has_date_filter': True,
+            'start_date': parsed.start.isoformat(),
+            'end_date': parsed.end.isoformat(),
+            'filter_type': parsed.filter_type,
+            'explanation': parsed.explanation,
+            'source': 'local'
+        }
+    if not has_date_hint(query):
+        return {
+            'has_date_filter': False,
+            'start_date': None,
+            'end_date': None,
+            'filter_type': None,
+            'explanation': 'No date reference',
+            'source': 'local'
+        }
+    return None
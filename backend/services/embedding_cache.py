@@ -0,0 +1,166 @@
+import os
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from flask import has_app_context
+from sqlalchemy import insert, select
+from extensions import db
+from models import EmbeddingCacheEntry
+
+logger = logging.getLogger(__name__)
+
+CacheKey = Tuple[str, str, str]
+
+class EmbeddingCache:
+    """
+    Two-tier content-addressed embedding cache.
+
+    Keys are (provider, model, sha256(text)). An in-process LRU sits in front of
+    the embedding_cache table; the table survives restarts and is shared by all
+    workers. Database access uses its own short transactions on the engine so a
+    cache read or write never commits or rolls back the caller's session.
+    """
+
+    def __init__(self, max_size: Optional[int] = None):
+        self.max_size = max_size or int(os.getenv('EMBEDDING_CACHE_SIZE', 2048))
+        self.enabled = os.getenv('EMBEDDING_CACHE_ENABLED', 'true').lower() == 'true'
+        self._memory: 'OrderedDict[CacheKey, List[float]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {'memory_hits': 0, 'db_hits': 0, 'misses': 0, 'writes': 0, 'errors': 0}
+
+    @staticmethod
+    def make_key(provider: str, model: str, text: str) -> CacheKey:
+        return provider, model, hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def get_many(self, keys: Sequence[CacheKey]) -> Dict[CacheKey, List[float]]:
+        """Look up keys in memory, then in the database; returns only the hits"""
+        if not self.enabled:
+            return {}
+
+        found = {}
+        missing = []
+        with self._lock:
+            for key in keys:
+                embedding = self._memory.get(key)
+                if embedding is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = embedding
+                    self._counters['memory_hits'] += 1
+                else:
+                    missing.append(key)
+
+        if missing:
+            stored = self._load(missing)
+            with self._lock:
+                for key in missing:
+                    if key in stored:
+                        found[key] = stored[key]
+                        self._remember(key, stored[key])
+                        self._counters['db_hits'] += 1
+                    else:
+                        self._counters['misses'] += 1
+
+        return found
+
+    def get(self, key: CacheKey) -> Optional[List[float]]:
+        return self.get_many([key]).get(key)
+
+    def put_many(self, items: Dict[CacheKey, List[float]]):
+        """Store embeddings in both tiers"""
+        if not self.enabled or not items:
+            return
+        with self._lock:
+            for key, embedding in items.items():
+                self._remember(key, embedding)
+        self._store(items)
+
+    def put(self, key: CacheKey, embedding: List[float]):
+        self.put_many({key: embedding})
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters and current in-memory size"""
+        with self._lock:
+            counters = dict(self._counters)
+            counters['memory_size'] = len(self._memory)
+        lookups = counters['memory_hits'] + counters['db_hits'] + counters['misses']
+        counters['hit_rate'] = round((counters['memory_hits'] + counters['db_hits']) / lookups, 4) if lookups else 0.0
+        return counters
+
+    def clear_memory(self):
+        with self._lock:
+            self._memory.clear()
+
+    def _remember(self, key: CacheKey, embedding: List[float]):
+        # Caller holds the lock
+        self._memory[key] = embedding
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_size:
+            self._memory.popitem(last=False)
+
+    def _count_error(self):
+        with self._lock:
+            self._counters['errors'] += 1
+
+    def _load(self, keys: List[CacheKey]) -> Dict[CacheKey, List[float]]:
+        if not has_app_context():
+            return {}
+        groups: Dict[Tuple[str, str], List[str]] = {}
+        for provider, model, text_hash in keys:
+            groups.setdefault((provider, model), []).append(text_hash)
+        try:
+            found = {}
+            with db.engine.connect() as connection:
+                for (provider, model), hashes in groups.items():
+                    statement = select(
+                        EmbeddingCacheEntry.text_hash,
+                        EmbeddingCacheEntry.embedding
+                    ).where(
+                        EmbeddingCacheEntry.provider == provider,
+                        EmbeddingCacheEntry.model == model,
+                        EmbeddingCacheEntry.text_hash.in_(hashes)
+                    )
+                    for row in connection.execute(statement):
+                        found[(provider, model, row.text_hash)] = np.frombuffer(row.embedding, dtype='<f4').tolist()
+            return found
+        except Exception as e:
+            self._count_error()
+            logger.warning(f"Embedding cache lookup failed: {str(e)}")
+            return {}
+
+    def _store(self, items: Dict[CacheKey, List[float]]):
+        if not has_app_context():
+            return
+        rows = [
+            {
+                'provider': provider,
+                'model': model,
+                'text_hash': text_hash,
+                'embedding': np.asarray(embedding, dtype='<f4').tobytes()
+            }
+            for (provider, model, text_hash), embedding in items.items()
+        ]
+        try:
+            dialect = db.engine.dialect.name
+            if dialect == 'postgresql':
+                from sqlalchemy.dialects.postgresql import insert as dialect_insert
+            elif dialect == 'sqlite':
+                from sqlalchemy.dialects.sqlite import insert as dialect_insert
+            else:
+                dialect_insert = None
+
+            with db.engine.begin() as connection:
+                if dialect_insert is not None:
+                    connection.execute(dialect_insert(EmbeddingCacheEntry).on_conflict_do_nothing(), rows)
+                else:
+                    connection.execute(insert(EmbeddingCacheEntry), rows)
+            with self._lock:
+                self._counters['writes'] += len(rows)
+        except Exception as e:
+            self._count_error()
+            logger.warning(f"Embedding cache write failed: {str(e)}")
+
+# Convenience instance for easy import
+embedding_cache = EmbeddingCache()
@@ -0,0 +1,283 @@
+import os
+import threading
+import logging
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+from typing import List, Optional
+from sqlalchemy import insert
+from extensions import db
+from models import Entry, EntryChunk
+from services.context_builder import chunk_text
+from services.llm_service import llm_service
+from services.vector_search import vector_search_engine
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingWorker:
+    """
+    Background thread pool that drains entries waiting for embeddings.
+
+    The entries table itself is the durable queue: an entry is due when its
+    embedding_status is pending and embedding_next_attempt_at is unset or in the
+    past. Workers claim a batch by pushing next_attempt_at forward by a lease, so a
+    crashed worker's claims are picked up again once the lease expires. Failed
+    provider calls are retried with exponential backoff, and an entry is marked
+    failed (never given a placeholder vector) once it runs out of attempts.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.num_workers = int(os.getenv('EMBEDDING_WORKERS', 2))
+        self.batch_size = int(os.getenv('EMBEDDING_BATCH_SIZE', 10))
+        self.poll_interval = float(os.getenv('EMBEDDING_POLL_SECONDS', 10))
+        self.max_attempts = int(os.getenv('EMBEDDING_MAX_ATTEMPTS', 5))
+        self.retry_base_delay = float(os.getenv('EMBEDDING_RETRY_BASE_SECONDS', 30))
+        self.lease = timedelta(seconds=float(os.getenv('EMBEDDING_LEASE_SECONDS', 300)))
+        self._threads: List[threading.Thread] = []
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        # Without row locks (SQLite) claims are serialized within the process instead
+        self._claim_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+
+    def init_app(self, app):
+        """
+        Bind to the Flask app; unless disabled, the pool starts with the first
+        request. Only serving processes handle requests, so CLI commands (flask
+        db upgrade, flask backfill-chunks --drain) never run workers that would
+        race them, and forked server workers each start their own threads.
+        """
+        self.app = app
+        if os.getenv('EMBEDDING_WORKER_ENABLED', 'true').lower() == 'true':
+            app.before_request(self._start_on_request)
+
+    def _start_on_request(self):
+        if not self._threads:
+            self.start()
+
+    def start(self):
+        """Start the worker threads (idempotent)"""
+        with self._start_lock:
+            if self._threads:
+                return
+            self._stop.clear()
+            for i in range(self.num_workers):
+                thread = threading.Thread(target=self._run, name=f'embedding-worker-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        print(f"🧵 Started {self.num_workers} embedding worker(s)")
+
+    def stop(self, timeout: Optional[float] = None):
+        """Signal the worker threads to exit and wait for them"""
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def notify(self):
+        """Wake idle workers after new work was committed"""
+        self._wakeup.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                with self.app.app_context():
+                    processed = self.process_batch()
+            except Exception as e:
+                logger.error(f"Embedding worker error: {str(e)}")
+                processed = 0
+
+            if not processed:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+    def process_batch(self) -> int:
+        """Claim and embed one batch of due entries; returns how many were claimed"""
+        claimed = self._claim_batch()
+        if not claimed:
+            return 0
+
+        # One batched provider call for the entries and the passages of long ones;
+        # isolate failures per entry if it fails
+        chunked = [chunk_text(content) for _, _, content, _ in claimed]
+        texts = [content for _, _, content, _ in claimed]
+        offsets = []
+        for chunks in chunked:
+            offsets.append(len(texts))
+            if len(chunks) > 1:
+                texts.extend(chunks)
+        try:
+            embeddings = llm_service.generate_embeddings(texts)
+        except Exception as e:
+            logger.warning(f"Batch embedding of {len(claimed)} entries failed, retrying individually: {str(e)}")
+            embeddings = None
+
+        for i, (entry_id, user_id, content, attempts) in enumerate(claimed):
+            if embeddings:
+                chunk_embeddings = embeddings[offsets[i]:offsets[i] + len(chunked[i])] if len(chunked[i]) > 1 else None
+                self._embed_entry(entry_id, user_id, content, attempts, embeddings[i], chunk_embeddings)
+            else:
+                self._embed_entry(entry_id, user_id, content, attempts)
+
+        # New vectors change search results for these users; re-embedded entries
+        # keep their id, so name them explicitly
+        embedded = {}
+        for entry_id, user_id, _, _ in claimed:
+            embedded.setdefault(user_id, []).append(entry_id)
+        for user_id, entry_ids in embedded.items():
+            vector_search_engine.invalidate(user_id, entry_ids=entry_ids)
+        return len(claimed)
+
+    def _claim_batch(self):
+        now = datetime.utcnow()
+        is_postgres = db.engine.dialect.name == 'postgresql'
+
+        with nullcontext() if is_postgres else self._claim_lock:
+            try:
+                query = db.session.query(
+                    Entry.id, Entry.user_id, Entry.content, Entry.embedding_attempts
+                ).filter(
+                    Entry.embedding_status == Entry.EMBEDDING_PENDING,
+                    db.or_(
+                        Entry.embedding_next_attempt_at.is_(None),
+                        Entry.embedding_next_attempt_at <= now
+                    )
+                ).order_by(Entry.id).limit(self.batch_size)
+
+                if is_postgres:
+                    # Concurrent workers (threads or Gunicorn processes) skip each other's rows
+                    query = query.with_for_update(skip_locked=True, of=Entry)
+
+                rows = query.all()
+                if rows:
+                    db.session.query(Entry).filter(
+                        Entry.id.in_([row.id for row in rows])
+                    ).update({
+                        Entry.embedding_next_attempt_at: now + self.lease,
+                        # Queue bookkeeping must not look like a user edit
+                        Entry.updated_at: Entry.updated_at
+                    }, synchronize_session=False)
+                db.session.commit()
+                return [(row.id, row.user_id, row.content, row.embedding_attempts) for row in rows]
+            except Exception:
+                db.session.rollback()
+                raise
+
+    def _embed_entry(
+        self,
+        entry_id: int,
+        user_id: int,
+        content: str,
+        attempts: int,
+        embedding: Optional[List[float]] = None,
+        chunk_embeddings: Optional[List[List[float]]] = None
+    ):
+        try:
+            if embedding is None:
+                embedding = llm_service.generate_embedding(content)
+            if not embedding:
+                raise ValueError("Provider returned an empty embedding")
+            
+            # Long entries also get one embedding per passage; a single chunk is the
+            # whole entry and reuses its vector
+            chunks = chunk_text(content)
+            if len(chunks) == 1:
+                chunk_embeddings = [embedding]
+            elif chunk_embeddings is None:
+                chunk_embeddings = llm_service.generate_embeddings(chunks)
+        except Exception as e:
+            self._record_failure(entry_id, content, attempts, e)
+            return
+
+        values = {
+            getattr(Entry, column): value
+            for column, value in Entry.embedding_column_values(embedding).items()
+        }
+        values.update({
+            Entry.embedding_status: Entry.EMBEDDING_READY,
+            Entry.embedding_attempts: 0,
+            Entry.embedding_next_attempt_at: None,
+            Entry.updated_at: Entry.updated_at
+        })
+        chunk_rows = [
+            dict(
+                entry_id=entry_id,
+                user_id=user_id,
+                chunk_index=index,
+                content=chunk,
+                **Entry.embedding_column_values(chunk_embedding)
+            )
+            for index, (chunk, chunk_embedding) in enumerate(zip(chunks, chunk_embeddings))
+        ]
+        self._conditional_update(entry_id, content, values, chunk_rows)
+
+    def _record_failure(self, entry_id: int, content: str, attempts: int, error: Exception):
+        attempts += 1
+        if attempts >= self.max_attempts:
+            logger.error(f"Embedding for entry {entry_id} failed after {attempts} attempts: {str(error)}")
+            values = {
+                Entry.embedding_status: Entry.EMBEDDING_FAILED,
+                Entry.embedding_next_attempt_at: None
+            }
+        else:
+            delay = self.retry_base_delay * (2 ** (attempts - 1))  # Exponential backoff
+            logger.warning(f"Embedding for entry {entry_id} failed (attempt {attempts}), retrying in {delay:.0f}s: {str(error)}")
+            values = {
+                Entry.embedding_next_attempt_at: datetime.utcnow() + timedelta(seconds=delay)
+            }
+        values.update({
+            Entry.embedding_attempts: attempts,
+            Entry.updated_at: Entry.updated_at
+        })
+        self._conditional_update(entry_id, content, values)
+
+    def _conditional_update(self, entry_id: int, content: str, values, chunk_rows=None):
+        """
+        Apply the result only if the content was not edited while we were embedding
+        it; chunk_rows, when given, replace the entry's chunks in the same transaction.
+        """
+        try:
+            updated = db.session.query(Entry).filter(
+                Entry.id == entry_id,
+                Entry.content == content,
+                Entry.embedding_status == Entry.EMBEDDING_PENDING
+            ).update(values, synchronize_session=False)
+            if updated and chunk_rows is not None:
+                db.session.query(EntryChunk).filter(
+                    EntryChunk.entry_id == entry_id
+                ).delete(synchronize_session=False)
+                db.session.execute(insert(EntryChunk), chunk_rows)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    def queue_missing_chunks(self) -> int:
+        """
+        Backfill: re-queue embedded entries that have no chunks yet. Entry
+        embeddings are usually served from the embedding cache, so mostly the
+        passages of long entries reach the provider.
+        """
+        try:
+            has_chunks = db.session.query(EntryChunk.id).filter(
+                EntryChunk.entry_id == Entry.id
+            ).exists()
+            queued = db.session.query(Entry).filter(
+                Entry.embedding_status == Entry.EMBEDDING_READY,
+                ~has_chunks
+            ).update({
+                Entry.embedding_status: Entry.EMBEDDING_PENDING,
+                Entry.embedding_attempts: 0,
+                Entry.embedding_next_attempt_at: None,
+                Entry.updated_at: Entry.updated_at
+            }, synchronize_session=False)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        self.notify()
+        return queued
+
+# Convenience instance for easy import
+embedding_worker = EmbeddingWorker()
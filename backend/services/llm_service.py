@@ -1,9 +1,19 @@
 from abc import ABC, abstractmethod
 import os
+import json
 import ssl
 import certifi
 import google.generativeai as genai
-from typing import List, Dict, Any
+import time
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import List, Dict, Any, Iterator, Optional
+from services.date_filter_cache import date_filter_cache
+from services.embedding_cache import embedding_cache
+from services.local_embedder import local_embedder
+from services.provider_health import ProviderHealth
+from services.singleflight import SingleFlight
+from services import date_parser
 
 # Disable SSL certificate verification for development
 import urllib3
@@ -28,6 +38,23 @@ try:
 except ImportError:
     print("ℹ️ gRPC not available, basic SSL bypass enabled")
 
+# Prefix of the canned answers GroqProvider returns when its API is unavailable
+FALLBACK_PREFIX = '[FALLBACK]'
+
+# Router operations that only providers with supports_text can serve. Date
+# extraction is one: the router is asked only after the local parser missed,
+# so a provider that is that parser would fail every time
+TEXT_OPERATIONS = ('generate_text', 'generate_text_stream', 'extract_date_filter')
+
+# Concurrent provider requests when embedding several texts
+EMBEDDING_REQUEST_CONCURRENCY = int(os.getenv('EMBEDDING_REQUEST_CONCURRENCY', 4))
+
+# Shared by all providers so concurrent backfills cannot multiply the request rate
+_embedding_executor = ThreadPoolExecutor(
+    max_workers=EMBEDDING_REQUEST_CONCURRENCY,
+    thread_name_prefix='embedding-batch'
+)
+
 class LLMProvider(ABC):
     """Abstract base class for LLM providers"""
     
@@ -35,11 +62,81 @@ class LLMProvider(ABC):
     def generate_text(self, prompt: str) -> str:
         pass
     
-    @abstractmethod
+    def generate_text_stream(self, prompt: str) -> Iterator[str]:
+        """
+        Yield the completion in chunks as the provider produces them.
+        Providers without streaming support yield the whole text at once.
+        """
+        yield self.generate_text(prompt)
+    
+    # Identify this provider's vectors in the embedding cache
+    provider_name = 'base'
+    embedding_model_name = 'default'
+    # Providers that only embed and resolve dates locally cannot be the primary
+    # provider and are left out of the router's text and date-filter routing
+    supports_text = True
+    # Locally computed embeddings are cheaper to recompute than to look up
+    cache_embeddings = True
+    # Texts per provider request (1 without a batch endpoint) and requests in flight
+    embedding_batch_size = 1
+    embedding_concurrency = EMBEDDING_REQUEST_CONCURRENCY
+    
     def generate_embedding(self, text: str) -> List[float]:
-        pass
+        """Embed text, serving repeated content from the embedding cache"""
+        return self.generate_embeddings([text])[0]
+    
+    def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Embed several texts, only sending cache misses to the provider"""
+        if not self.cache_embeddings:
+            return self._generate_embeddings(texts)
+        
+        keys = [
+            embedding_cache.make_key(self.provider_name, self.embedding_model_name, text)
+            for text in texts
+        ]
+        found = embedding_cache.get_many(keys)
+        
+        # Identical texts in one batch are embedded once
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        
+        if missing:
+            computed = dict(zip(missing, self._generate_embeddings(list(missing.values()))))
+            embedding_cache.put_many(computed)
+            found.update(computed)
+        
+        return [found[key] for key in keys]
     
     @abstractmethod
+    def _generate_embedding(self, text: str) -> List[float]:
+        """Call the provider for one embedding (uncached)"""
+        pass
+    
+    def _generate_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """
+        Call the provider for several embeddings (uncached), in requests of
+        embedding_batch_size texts with up to embedding_concurrency in flight.
+        Results keep the order of texts; any failed request fails the call.
+        """
+        batches = [
+            texts[start:start + self.embedding_batch_size]
+            for start in range(0, len(texts), self.embedding_batch_size)
+        ]
+        if len(batches) <= 1 or self.embedding_concurrency <= 1:
+            return [embedding for batch in batches for embedding in self._embed_batch(batch)]
+        
+        futures = [_embedding_executor.submit(self._embed_batch, batch) for batch in batches]
+        return [embedding for future in futures for embedding in future.result()]
+    
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """
+        One provider request for up to embedding_batch_size texts. Providers with
+        a batch endpoint override this; the default embeds the text(s) one by one.
+        """
+        return [self._generate_embedding(text) for text in texts]
+    
     def extract_date_filter(self, query: str) -> Dict[str, Any]:
         """
         Extract date filter information from natural language query
@@ -49,12 +146,86 @@ class LLMProvider(ABC):
             'end_date': str (YYYY-MM-DD) or None,
             'filter_type': str ('specific_date', 'date_range', 'relative', None)
         }
+        Repeated phrasings on the same day are served from the date filter
+        cache; errors fall back to no date filter and are not cached.
         """
+        key = date_filter_cache.make_key(query)
+        cached = date_filter_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        try:
+            date_filter = self._extract_date_filter(query)
+        except Exception as e:
+            print(f"Error extracting date filter with {self.provider_name}: {str(e)}")
+            return {
+                'has_date_filter': False,
+                'start_date': None,
+                'end_date': None,
+                'filter_type': None,
+                'explanation': f'Error: {str(e)}'
+            }
+        
+        date_filter_cache.put(key, date_filter)
+        return date_filter
+    
+    @abstractmethod
+    def _extract_date_filter(self, query: str) -> Dict[str, Any]:
+        """Call the provider to extract a date filter (uncached); raises on failure"""
         pass
 
+def _chat_date_filter_prompt(query: str) -> str:
+    """Date extraction prompt for chat-completion models (Groq, OpenAI-compatible)"""
+    from datetime import datetime
+    current_date = datetime.now().strftime('%Y-%m-%d')
+    current_year = datetime.now().year
+    current_month = datetime.now().month
+    
+    return f"""Analyze this user query and extract date/time filtering information. Today's date is {current_date}.
+
+Query: "{query}"
+
+Return ONLY a JSON object with these fields:
+{{
+    "has_date_filter": true/false,
+    "start_date": "YYYY-MM-DD" or null,
+    "end_date": "YYYY-MM-DD" or null,
+    "filter_type": "specific_date|date_range|relative" or null,
+    "explanation": "brief explanation"
+}}
+
+Examples:
+- "today" or "what have I done today" → {{"has_date_filter": true, "start_date": "{current_date}", "end_date": "{current_date}", "filter_type": "specific_date", "explanation": "Today's entries"}}
+- "yesterday" → {{"has_date_filter": true, "start_date": "calculate-yesterday", "end_date": "calculate-yesterday", "filter_type": "specific_date", "explanation": "Yesterday's entries"}}
+- "current month" → {{"has_date_filter": true, "start_date": "{current_year}-{current_month:02d}-01", "end_date": "{current_year}-{current_month:02d}-30", "filter_type": "relative", "explanation": "Current month filter"}}
+- "last week" → calculate previous week dates
+- "August 2025" → {{"has_date_filter": true, "start_date": "2025-08-01", "end_date": "2025-08-31", "filter_type": "date_range", "explanation": "Specific month"}}
+- No date → {{"has_date_filter": false, "start_date": null, "end_date": null, "filter_type": null, "explanation": "No date filter"}}
+
+Return ONLY the JSON, no other text:"""
+
+def _parse_date_filter_response(response_text: str, label: str) -> Dict[str, Any]:
+    """Parse a model's JSON date filter answer, tolerating a ```json fence; raises if it is not JSON"""
+    response_text = response_text.strip()
+    
+    # Clean up the response
+    if response_text.startswith('```json'):
+        response_text = response_text.replace('```json', '').replace('```', '').strip()
+    
+    try:
+        date_filter = json.loads(response_text)
+    except json.JSONDecodeError:
+        raise ValueError(f"Failed to parse {label} date filter response: {response_text}")
+    print(f"📅 {label} extracted date filter: {date_filter}")
+    return date_filter
+
 class GeminiProvider(LLMProvider):
     """Google Gemini LLM provider"""
     
+    provider_name = 'gemini'
+    # embed_content accepts a list of up to 100 texts per request
+    embedding_batch_size = int(os.getenv('GEMINI_EMBEDDING_BATCH_SIZE', 100))
+    
     def __init__(self):
         api_key = os.getenv('GOOGLE_AI_API_KEY')
         if not api_key or api_key == 'your-google-ai-api-key-here':
@@ -63,6 +234,7 @@ class GeminiProvider(LLMProvider):
         genai.configure(api_key=api_key)
         self.text_model = genai.GenerativeModel('gemini-pro')
         self.embedding_model = 'models/embedding-001'
+        self.embedding_model_name = self.embedding_model
     
     def generate_text(self, prompt: str) -> str:
         try:
@@ -77,46 +249,60 @@ class GeminiProvider(LLMProvider):
         except Exception as e:
             raise Exception(f"Error generating text with Gemini: {str(e)}")
     
-    def generate_embedding(self, text: str) -> List[float]:
+    def generate_text_stream(self, prompt: str) -> Iterator[str]:
         try:
-            # Add timeout and retry logic
-            import time
-            max_retries = 3
-            base_delay = 1
-            
-            for attempt in range(max_retries):
-                try:
-                    result = genai.embed_content(
-                        model=self.embedding_model,
-                        content=text,
-                        task_type="retrieval_document"
-                    )
-                    return result['embedding']
-                except Exception as e:
-                    if attempt < max_retries - 1:
-                        delay = base_delay * (2 ** attempt)  # Exponential backoff
-                        print(f"Attempt {attempt + 1} failed, retrying in {delay}s: {str(e)}")
-                        time.sleep(delay)
-                        continue
-                    else:
-                        raise e
-                        
+            response = self.text_model.generate_content(
+                prompt,
+                generation_config={
+                    'temperature': 0.7,
+                    'max_output_tokens': 1000,
+                },
+                stream=True
+            )
+            for chunk in response:
+                if chunk.text:
+                    yield chunk.text
         except Exception as e:
-            # Return a dummy embedding for development when AI fails
-            print(f"Warning: AI embedding failed: {str(e)}")
-            # Return a random embedding of the right size for development
-            import random
-            return [random.random() for _ in range(768)]
+            raise Exception(f"Error streaming text with Gemini: {str(e)}")
     
-    def extract_date_filter(self, query: str) -> Dict[str, Any]:
-        """Extract date filter from query using Gemini AI"""
+    def _generate_embedding(self, text: str) -> List[float]:
+        # Single attempt: retries with backoff are handled off the request path
+        # by services.embedding_worker, and failures are never masked with a
+        # placeholder vector.
         try:
-            from datetime import datetime, date
-            current_date = datetime.now().strftime('%Y-%m-%d')
-            current_year = datetime.now().year
-            current_month = datetime.now().month
-            
-            prompt = f"""Analyze this user query and extract any date/time filtering information. Today's date is {current_date}.
+            result = genai.embed_content(
+                model=self.embedding_model,
+                content=text,
+                task_type="retrieval_document"
+            )
+            return result['embedding']
+        except Exception as e:
+            raise Exception(f"Error generating embedding with Gemini: {str(e)}")
+    
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        if len(texts) == 1:
+            return [self._generate_embedding(texts[0])]
+        try:
+            result = genai.embed_content(
+                model=self.embedding_model,
+                content=texts,
+                task_type="retrieval_document"
+            )
+        except Exception as e:
+            raise Exception(f"Error generating batch embeddings with Gemini: {str(e)}")
+        embeddings = result['embedding']
+        if len(embeddings) != len(texts):
+            raise Exception(f"Gemini returned {len(embeddings)} embeddings for {len(texts)} texts")
+        return embeddings
+    
+    def _extract_date_filter(self, query: str) -> Dict[str, Any]:
+        """Extract date filter from query using Gemini AI"""
+        from datetime import datetime
+        current_date = datetime.now().strftime('%Y-%m-%d')
+        current_year = datetime.now().year
+        current_month = datetime.now().month
+        
+        prompt = f"""Analyze this user query and extract any date/time filtering information. Today's date is {current_date}.
 
 User Query: "{query}"
 
@@ -139,75 +325,164 @@ Examples:
 
 Return ONLY the JSON object, no other text:"""
 
-            response = self.text_model.generate_content(
-                prompt,
-                generation_config={
-                    'temperature': 0.1,  # Low temperature for consistent parsing
-                    'max_output_tokens': 300,
-                }
-            )
-            
-            # Parse the JSON response
-            import json
-            response_text = response.text.strip()
-            
-            # Clean up the response to extract just the JSON
-            if response_text.startswith('```json'):
-                response_text = response_text.replace('```json', '').replace('```', '').strip()
-            
-            try:
-                date_filter = json.loads(response_text)
-                print(f"📅 LLM extracted date filter: {date_filter}")
-                return date_filter
-            except json.JSONDecodeError as e:
-                print(f"⚠️ Failed to parse LLM date filter response: {response_text}")
-                return {
-                    'has_date_filter': False,
-                    'start_date': None,
-                    'end_date': None,
-                    'filter_type': None,
-                    'explanation': 'Failed to parse date filter'
-                }
-                
-        except Exception as e:
-            print(f"Error extracting date filter with Gemini: {str(e)}")
-            return {
-                'has_date_filter': False,
-                'start_date': None,
-                'end_date': None,
-                'filter_type': None,
-                'explanation': f'Error: {str(e)}'
+        response = self.text_model.generate_content(
+            prompt,
+            generation_config={
+                'temperature': 0.1,  # Low temperature for consistent parsing
+                'max_output_tokens': 300,
             }
+        )
+        
+        return _parse_date_filter_response(response.text, 'Gemini')
 
 class OpenAIProvider(LLMProvider):
-    """OpenAI LLM provider (placeholder implementation)"""
+    """
+    Provider for the OpenAI-compatible HTTP API: api.openai.com, or a local
+    llama.cpp / vLLM / Ollama server via OPENAI_BASE_URL. Speaks plain HTTP
+    through a keep-alive connection pool shared by all instances with the same
+    base URL, so calls on the same host skip connection setup.
+    """
+    
+    provider_name = 'openai'
+    embedding_batch_size = int(os.getenv('OPENAI_EMBEDDING_BATCH_SIZE', 128))
+    
+    _clients: Dict[str, Any] = {}
+    _clients_lock = threading.Lock()
     
     def __init__(self):
-        # Initialize OpenAI client when implemented
+        self.base_url = os.getenv('OPENAI_BASE_URL', 'https://api.openai.com/v1').rstrip('/')
         self.api_key = os.getenv('OPENAI_API_KEY')
+        if 'api.openai.com' in self.base_url and (not self.api_key or self.api_key == 'your-openai-api-key-here'):
+            raise ValueError("OpenAI API key not configured")
+        
+        self.chat_model = os.getenv('OPENAI_CHAT_MODEL', 'gpt-4o-mini')
+        self.embedding_model = os.getenv('OPENAI_EMBEDDING_MODEL', 'text-embedding-3-small')
+        self.embedding_model_name = self.embedding_model
+        # Embedding columns are 768-dim; text-embedding-3 models shorten on request.
+        # Set empty for servers that reject the parameter.
+        dimensions = os.getenv('OPENAI_EMBEDDING_DIMENSIONS', '768')
+        self.embedding_dimensions = int(dimensions) if dimensions else None
+        
+        # Per-call timeouts (seconds); connecting to a local server should be instant
+        self.connect_timeout = float(os.getenv('OPENAI_CONNECT_TIMEOUT', 5))
+        self.text_timeout = float(os.getenv('OPENAI_TEXT_TIMEOUT', 30))
+        self.embedding_timeout = float(os.getenv('OPENAI_EMBEDDING_TIMEOUT', 15))
+        self.date_filter_timeout = float(os.getenv('OPENAI_DATE_FILTER_TIMEOUT', 15))
+        self.client = self._shared_client(self.base_url)
+        print(f"✅ OpenAI-compatible client for {self.base_url} (chat: {self.chat_model}, embeddings: {self.embedding_model})")
     
-    def generate_text(self, prompt: str) -> str:
-        # TODO: Implement OpenAI text generation
-        raise NotImplementedError("OpenAI provider not implemented yet")
+    @classmethod
+    def _shared_client(cls, base_url: str):
+        import httpx
+        
+        with cls._clients_lock:
+            client = cls._clients.get(base_url)
+            if client is None:
+                client = cls._clients[base_url] = httpx.Client(
+                    base_url=base_url,
+                    limits=httpx.Limits(
+                        max_connections=int(os.getenv('OPENAI_MAX_CONNECTIONS', 20)),
+                        max_keepalive_connections=int(os.getenv('OPENAI_MAX_KEEPALIVE_CONNECTIONS', 10)),
+                        keepalive_expiry=float(os.getenv('OPENAI_KEEPALIVE_SECONDS', 60))
+                    )
+                )
+            return client
     
-    def generate_embedding(self, text: str) -> List[float]:
-        # TODO: Implement OpenAI embedding
-        raise NotImplementedError("OpenAI provider not implemented yet")
+    def _headers(self) -> Dict[str, str]:
+        headers = {'Content-Type': 'application/json'}
+        if self.api_key:
+            headers['Authorization'] = f'Bearer {self.api_key}'
+        return headers
     
-    def extract_date_filter(self, query: str) -> Dict[str, Any]:
-        # TODO: Implement OpenAI date extraction
+    def _timeout(self, seconds: float):
+        import httpx
+        return httpx.Timeout(seconds, connect=min(self.connect_timeout, seconds))
+    
+    def _post(self, path: str, payload: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        response = self.client.post(path, json=payload, headers=self._headers(), timeout=self._timeout(timeout))
+        response.raise_for_status()
+        return response.json()
+    
+    def _chat_payload(self, prompt: str, temperature: float, max_tokens: int, stream: bool = False) -> Dict[str, Any]:
         return {
-            'has_date_filter': False,
-            'start_date': None,
-            'end_date': None,
-            'filter_type': None,
-            'explanation': 'OpenAI provider not implemented'
+            'model': self.chat_model,
+            'messages': [{'role': 'user', 'content': prompt}],
+            'temperature': temperature,
+            'max_tokens': max_tokens,
+            'stream': stream
         }
+    
+    def generate_text(self, prompt: str) -> str:
+        try:
+            result = self._post('/chat/completions', self._chat_payload(prompt, 0.7, 1000), self.text_timeout)
+            return result['choices'][0]['message']['content']
+        except Exception as e:
+            raise Exception(f"Error generating text with OpenAI: {str(e)}")
+    
+    def generate_text_stream(self, prompt: str) -> Iterator[str]:
+        try:
+            with self.client.stream(
+                'POST', '/chat/completions',
+                json=self._chat_payload(prompt, 0.7, 1000, stream=True),
+                headers=self._headers(),
+                timeout=self._timeout(self.text_timeout)
+            ) as response:
+                response.raise_for_status()
+                # Server-Sent Events: one "data: {json}" line per delta, then "data: [DONE]"
+                for line in response.iter_lines():
+                    if not line.startswith('data:'):
+                        continue
+                    data = line[len('data:'):].strip()
+                    if data == '[DONE]':
+                        break
+                    chunk = json.loads(data)
+                    delta = chunk['choices'][0].get('delta', {}).get('content') if chunk.get('choices') else None
+                    if delta:
+                        yield delta
+        except Exception as e:
+            raise Exception(f"Error streaming text with OpenAI: {str(e)}")
+    
+    def _generate_embedding(self, text: str) -> List[float]:
+        return self._embed_batch([text])[0]
+    
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        payload = {'model': self.embedding_model, 'input': texts}
+        if self.embedding_dimensions:
+            payload['dimensions'] = self.embedding_dimensions
+        try:
+            result = self._post('/embeddings', payload, self.embedding_timeout)
+        except Exception as e:
+            raise Exception(f"Error generating embeddings with OpenAI: {str(e)}")
+        data = sorted(result['data'], key=lambda item: item['index'])
+        if len(data) != len(texts):
+            raise Exception(f"OpenAI returned {len(data)} embeddings for {len(texts)} texts")
+        return [item['embedding'] for item in data]
+    
+    def _extract_date_filter(self, query: str) -> Dict[str, Any]:
+        """Extract date filter from query with the chat model"""
+        result = self._post(
+            '/chat/completions',
+            self._chat_payload(_chat_date_filter_prompt(query), 0.1, 200),
+            self.date_filter_timeout
+        )
+        return _parse_date_filter_response(result['choices'][0]['message']['content'], 'OpenAI')
 
 class GroqProvider(LLMProvider):
     """Groq LLM provider"""
     
+    provider_name = 'groq'
+    embedding_model_name = 'md5-hash-768'
+    cache_embeddings = False
+    # Hashing in process gains nothing from threads
+    embedding_concurrency = 1
+    
     def __init__(self):
+        # 'local' embeds with the hashed n-gram model instead of the MD5 placeholder;
+        # switching requires re-embedding stored entries
+        self.local_embeddings = os.getenv('GROQ_EMBEDDINGS', 'md5').lower() == 'local'
+        if self.local_embeddings:
+            self.embedding_model_name = local_embedder.model_name
+        
         api_key = os.getenv('GROQ_API_KEY')
         if not api_key or api_key == 'your-groq-api-key-here':
             print("Warning: No valid Groq API key found. Using fallback mode.")
@@ -238,7 +513,7 @@ class GroqProvider(LLMProvider):
     def generate_text(self, prompt: str) -> str:
         if not self.client:
             # Fallback response for development
-            return f"[FALLBACK] This is a simulated AI response to: '{prompt[:100]}...'. Groq API is currently unavailable."
+            return f"{FALLBACK_PREFIX} This is a simulated AI response to: '{prompt[:100]}...'. Groq API is currently unavailable."
         
         try:
             response = self.client.chat.completions.create(
@@ -254,13 +529,39 @@ class GroqProvider(LLMProvider):
         except Exception as e:
             print(f"Groq API error: {e}")
             # Return fallback response instead of failing
-            return f"[FALLBACK] AI service temporarily unavailable. Your question was: '{prompt[:100]}...'"
+            return f"{FALLBACK_PREFIX} AI service temporarily unavailable. Your question was: '{prompt[:100]}...'"
     
-    def generate_embedding(self, text: str) -> List[float]:
+    def generate_text_stream(self, prompt: str) -> Iterator[str]:
+        if not self.client:
+            yield self.generate_text(prompt)
+            return
+        
+        try:
+            stream = self.client.chat.completions.create(
+                model="llama-3.1-8b-instant",
+                messages=[
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.7,
+                max_tokens=1000,
+                timeout=30,
+                stream=True
+            )
+            for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    yield delta
+        except Exception as e:
+            print(f"Groq API streaming error: {e}")
+            raise Exception(f"Error streaming text with Groq: {str(e)}")
+    
+    def _generate_embedding(self, text: str) -> List[float]:
         """
         Groq doesn't provide embedding models, so we'll use a simple
         hash-based approach for development or fall back to local embeddings
         """
+        if self.local_embeddings:
+            return local_embedder.embed(text).tolist()
         try:
             # Simple hash-based embedding for development
             import hashlib
@@ -283,90 +584,276 @@ class GroqProvider(LLMProvider):
             print(f"Generated hash-based embedding with {len(embedding)} dimensions")
             return embedding
         except Exception as e:
-            print(f"Warning: Could not generate hash-based embedding: {str(e)}")
-            # Return random embedding as last resort
-            import random
-            return [random.random() * 2 - 1 for _ in range(768)]
+            raise Exception(f"Error generating hash-based embedding: {str(e)}")
     
-    def extract_date_filter(self, query: str) -> Dict[str, Any]:
+    def _extract_date_filter(self, query: str) -> Dict[str, Any]:
         """Extract date filter from query using Groq AI"""
         if not self.client:
-            return {
-                'has_date_filter': False,
-                'start_date': None,
-                'end_date': None,
-                'filter_type': None,
-                'explanation': 'Groq API unavailable'
-            }
+            raise Exception("Groq API unavailable")
         
-        try:
-            from datetime import datetime
-            current_date = datetime.now().strftime('%Y-%m-%d')
-            current_year = datetime.now().year
-            current_month = datetime.now().month
-            
-            prompt = f"""Analyze this user query and extract date/time filtering information. Today's date is {current_date}.
-
-Query: "{query}"
-
-Return ONLY a JSON object with these fields:
-{{
-    "has_date_filter": true/false,
-    "start_date": "YYYY-MM-DD" or null,
-    "end_date": "YYYY-MM-DD" or null,
-    "filter_type": "specific_date|date_range|relative" or null,
-    "explanation": "brief explanation"
-}}
+        prompt = _chat_date_filter_prompt(query)
 
-Examples:
-- "today" or "what have I done today" → {{"has_date_filter": true, "start_date": "{current_date}", "end_date": "{current_date}", "filter_type": "specific_date", "explanation": "Today's entries"}}
-- "yesterday" → {{"has_date_filter": true, "start_date": "calculate-yesterday", "end_date": "calculate-yesterday", "filter_type": "specific_date", "explanation": "Yesterday's entries"}}
-- "current month" → {{"has_date_filter": true, "start_date": "{current_year}-{current_month:02d}-01", "end_date": "{current_year}-{current_month:02d}-30", "filter_type": "relative", "explanation": "Current month filter"}}
-- "last week" → calculate previous week dates
-- "August 2025" → {{"has_date_filter": true, "start_date": "2025-08-01", "end_date": "2025-08-31", "filter_type": "date_range", "explanation": "Specific month"}}
-- No date → {{"has_date_filter": false, "start_date": null, "end_date": null, "filter_type": null, "explanation": "No date filter"}}
+        response = self.client.chat.completions.create(
+            model="llama-3.1-8b-instant",
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.1,
+            max_tokens=200,
+            timeout=15
+        )
+        
+        return _parse_date_filter_response(response.choices[0].message.content, 'Groq')
 
-Return ONLY the JSON, no other text:"""
+class LocalProvider(LLMProvider):
+    """
+    Offline provider: hashed n-gram embeddings computed in process and dates from
+    the local parser. It cannot generate text, so LLM_PROVIDER=local is rejected;
+    pair it with a text provider through the router (LLM_ROUTER_EMBEDDING_PROVIDER=local).
+    """
+    
+    provider_name = 'local'
+    supports_text = False
+    embedding_model_name = local_embedder.model_name
+    # Recomputing takes well under a millisecond, less than a cache lookup
+    cache_embeddings = False
+    embedding_batch_size = 256
+    embedding_concurrency = 1
+    
+    def generate_text(self, prompt: str) -> str:
+        raise NotImplementedError("The local provider only computes embeddings and date filters")
+    
+    def _generate_embedding(self, text: str) -> List[float]:
+        return local_embedder.embed(text).tolist()
+    
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        return local_embedder.embed_many(texts).tolist()
+    
+    def _extract_date_filter(self, query: str) -> Dict[str, Any]:
+        date_filter = date_parser.extract_date_filter(query)
+        if date_filter is None:
+            raise ValueError(f"Local date parser cannot resolve: {query}")
+        return date_filter
 
-            response = self.client.chat.completions.create(
-                model="llama-3.1-8b-instant",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.1,
-                max_tokens=200,
-                timeout=15
-            )
+class RouterProvider(LLMProvider):
+    """
+    Routes calls over several providers by health and latency.
+    
+    Text generation and date extraction go to the provider with the lowest EWMA
+    latency among the text-capable ones whose circuit is closed, failing over to
+    the next on an error. With hedging on, a call still running after the provider's p95
+    latency is also sent to the next provider and the first success wins.
+    Embeddings always come from one provider, because vectors from different
+    models cannot be compared.
+    """
+    
+    provider_name = 'router'
+    
+    def __init__(self, provider_names: Optional[List[str]] = None):
+        names = provider_names or [
+            name.strip().lower()
+            for name in os.getenv('LLM_ROUTER_PROVIDERS', 'groq,gemini').split(',') if name.strip()
+        ]
+        self.providers: Dict[str, LLMProvider] = {}
+        for name in names:
+            if name == self.provider_name or name not in LLMFactory._providers:
+                raise ValueError(f"Unknown LLM router provider: {name}")
+            try:
+                self.providers[name] = LLMFactory._providers[name]()
+            except Exception as e:
+                print(f"Warning: LLM router skipping provider {name}: {e}")
+        if not self.providers:
+            raise ValueError(f"No LLM router provider could be initialized from {names}")
+        if not self._eligible('generate_text'):
+            raise ValueError(f"No LLM router provider in {list(self.providers)} can generate text")
+        
+        # The embedding provider need not be one of the text providers (e.g. 'local')
+        embedding_name = os.getenv('LLM_ROUTER_EMBEDDING_PROVIDER', next(iter(self.providers))).lower()
+        if embedding_name in self.providers:
+            self.embedding_provider = self.providers[embedding_name]
+        elif embedding_name in LLMFactory._providers and embedding_name != self.provider_name:
+            self.embedding_provider = LLMFactory._providers[embedding_name]()
+        else:
+            raise ValueError(f"LLM router embedding provider {embedding_name} is not available")
+        self.embedding_provider_name = embedding_name
+        self.embedding_model_name = self.embedding_provider.embedding_model_name
+        
+        self.hedge = os.getenv('LLM_ROUTER_HEDGE', 'true').lower() == 'true'
+        self.hedge_percentile = float(os.getenv('LLM_ROUTER_HEDGE_PERCENTILE', 95))
+        self.hedge_min_samples = int(os.getenv('LLM_ROUTER_HEDGE_MIN_SAMPLES', 20))
+        self.hedge_min_delay = float(os.getenv('LLM_ROUTER_HEDGE_MIN_MS', 200)) / 1000
+        self.health = ProviderHealth()
+        self._executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv('LLM_ROUTER_WORKERS', 16)),
+            thread_name_prefix='llm-router'
+        )
+        self._counters = {'calls': 0, 'failovers': 0, 'hedges': 0, 'hedge_wins': 0, 'exhausted': 0}
+        self._lock = threading.Lock()
+        print(f"🧭 LLM router over {list(self.providers)} (text: {self._eligible('generate_text')}), embeddings from {embedding_name}, hedging {'on' if self.hedge else 'off'}")
+    
+    def _count(self, counter: str):
+        with self._lock:
+            self._counters[counter] += 1
+    
+    def _eligible(self, operation: str) -> List[str]:
+        """Providers able to serve the operation at all, in configured order"""
+        if operation in TEXT_OPERATIONS:
+            return [name for name, provider in self.providers.items() if provider.supports_text]
+        return list(self.providers)
+    
+    def _candidates(self, operation: str) -> List[str]:
+        """Providers whose circuit lets calls through, fastest first (unmeasured ones in configured order)"""
+        order = self._eligible(operation)
+        
+        def speed(name):
+            latency = self.health.ewma_latency(name, operation)
+            return (latency is not None, latency or 0.0, order.index(name))
+        
+        return [name for name in sorted(order, key=speed) if self.health.available(name, operation)]
+    
+    def _hedge_delay(self, name: str, operation: str) -> Optional[float]:
+        if not self.hedge:
+            return None
+        delay = self.health.latency_percentile(name, operation, self.hedge_percentile, self.hedge_min_samples)
+        return None if delay is None else max(delay, self.hedge_min_delay)
+    
+    def _timed(self, name: str, operation: str, call):
+        started = time.monotonic()
+        try:
+            result = call(self.providers[name])
+        except Exception:
+            self.health.record_failure(name, operation)
+            raise
+        self.health.record_success(name, operation, time.monotonic() - started)
+        return result
+    
+    def _route(self, operation: str, call):
+        """Run call(provider) on the best provider with failover and at most one hedge"""
+        self._count('calls')
+        candidates = self._candidates(operation)
+        # With every circuit open, trying is still better than failing outright
+        forced = not candidates
+        if forced:
+            candidates = self._eligible(operation)
+        pending = {}
+        errors = []
+        launched = 0
+        hedged = False
+        
+        def launch():
+            nonlocal launched
+            while launched < len(candidates):
+                name = candidates[launched]
+                launched += 1
+                # Reserves the single trial call of a half-open circuit
+                if forced or self.health.allow(name, operation):
+                    pending[self._executor.submit(self._timed, name, operation, call)] = name
+                    return
+        
+        launch()
+        while pending:
+            timeout = None
+            if not hedged and len(pending) == 1 and launched < len(candidates):
+                timeout = self._hedge_delay(next(iter(pending.values())), operation)
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
             
-            # Parse the JSON response
-            import json
-            response_text = response.choices[0].message.content.strip()
+            if not done:
+                hedged = True
+                self._count('hedges')
+                launch()
+                continue
             
-            # Clean up the response
-            if response_text.startswith('```json'):
-                response_text = response_text.replace('```json', '').replace('```', '').strip()
+            for future in done:
+                name = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    errors.append(f"{name}: {e}")
+                    continue
+                if hedged and name != candidates[0]:
+                    self._count('hedge_wins')
+                # A slower hedged call finishes in the background and still updates health
+                return result
             
-            try:
-                date_filter = json.loads(response_text)
-                print(f"📅 Groq extracted date filter: {date_filter}")
-                return date_filter
-            except json.JSONDecodeError as e:
-                print(f"⚠️ Failed to parse Groq date filter: {response_text}")
-                return {
-                    'has_date_filter': False,
-                    'start_date': None,
-                    'end_date': None,
-                    'filter_type': None,
-                    'explanation': 'Failed to parse'
-                }
-                
+            if not pending and launched < len(candidates):
+                self._count('failovers')
+                launch()
+        
+        self._count('exhausted')
+        raise Exception(f"All LLM providers failed for {operation}: {'; '.join(errors)}")
+    
+    def generate_text(self, prompt: str) -> str:
+        def call(provider):
+            text = provider.generate_text(prompt)
+            if text.startswith(FALLBACK_PREFIX):
+                raise Exception(text)
+            return text
+        
+        try:
+            return self._route('generate_text', call)
         except Exception as e:
-            print(f"Error extracting date filter with Groq: {str(e)}")
-            return {
-                'has_date_filter': False,
-                'start_date': None,
-                'end_date': None,
-                'filter_type': None,
-                'explanation': f'Error: {str(e)}'
-            }
+            print(f"LLM router error: {e}")
+            return f"{FALLBACK_PREFIX} AI service temporarily unavailable. Your question was: '{prompt[:100]}...'"
+    
+    def generate_text_stream(self, prompt: str) -> Iterator[str]:
+        """Stream from the best provider; fail over only while nothing has been yielded"""
+        self._count('calls')
+        errors = []
+        candidates = self._candidates('generate_text_stream')
+        forced = not candidates
+        for name in candidates or self._eligible('generate_text_stream'):
+            if not (forced or self.health.allow(name, 'generate_text_stream')):
+                continue
+            if errors:
+                self._count('failovers')
+            started = time.monotonic()
+            stream = self.providers[name].generate_text_stream(prompt)
+            try:
+                first = next(stream, None)
+                if first is None or first.startswith(FALLBACK_PREFIX):
+                    raise Exception(first or 'empty stream')
+            except Exception as e:
+                self.health.record_failure(name, 'generate_text_stream')
+                errors.append(f"{name}: {e}")
+                continue
+            # Time to first token is what the user waits for
+            self.health.record_success(name, 'generate_text_stream', time.monotonic() - started)
+            yield first
+            yield from stream
+            return
+        
+        self._count('exhausted')
+        raise Exception(f"All LLM providers failed for generate_text_stream: {'; '.join(errors)}")
+    
+    def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
+        # The embedding provider's own cache keys apply
+        started = time.monotonic()
+        try:
+            embeddings = self.embedding_provider.generate_embeddings(texts)
+        except Exception:
+            self.health.record_failure(self.embedding_provider_name, 'embeddings')
+            raise
+        self.health.record_success(self.embedding_provider_name, 'embeddings', time.monotonic() - started)
+        return embeddings
+    
+    def _generate_embedding(self, text: str) -> List[float]:
+        return self.embedding_provider._generate_embedding(text)
+    
+    def _generate_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return self.embedding_provider._generate_embeddings(texts)
+    
+    def _extract_date_filter(self, query: str) -> Dict[str, Any]:
+        return self._route('extract_date_filter', lambda provider: provider._extract_date_filter(query))
+    
+    def stats(self) -> Dict[str, Any]:
+        """Routing counters and per-provider health, for monitoring"""
+        with self._lock:
+            counters = dict(self._counters)
+        return {
+            'providers': list(self.providers),
+            'embedding_provider': self.embedding_provider_name,
+            'hedging': self.hedge,
+            'counters': counters,
+            'health': self.health.snapshot()
+        }
 
 class LLMFactory:
     """Factory class for creating LLM providers"""
@@ -374,12 +861,14 @@ class LLMFactory:
     _providers = {
         'gemini': GeminiProvider,
         'openai': OpenAIProvider,
-        'groq': GroqProvider
+        'groq': GroqProvider,
+        'local': LocalProvider,
+        'router': RouterProvider
     }
     
     @classmethod
-    def create_provider(cls, provider_name: str = None) -> LLMProvider:
-        """Create an LLM provider instance"""
+    def create_provider(cls, provider_name: str = None, require_text: bool = True) -> LLMProvider:
+        """Create an LLM provider instance; require_text rejects embedding-only providers"""
         if provider_name is None:
             provider_name = os.getenv('LLM_PROVIDER', 'groq')  # Default to groq
         
@@ -387,8 +876,45 @@ class LLMFactory:
         
         if provider_name not in cls._providers:
             raise ValueError(f"Unknown LLM provider: {provider_name}. Available providers: {list(cls._providers.keys())}")
+        if require_text and not cls._providers[provider_name].supports_text:
+            raise ValueError(
+                f"LLM provider {provider_name} cannot generate text. Use a text provider, or the router "
+                f"with LLM_ROUTER_EMBEDDING_PROVIDER={provider_name}"
+            )
         
         return cls._providers[provider_name]()
 
+class CoalescingProvider:
+    """
+    Wraps a provider so concurrent identical calls in this process share one
+    upstream request: double submits and the same question from several tabs
+    cost one date extraction, one query embedding and one completion. Streams
+    and batch embeddings pass through; every other attribute is the wrapped
+    provider's.
+    """
+    
+    def __init__(self, provider: LLMProvider):
+        self.provider = provider
+        self.singleflight = SingleFlight()
+    
+    def __getattr__(self, name):
+        return getattr(self.provider, name)
+    
+    def generate_text(self, prompt: str) -> str:
+        return self.singleflight.do('generate_text', prompt, self.provider.generate_text, prompt)
+    
+    def generate_embedding(self, text: str) -> List[float]:
+        return self.singleflight.do('generate_embedding', text, self.provider.generate_embedding, text)
+    
+    def extract_date_filter(self, query: str) -> Dict[str, Any]:
+        # Same key as the date filter cache: phrasings it treats as equal share a call
+        date_filter = self.singleflight.do(
+            'extract_date_filter', date_filter_cache.make_key(query), self.provider.extract_date_filter, query
+        )
+        # Every caller gets its own dict to annotate
+        return dict(date_filter)
+
 # Convenience instance for easy import
-llm_service = LLMFactory.create_provider()
\ No newline at end of file
+llm_service = LLMFactory.create_provider()
+if os.getenv('LLM_SINGLEFLIGHT_ENABLED', 'true').lower() == 'true':
+    llm_service = CoalescingProvider(llm_service)
\ No newline at end of file
@@ -0,0 +1,123 @@
+import os
+import re
+import zlib
+from typing import List
+import numpy as np
+from services.context_builder import STOPWORDS
+
+# Output size matches the embedding columns (Vector(768))
+LOCAL_EMBEDDING_DIMENSIONS = int(os.getenv('LOCAL_EMBEDDING_DIMENSIONS', 768))
+# Output dimensions each feature is spread over by the sparse random projection
+LOCAL_EMBEDDING_PROJECTIONS = int(os.getenv('LOCAL_EMBEDDING_PROJECTIONS', 4))
+# Changing the seed changes every vector: stored embeddings must then be rebuilt
+LOCAL_EMBEDDING_SEED = int(os.getenv('LOCAL_EMBEDDING_SEED', 1729))
+
+_WORD = re.compile(r"[a-z0-9']+")
+_NON_WORD = re.compile(r"[^a-z0-9']+")
+
+# Feature weights: whole words carry the topic, word pairs the phrasing, and
+# character n-grams match inflections and typos ("walked" ~ "walking")
+WORD_WEIGHT = 1.0
+STOPWORD_WEIGHT = 0.15
+BIGRAM_WEIGHT = 0.6
+CHAR_GRAM_WEIGHT = 0.2
+
+# Distinguish feature types that could share an id
+_WORD_TAG, _BIGRAM_TAG, _TRIGRAM_TAG, _FOURGRAM_TAG = (np.uint64(tag) << np.uint64(56) for tag in (1, 2, 3, 4))
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+
+def _mix(values: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer: spreads feature ids over all 64 bits (wrapping uint64 arithmetic)"""
+    values = values ^ (values >> np.uint64(30))
+    values = values * np.uint64(0xBF58476D1CE4E5B9)
+    values = values ^ (values >> np.uint64(27))
+    values = values * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+class HashedNgramEmbedder:
+    """
+    Deterministic text embeddings computed on the CPU with NumPy.
+
+    Word unigrams, word bigrams and character 3/4-grams are hashed to 64-bit
+    ids and mapped through a fixed sparse random projection: each feature adds
+    its weight with a pseudo-random sign to LOCAL_EMBEDDING_PROJECTIONS of the
+    output dimensions, all derived from the hash so there is no matrix to store.
+    Vectors are L2-normalized, so texts sharing words, phrases and word stems
+    have high cosine similarity. Every process computes identical vectors.
+    """
+
+    def __init__(
+        self,
+        dimensions: int = LOCAL_EMBEDDING_DIMENSIONS,
+        projections: int = LOCAL_EMBEDDING_PROJECTIONS,
+        seed: int = LOCAL_EMBEDDING_SEED
+    ):
+        self.dimensions = dimensions
+        self.projections = projections
+        rng = np.random.default_rng(seed)
+        self._salts = rng.integers(1, 2 ** 63, size=(1, projections), dtype=np.uint64)
+
+    @property
+    def model_name(self) -> str:
+        """Identifies the vector space in the embedding cache"""
+        return f'hashed-ngram-{self.dimensions}-p{self.projections}-s{LOCAL_EMBEDDING_SEED}'
+
+    def _features(self, text: str):
+        """(feature ids, weights) of a text"""
+        lowered = text.lower()
+        words = _WORD.findall(lowered)
+        ids, weights = [], []
+
+        if words:
+            word_ids = np.fromiter(
+                (zlib.crc32(word.encode('utf-8')) for word in words), dtype=np.uint64, count=len(words)
+            )
+            ids.append(word_ids | _WORD_TAG)
+            weights.append(np.fromiter(
+                (STOPWORD_WEIGHT if word in STOPWORDS else WORD_WEIGHT for word in words),
+                dtype=np.float32, count=len(words)
+            ))
+            if len(words) > 1:
+                ids.append(((word_ids[:-1] << np.uint64(32)) | word_ids[1:]) ^ _BIGRAM_TAG)
+                weights.append(np.full(len(words) - 1, BIGRAM_WEIGHT, dtype=np.float32))
+
+        # Character grams over the words separated by single spaces, so grams
+        # spanning a word boundary mark word starts and ends
+        padded = ' ' + _NON_WORD.sub(' ', lowered).strip() + ' '
+        data = np.frombuffer(padded.encode('utf-8'), dtype=np.uint8).astype(np.uint64)
+        if len(data) >= 4:
+            trigrams = (data[:-2] << np.uint64(16)) | (data[1:-1] << np.uint64(8)) | data[2:]
+            fourgrams = (trigrams[:-1] << np.uint64(8)) | data[3:]
+            ids.append(trigrams | _TRIGRAM_TAG)
+            ids.append(fourgrams | _FOURGRAM_TAG)
+            weights.append(np.full(len(trigrams) + len(fourgrams), CHAR_GRAM_WEIGHT, dtype=np.float32))
+
+        if not ids:
+            return np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.float32)
+        return np.concatenate(ids), np.concatenate(weights)
+
+    def embed(self, text: str) -> np.ndarray:
+        """One normalized float32 vector; all zeros for text without words"""
+        ids, weights = self._features(text)
+        vector = np.zeros(self.dimensions, dtype=np.float64)
+        if len(ids):
+            hashed = _mix((ids * _GOLDEN)[:, None] ^ self._salts)
+            dims = (hashed % np.uint64(self.dimensions)).astype(np.intp)
+            signs = np.where(hashed >> np.uint64(63), -1.0, 1.0)
+            vector = np.bincount(
+                dims.ravel(), weights=(signs * weights[:, None]).ravel(), minlength=self.dimensions
+            )
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+        return vector.astype(np.float32)
+
+    def embed_many(self, texts: List[str]) -> np.ndarray:
+        """Normalized vectors as rows of a (len(texts), dimensions) float32 matrix"""
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            matrix[row] = self.embed(text)
+        return matrix
+
+# Convenience instance for easy import
+local_embedder = HashedNgramEmbedder()
@@ -0,0 +1,139 @@
+import os
+import time
+import threading
+from collections import deque
+from typing import Any, Dict, Optional, Tuple
+import numpy as np
+
+# Weight of the newest observation in the latency and error-rate averages
+PROVIDER_HEALTH_EWMA_ALPHA = float(os.getenv('PROVIDER_HEALTH_EWMA_ALPHA', 0.2))
+# Consecutive failures that open a provider's circuit, and how long it stays open
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', 5))
+CIRCUIT_OPEN_SECONDS = float(os.getenv('CIRCUIT_OPEN_SECONDS', 30))
+# Latency samples kept per provider and operation for the hedging percentile
+LATENCY_SAMPLES = int(os.getenv('PROVIDER_LATENCY_SAMPLES', 200))
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+class _OperationHealth:
+    """Latency and failure history of one provider for one operation"""
+
+    __slots__ = ('ewma_latency', 'error_rate', 'samples', 'calls', 'failures',
+                 'consecutive_failures', 'state', 'opened_at', 'probing')
+
+    def __init__(self):
+        self.ewma_latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.samples = deque(maxlen=LATENCY_SAMPLES)
+        self.calls = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probing = False
+
+class ProviderHealth:
+    """
+    Per (provider, operation) EWMA latency, EWMA error rate and a circuit breaker.
+
+    A circuit opens after CIRCUIT_FAILURE_THRESHOLD consecutive failures and
+    rejects calls for CIRCUIT_OPEN_SECONDS. Then it is half-open: one trial call
+    is let through, which closes it on success and reopens it on failure.
+    Latency is only learned from successful calls.
+    """
+
+    def __init__(self):
+        self._operations: Dict[Tuple[str, str], _OperationHealth] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, provider: str, operation: str) -> _OperationHealth:
+        # Caller holds the lock
+        key = (provider, operation)
+        health = self._operations.get(key)
+        if health is None:
+            health = self._operations[key] = _OperationHealth()
+        return health
+
+    def available(self, provider: str, operation: str) -> bool:
+        """Whether allow() would let a call through, without reserving a trial call"""
+        with self._lock:
+            health = self._get(provider, operation)
+            if health.state == OPEN:
+                return time.monotonic() - health.opened_at >= CIRCUIT_OPEN_SECONDS
+            return not (health.state == HALF_OPEN and health.probing)
+
+    def allow(self, provider: str, operation: str) -> bool:
+        """Whether a call may be sent now; reserves the trial call of a half-open circuit"""
+        with self._lock:
+            health = self._get(provider, operation)
+            if health.state == OPEN:
+                if time.monotonic() - health.opened_at < CIRCUIT_OPEN_SECONDS:
+                    return False
+                health.state = HALF_OPEN
+                health.probing = False
+            if health.state == HALF_OPEN:
+                if health.probing:
+                    return False
+                health.probing = True
+            return True
+
+    def ewma_latency(self, provider: str, operation: str) -> Optional[float]:
+        with self._lock:
+            return self._get(provider, operation).ewma_latency
+
+    def record_success(self, provider: str, operation: str, latency: float):
+        with self._lock:
+            health = self._get(provider, operation)
+            health.calls += 1
+            health.consecutive_failures = 0
+            health.error_rate *= 1 - PROVIDER_HEALTH_EWMA_ALPHA
+            health.samples.append(latency)
+            if health.ewma_latency is None:
+                health.ewma_latency = latency
+            else:
+                health.ewma_latency += PROVIDER_HEALTH_EWMA_ALPHA * (latency - health.ewma_latency)
+            health.state = CLOSED
+            health.probing = False
+
+    def record_failure(self, provider: str, operation: str):
+        with self._lock:
+            health = self._get(provider, operation)
+            health.calls += 1
+            health.failures += 1
+            health.consecutive_failures += 1
+            health.error_rate += PROVIDER_HEALTH_EWMA_ALPHA * (1 - health.error_rate)
+            if health.state == HALF_OPEN or health.consecutive_failures >= CIRCUIT_FAILURE_THRESHOLD:
+                if health.state != OPEN:
+                    print(f"🔌 Circuit opened for {provider}.{operation} after {health.consecutive_failures} failures")
+                health.state = OPEN
+                health.opened_at = time.monotonic()
+            health.probing = False
+
+    def latency_percentile(self, provider: str, operation: str, percentile: float, min_samples: int) -> Optional[float]:
+        """Latency percentile in seconds, or None with fewer than min_samples successes"""
+        with self._lock:
+            samples = list(self._get(provider, operation).samples)
+        if len(samples) < min_samples:
+            return None
+        return float(np.percentile(samples, percentile))
+
+    def snapshot(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """State per provider and operation, for monitoring"""
+        now = time.monotonic()
+        with self._lock:
+            items = list(self._operations.items())
+            result: Dict[str, Dict[str, Dict[str, Any]]] = {}
+            for (provider, operation), health in items:
+                samples = list(health.samples)
+                result.setdefault(provider, {})[operation] = {
+                    'state': health.state,
+                    'ewma_latency_ms': round(health.ewma_latency * 1000, 1) if health.ewma_latency is not None else None,
+                    'p95_latency_ms': round(float(np.percentile(samples, 95)) * 1000, 1) if samples else None,
+                    'error_rate': round(health.error_rate, 4),
+                    'calls': health.calls,
+                    'failures': health.failures,
+                    'consecutive_failures': health.consecutive_failures,
+                    'open_for_seconds': round(max(0.0, CIRCUIT_OPEN_SECONDS - (now - health.opened_at)), 1)
+                    if health.state == OPEN else 0.0
+                }
+        return result
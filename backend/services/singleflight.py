@@ -0,0 +1,65 @@
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+class _Call:
+    """One in-flight call whose outcome is shared with every caller of the same key"""
+
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls within the process.
+
+    The first caller of a key runs the function; callers arriving while it runs
+    wait and get the same result, or the same exception. Nothing is remembered
+    once the call finishes, so this never serves a stale result (that is the
+    caches' job). Counters record how many calls were collapsed per operation.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    def do(self, operation: str, key: Hashable, fn: Callable[..., Any], *args) -> Any:
+        flight_key = (operation, key)
+        with self._lock:
+            counters = self._counters.setdefault(operation, {'calls': 0, 'collapsed': 0})
+            counters['calls'] += 1
+            call = self._calls.get(flight_key)
+            leader = call is None
+            if leader:
+                call = self._calls[flight_key] = _Call()
+            else:
+                counters['collapsed'] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[flight_key]
+            call.done.set()
+
+    def stats(self) -> Dict[str, Any]:
+        """Calls and collapsed calls per operation, and calls currently in flight"""
+        with self._lock:
+            operations = {operation: dict(counters) for operation, counters in self._counters.items()}
+            in_flight = len(self._calls)
+        for counters in operations.values():
+            counters['collapse_rate'] = round(counters['collapsed'] / counters['calls'], 4) if counters['calls'] else 0.0
+        return {'operations': operations, 'in_flight': in_flight}
@@ -0,0 +1,60 @@
+import os
+import logging
+from typing import Any, Dict
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# Per-connection pragmas for single-node SQLite deployments
+SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL').upper()
+SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL').upper()
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+SQLITE_CACHE_SIZE_KIB = int(os.getenv('SQLITE_CACHE_SIZE_KIB', 64 * 1024))
+
+if SQLITE_JOURNAL_MODE not in ('DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF'):
+    raise ValueError(f"Invalid SQLITE_JOURNAL_MODE: {SQLITE_JOURNAL_MODE}")
+if SQLITE_SYNCHRONOUS not in ('OFF', 'NORMAL', 'FULL', 'EXTRA'):
+    raise ValueError(f"Invalid SQLITE_SYNCHRONOUS: {SQLITE_SYNCHRONOUS}")
+
+def engine_options() -> Dict[str, Any]:
+    """
+    SQLAlchemy engine options for SQLite. The PostgreSQL pool and driver
+    arguments (pool_size, connect_timeout, application_name) do not apply; the
+    busy timeout replaces connect_timeout and connections may be shared with
+    the embedding worker threads.
+    """
+    return {
+        'pool_pre_ping': False,  # A local file cannot drop the connection
+        'connect_args': {
+            'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000,
+            'check_same_thread': False
+        }
+    }
+
+def _apply_pragmas(dbapi_connection, connection_record):
+    """
+    WAL lets readers run alongside the single writer; synchronous=NORMAL is
+    durable in WAL mode except for the last transactions on power loss;
+    mmap_size serves reads from the page cache without read() calls.
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA journal_mode = {SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous = {SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}")
+        cursor.execute(f"PRAGMA cache_size = -{SQLITE_CACHE_SIZE_KIB}")
+        cursor.execute("PRAGMA temp_store = MEMORY")
+    finally:
+        cursor.close()
+
+def init_app(app, db):
+    """Apply the pragmas to every new connection of the app's SQLite engine"""
+    with app.app_context():
+        engine = db.engine
+        if engine.dialect.name != 'sqlite':
+            return
+        event.listen(engine, 'connect', _apply_pragmas)
+    print(f"🗄️ SQLite profile: journal_mode={SQLITE_JOURNAL_MODE}, synchronous={SQLITE_SYNCHRONOUS}, "
+          f"busy_timeout={SQLITE_BUSY_TIMEOUT_MS}ms, mmap_size={SQLITE_MMAP_SIZE}")
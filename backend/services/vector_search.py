@@ -0,0 +1,297 @@
+import os
+import time
+import threading
+import logging
+from collections import OrderedDict
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from extensions import db
+from models import Entry, EntryChunk, decode_embedding, uses_pgvector
+from services.answer_cache import answer_cache
+from services.vector_store import VectorFileStore, vector_store
+
+logger = logging.getLogger(__name__)
+
+# Searchable embedding sources: whole entries and their passages
+SOURCES = {'entries': Entry, 'chunks': EntryChunk}
+# Rows fetched per query when syncing the vector file store
+SYNC_BATCH_SIZE = 500
+# Builds of a user's matrix discarded for overlapping writes before giving up on caching
+MATRIX_BUILD_ATTEMPTS = 3
+
+class UserEmbeddingMatrix:
+    """
+    One user's embeddings as a row-normalized float32 matrix.
+
+    Rows are sorted by effective date (entry_date, falling back to the created_at
+    date) so a date filter is a contiguous slice found with searchsorted instead
+    of a per-row comparison.
+    """
+
+    __slots__ = ('ids', 'ordinals', 'matrix', 'built_at')
+
+    def __init__(self, ids: np.ndarray, ordinals: np.ndarray, matrix: np.ndarray):
+        self.ids = ids
+        self.ordinals = ordinals
+        self.matrix = matrix
+        self.built_at = time.monotonic()
+
+    @classmethod
+    def from_rows(cls, rows) -> 'UserEmbeddingMatrix':
+        """Build from (id, owner, effective_date, embedding) rows, skipping unusable vectors"""
+        ids, ordinals, vectors = [], [], []
+        dimensions = None
+        for entry_id, _, effective_date, embedding in rows:
+            if embedding is None or len(embedding) == 0 or effective_date is None:
+                continue
+            if dimensions is None:
+                dimensions = len(embedding)
+            if len(embedding) != dimensions:
+                continue
+            ids.append(entry_id)
+            ordinals.append(effective_date.toordinal())
+            vectors.append(embedding)
+
+        if not vectors:
+            return cls(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=np.float32))
+
+        matrix = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        matrix /= norms
+
+        order = np.argsort(ordinals, kind='stable')
+        return cls(
+            np.asarray(ids, dtype=np.int64)[order],
+            np.asarray(ordinals, dtype=np.int64)[order],
+            np.ascontiguousarray(matrix[order])
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return self.ids.nbytes + self.ordinals.nbytes + self.matrix.nbytes
+
+    def search(
+        self,
+        query: np.ndarray,
+        start_date: Optional[date],
+        end_date: Optional[date],
+        limit: int
+    ) -> List[Tuple[int, float]]:
+        """Top-k (entry_id, cosine similarity) pairs for a normalized query vector"""
+        if not len(self.ids) or query.shape[0] != self.matrix.shape[1]:
+            return []
+
+        lo, hi = 0, len(self.ids)
+        if start_date and end_date:
+            lo = int(np.searchsorted(self.ordinals, start_date.toordinal(), side='left'))
+            hi = int(np.searchsorted(self.ordinals, end_date.toordinal(), side='right'))
+        if hi <= lo:
+            return []
+
+        scores = self.matrix[lo:hi] @ query
+        k = min(limit, len(scores))
+        if k < len(scores):
+            # O(n) selection of the k best, then sort only those
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind='stable')]
+
+        return [(int(self.ids[lo + i]), float(scores[i])) for i in top]
+
+class VectorSearchEngine:
+    """
+    In-process cosine search over per-user embeddings.
+    
+    Without pgvector, embeddings are served from the memory-mapped vector file
+    store shared by all worker processes: it is built from the database on a
+    user's first search and kept in sync by invalidate(), which every entry
+    write calls. With the store disabled (or as the pgvector error fallback),
+    per-user matrices are built on first use, kept in an LRU bounded by user
+    count, and dropped by invalidate(); a TTL bounds staleness for writes made
+    by other processes.
+    """
+    
+    def __init__(self, store: Optional[VectorFileStore] = None):
+        self.max_users = int(os.getenv('VECTOR_CACHE_MAX_USERS', 64))
+        self.ttl = float(os.getenv('VECTOR_CACHE_TTL_SECONDS', 60))
+        self.store = store or vector_store
+        self._matrices: 'OrderedDict[Tuple[int, str], UserEmbeddingMatrix]' = OrderedDict()
+        # Bumped by invalidate() so a build that overlapped a write is not cached
+        self._generations: Dict[int, int] = {}
+        self._lock = threading.Lock()
+    
+    def _uses_store(self) -> bool:
+        return self.store.enabled and not uses_pgvector()
+    
+    def invalidate(self, user_id: int, entry_ids: Optional[Iterable[int]] = None):
+        """
+        Refresh a user's embeddings after any of their entries changed.
+        
+        entry_ids names the entries that were created, edited, re-embedded or
+        deleted: only their rows (and their chunks) are re-read and rewritten in
+        the vector file store. Without it the whole store is compared with the
+        database, which scans all of the user's rows.
+        """
+        if entry_ids is not None:
+            entry_ids = list(entry_ids)
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            for source in SOURCES:
+                self._matrices.pop((user_id, source), None)
+        # Answers built from the old entries must not be served again
+        answer_cache.bump(user_id)
+        
+        if self._uses_store():
+            for source in SOURCES:
+                try:
+                    self._sync_store(user_id, source, entry_ids)
+                except Exception as e:
+                    # The next write or a rebuild repairs the store; never fail the write
+                    logger.warning(f"Vector store sync for user {user_id} ({source}) failed: {str(e)}")
+    
+    def clear(self):
+        with self._lock:
+            self._matrices.clear()
+    
+    def search(
+        self,
+        embedding: List[float],
+        user_id: int,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        limit: int = 10,
+        source: str = 'entries'
+    ) -> List[Tuple[int, float]]:
+        """
+        Return (id, similarity) pairs, most similar first. source selects whole
+        entries ('entries', ids are entry ids) or passages ('chunks', ids are chunk ids).
+        """
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if not norm:
+            return []
+        query = query / norm
+        
+        if self._uses_store():
+            view = self.store.ensure(user_id, source, lambda: self._load_rows(user_id, source))
+            return view.search(query, start_date, end_date, limit)
+        return self._get_matrix(user_id, source).search(query, start_date, end_date, limit)
+    
+    def _get_matrix(self, user_id: int, source: str) -> UserEmbeddingMatrix:
+        key = (user_id, source)
+        for attempt in range(MATRIX_BUILD_ATTEMPTS):
+            with self._lock:
+                matrix = self._matrices.get(key)
+                if matrix is not None and time.monotonic() - matrix.built_at < self.ttl:
+                    self._matrices.move_to_end(key)
+                    return matrix
+                generation = self._generations.get(user_id, 0)
+            
+            # Build outside the lock; a concurrent build for the same user is harmless
+            matrix = self._build_matrix(user_id, source)
+            with self._lock:
+                if self._generations.get(user_id, 0) != generation:
+                    # invalidate() ran during the build, which may predate the write
+                    continue
+                self._matrices[key] = matrix
+                self._matrices.move_to_end(key)
+                while len(self._matrices) > self.max_users * len(SOURCES):
+                    self._matrices.popitem(last=False)
+            return matrix
+        
+        # Writes keep landing mid-build: serve a fresh build without caching it
+        return self._build_matrix(user_id, source)
+    
+    @staticmethod
+    def _load_rows(
+        user_id: int,
+        source: str,
+        ids: Optional[List[int]] = None,
+        owners: Optional[List[int]] = None
+    ) -> List[tuple]:
+        """
+        Decoded (id, owner entry id, effective_date, embedding) rows for a user,
+        optionally only some ids or only the rows of some entries
+        """
+        is_pgvector = uses_pgvector()
+        model = SOURCES[source]
+        owner = Entry.id if model is Entry else EntryChunk.entry_id
+        column = model.embedding_vector if is_pgvector else model.embedding_blob
+        query = db.session.query(model.id, owner, Entry.effective_date, column)
+        if model is EntryChunk:
+            # Chunks take their date from the entry so date edits apply immediately
+            query = query.join(Entry, Entry.id == EntryChunk.entry_id)
+        query = query.filter(
+            model.user_id == user_id,
+            column.isnot(None)
+        )
+        if ids is not None:
+            query = query.filter(model.id.in_(ids))
+        if owners is not None:
+            query = query.filter(owner.in_(owners))
+        
+        return [
+            (row_id, owner_id, effective_date, stored if is_pgvector else decode_embedding(stored))
+            for row_id, owner_id, effective_date, stored in query.all()
+        ]
+    
+    @staticmethod
+    def _build_matrix(user_id: int, source: str) -> UserEmbeddingMatrix:
+        started = time.perf_counter()
+        matrix = UserEmbeddingMatrix.from_rows(VectorSearchEngine._load_rows(user_id, source))
+        logger.info(
+            f"Built {source} embedding matrix for user {user_id}: {len(matrix.ids)} rows, "
+            f"{matrix.nbytes / 1024:.0f} KiB in {(time.perf_counter() - started) * 1000:.1f}ms"
+        )
+        return matrix
+    
+    def _sync_store(self, user_id: int, source: str, entry_ids: Optional[List[int]]):
+        """
+        Bring an existing store in line with the database. For named entries,
+        their rows are replaced wholesale; otherwise ids and dates are compared
+        (no embedding reads) and embeddings fetched only for new or changed rows.
+        """
+        view = self.store.view(user_id, source)
+        if view is None:
+            return  # Built from the database on first search
+        
+        if entry_ids is not None:
+            removed = list(view.live_rows(owners=entry_ids))
+            rows = []
+            for offset in range(0, len(entry_ids), SYNC_BATCH_SIZE):
+                rows.extend(self._load_rows(user_id, source, owners=entry_ids[offset:offset + SYNC_BATCH_SIZE]))
+            if not removed and not rows:
+                return
+            self.store.apply(user_id, source, removed, rows)
+            logger.info(f"Synced {source} vector store for user {user_id}: -{len(removed)} +{len(rows)} rows")
+            return
+        
+        model = SOURCES[source]
+        column = model.embedding_vector if uses_pgvector() else model.embedding_blob
+        query = db.session.query(model.id, Entry.effective_date)
+        if model is EntryChunk:
+            query = query.join(Entry, Entry.id == EntryChunk.entry_id)
+        current = {
+            row_id: effective_date.toordinal()
+            for row_id, effective_date in query.filter(model.user_id == user_id, column.isnot(None)).all()
+            if effective_date is not None
+        }
+        
+        stored = {row_id: int(view.ordinals[row]) for row_id, row in view.live_rows().items()}
+        removed = [row_id for row_id, ordinal in stored.items() if current.get(row_id) != ordinal]
+        removed_set = set(removed)
+        added = [row_id for row_id in current if row_id not in stored or row_id in removed_set]
+        if not removed and not added:
+            return
+        
+        rows = []
+        for offset in range(0, len(added), SYNC_BATCH_SIZE):
+            rows.extend(self._load_rows(user_id, source, added[offset:offset + SYNC_BATCH_SIZE]))
+        self.store.apply(user_id, source, removed, rows)
+        logger.info(f"Synced {source} vector store for user {user_id}: -{len(removed)} +{len(rows)} rows")
+
+# Convenience instance for easy import
+vector_search_engine = VectorSearchEngine()
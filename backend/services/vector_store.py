@@ -0,0 +1,416 @@
+import os
+import queue
+import threading
+import logging
+from contextlib import contextmanager
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are only serialized within the process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Development default; deployments set VECTOR_STORE_DIR to persistent storage
+DEFAULT_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'instance', 'vectors')
+
+# Vector file: 16-byte header (magic, uint32 dimensions, padding), then rows of
+# little-endian float32, already L2-normalized
+MAGIC = b'JVS2'
+HEADER_SIZE = 16
+# Sidecar: one record per vector row; owner is the entry the row belongs to
+# (the row's own id for entries), so one entry's rows can be found without the database
+META_DTYPE = np.dtype([('id', '<i8'), ('owner', '<i8'), ('ordinal', '<i4')])
+# Tombstones: indices of dead rows
+TOMBSTONE_DTYPE = np.dtype('<i8')
+
+class _Paths:
+    """File names of one generation of a user's store"""
+
+    __slots__ = ('vectors', 'meta', 'tombstones')
+
+    def __init__(self, base: str, generation: int):
+        self.vectors = f'{base}.{generation}.vec'
+        self.meta = f'{base}.{generation}.ids'
+        self.tombstones = f'{base}.{generation}.tomb'
+
+class OutdatedStoreError(ValueError):
+    """A store written in an older file format; it is rebuilt on the next search"""
+
+class MappedVectors:
+    """
+    Read-only view of one generation: vectors memory-mapped from the file (so
+    every process shares the page cache), ids, owners and dates from the
+    sidecar, and an alive mask built from the tombstones.
+    """
+
+    __slots__ = ('signature', 'dimensions', 'matrix', 'ids', 'owners', 'ordinals', 'alive')
+
+    def __init__(self, signature, dimensions, matrix, ids, owners, ordinals, alive):
+        self.signature = signature
+        self.dimensions = dimensions
+        self.matrix = matrix
+        self.ids = ids
+        self.owners = owners
+        self.ordinals = ordinals
+        self.alive = alive
+
+    @classmethod
+    def open(cls, base: str, signature: Tuple[int, int, int]) -> 'MappedVectors':
+        generation, meta_size, tombstone_size = signature
+        paths = _Paths(base, generation)
+        with open(paths.vectors, 'rb') as f:
+            header = f.read(HEADER_SIZE)
+        if header[:4] != MAGIC:
+            raise OutdatedStoreError(f"Not a current vector store file: {paths.vectors}")
+        dimensions = int(np.frombuffer(header, dtype='<u4', count=1, offset=4)[0])
+
+        rows = meta_size // META_DTYPE.itemsize
+        meta = np.fromfile(paths.meta, dtype=META_DTYPE, count=rows)
+        if rows:
+            matrix = np.memmap(paths.vectors, dtype='<f4', mode='r', offset=HEADER_SIZE, shape=(rows, dimensions))
+        else:
+            matrix = np.empty((0, dimensions), dtype=np.float32)
+
+        tombstones = np.fromfile(paths.tombstones, dtype=TOMBSTONE_DTYPE, count=tombstone_size // TOMBSTONE_DTYPE.itemsize)
+        alive = np.ones(rows, dtype=bool)
+        alive[tombstones[tombstones < rows]] = False
+
+        return cls(signature, dimensions, matrix, meta['id'].copy(), meta['owner'].copy(), meta['ordinal'].copy(), alive)
+
+    @property
+    def dead_rows(self) -> int:
+        return int(len(self.alive) - np.count_nonzero(self.alive))
+
+    def live_rows(self, owners: Optional[Iterable[int]] = None) -> Dict[int, int]:
+        """Map of id to row index for rows that are not tombstoned, optionally only of some owners"""
+        mask = self.alive
+        if owners is not None:
+            mask = mask & np.isin(self.owners, np.fromiter(owners, dtype=np.int64))
+        rows = np.flatnonzero(mask)
+        return dict(zip(self.ids[rows].tolist(), rows.tolist()))
+
+    def search(
+        self,
+        query: np.ndarray,
+        start_date: Optional[date],
+        end_date: Optional[date],
+        limit: int
+    ) -> List[Tuple[int, float]]:
+        """Top-k (id, cosine similarity) pairs for a normalized query vector"""
+        if not len(self.ids) or query.shape[0] != self.dimensions:
+            return []
+
+        mask = self.alive
+        if start_date and end_date:
+            mask = mask & (self.ordinals >= start_date.toordinal()) & (self.ordinals <= end_date.toordinal())
+        candidates = np.flatnonzero(mask)
+        if not len(candidates):
+            return []
+
+        if len(candidates) * 2 < len(self.ids):
+            # Narrow filter: only touch the candidate rows
+            scores = np.asarray(self.matrix[candidates]) @ query
+        else:
+            # Stream the whole mapping without copying it
+            scores = (self.matrix @ query)[candidates]
+
+        k = min(limit, len(scores))
+        if k < len(scores):
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind='stable')]
+
+        return [(int(self.ids[candidates[i]]), float(scores[i])) for i in top]
+
+class VectorFileStore:
+    """
+    Per-user, per-source append-only vector files for deployments without pgvector.
+
+    Each store is a generation of three files (vectors, id/owner/date sidecar,
+    tombstones) named by a `<user>.current` pointer that is swapped atomically.
+    Writes only ever append: an upsert tombstones the old row and appends a new
+    one, and the writer holds an flock so Gunicorn workers never interleave
+    appends. Readers map the vectors read-only and reopen whenever the pointer
+    or the sidecar/tombstone sizes change. Once tombstones pile up, a background
+    thread compacts the live rows into a new generation.
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or os.getenv('VECTOR_STORE_DIR', DEFAULT_DIRECTORY)
+        self.enabled = os.getenv('VECTOR_STORE_ENABLED', 'true').lower() == 'true'
+        self.compact_ratio = float(os.getenv('VECTOR_STORE_COMPACT_RATIO', 0.25))
+        self.compact_min_rows = int(os.getenv('VECTOR_STORE_COMPACT_MIN_ROWS', 64))
+        self._views: Dict[str, MappedVectors] = {}
+        self._pointers: Dict[str, Tuple[Tuple[int, int], int]] = {}
+        self._lock = threading.Lock()
+        self._write_locks: Dict[str, threading.Lock] = {}
+        self._compactions: 'queue.Queue[str]' = queue.Queue()
+        self._pending_compactions = set()
+        self._compactor: Optional[threading.Thread] = None
+
+    def _base(self, user_id: int, source: str) -> str:
+        return os.path.join(self.directory, source, str(user_id))
+
+    # Reading
+
+    def view(self, user_id: int, source: str) -> Optional[MappedVectors]:
+        """Current mapped view of a user's store, or None if it was never built"""
+        return self._view(self._base(user_id, source))
+
+    def _view(self, base: str) -> Optional[MappedVectors]:
+        for attempt in range(2):
+            signature = self._signature(base)
+            if signature is None:
+                return None
+            with self._lock:
+                view = self._views.get(base)
+            if view is not None and view.signature == signature:
+                return view
+            try:
+                view = MappedVectors.open(base, signature)
+            except OutdatedStoreError:
+                return None
+            except FileNotFoundError:
+                # A compaction replaced the generation between stat and open
+                with self._lock:
+                    self._pointers.pop(base, None)
+                if attempt:
+                    raise
+                continue
+            with self._lock:
+                self._views[base] = view
+            return view
+
+    def _signature(self, base: str) -> Optional[Tuple[int, int, int]]:
+        """(generation, sidecar size, tombstone size): changes whenever the store does"""
+        for attempt in range(2):
+            try:
+                pointer = os.stat(base + '.current')
+            except FileNotFoundError:
+                return None
+            identity = (pointer.st_ino, pointer.st_mtime_ns)
+            with self._lock:
+                cached = self._pointers.get(base)
+            try:
+                if cached is None or cached[0] != identity:
+                    with open(base + '.current') as f:
+                        cached = (identity, int(f.read().strip()))
+                    with self._lock:
+                        self._pointers[base] = cached
+                paths = _Paths(base, cached[1])
+                return cached[1], os.stat(paths.meta).st_size, os.stat(paths.tombstones).st_size
+            except FileNotFoundError:
+                # A compaction swapped generations after we read the pointer
+                with self._lock:
+                    self._pointers.pop(base, None)
+                if attempt:
+                    raise
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            views = list(self._views.values())
+        return {
+            'mapped_stores': len(views),
+            'rows': sum(len(view.ids) for view in views),
+            'dead_rows': sum(view.dead_rows for view in views),
+            'mapped_bytes': sum(view.matrix.nbytes for view in views)
+        }
+
+    # Writing
+
+    @contextmanager
+    def _writing(self, base: str):
+        """Serialize writers to one store across threads and processes"""
+        with self._lock:
+            thread_lock = self._write_locks.setdefault(base, threading.Lock())
+        with thread_lock:
+            os.makedirs(os.path.dirname(base), exist_ok=True)
+            with open(base + '.lock', 'a') as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def rebuild(self, user_id: int, source: str, rows: Iterable[Tuple[int, int, date, List[float]]]):
+        """Write a fresh generation from (id, owner, effective_date, embedding) rows"""
+        base = self._base(user_id, source)
+        prepared = _prepare_rows(rows)
+        with self._writing(base):
+            self._write_generation(base, *prepared)
+
+    def ensure(self, user_id: int, source: str, load_rows) -> MappedVectors:
+        """Return the user's view, building the store from load_rows() on first use"""
+        base = self._base(user_id, source)
+        view = self._view(base)
+        if view is not None:
+            return view
+        with self._writing(base):
+            # Another process may have built it while we waited for the lock
+            if self._view(base) is None:
+                self._write_generation(base, *_prepare_rows(load_rows()))
+        return self._view(base)
+
+    def apply(
+        self,
+        user_id: int,
+        source: str,
+        removed_ids: Iterable[int],
+        added_rows: Iterable[Tuple[int, int, date, List[float]]]
+    ):
+        """Tombstone the rows of removed_ids, then append (id, owner, effective_date, embedding) added_rows"""
+        base = self._base(user_id, source)
+        removed_ids = set(removed_ids)
+        ids, owners, ordinals, matrix = _prepare_rows(added_rows)
+
+        with self._writing(base):
+            signature = self._signature(base)
+            if signature is None:
+                return  # Not built yet; the first search builds it from the database
+            try:
+                view = MappedVectors.open(base, signature)
+            except OutdatedStoreError:
+                return  # The next search rebuilds it in the current format
+            if not view.alive.any() and len(ids) and matrix.shape[1] != view.dimensions:
+                # Nothing live to keep (e.g. built before any embedding existed):
+                # start a generation with the new rows' dimensions
+                self._write_generation(base, ids, owners, ordinals, matrix)
+                return
+            live = view.live_rows()
+            paths = _Paths(base, signature[0])
+
+            dead = [live[row_id] for row_id in removed_ids if row_id in live]
+            # Skip rows another process appended meanwhile, and other dimensions
+            keep = [
+                i for i, row_id in enumerate(ids.tolist())
+                if (row_id not in live or row_id in removed_ids)
+                and matrix.shape[1] == view.dimensions
+            ]
+
+            # Tombstones first: a concurrent reader may briefly miss a row, but
+            # never sees the old and the new version of one together
+            if dead:
+                with open(paths.tombstones, 'ab') as f:
+                    f.write(np.asarray(dead, dtype=TOMBSTONE_DTYPE).tobytes())
+            if keep:
+                rows = len(view.ids)
+                with open(paths.vectors, 'r+b') as f:
+                    # Drop a partial append left by a crashed writer so rows stay aligned
+                    f.truncate(HEADER_SIZE + rows * view.dimensions * 4)
+                    f.seek(0, os.SEEK_END)
+                    f.write(np.ascontiguousarray(matrix[keep], dtype='<f4').tobytes())
+                # The sidecar is written last: readers only see rows it describes
+                meta = np.empty(len(keep), dtype=META_DTYPE)
+                meta['id'] = ids[keep]
+                meta['owner'] = owners[keep]
+                meta['ordinal'] = ordinals[keep]
+                with open(paths.meta, 'ab') as f:
+                    f.write(meta.tobytes())
+
+            dead_rows = view.dead_rows + len(dead)
+            total_rows = len(view.ids) + len(keep)
+
+        if dead_rows >= self.compact_min_rows and dead_rows > self.compact_ratio * total_rows:
+            self._schedule_compaction(base)
+
+    def _write_generation(self, base: str, ids: np.ndarray, owners: np.ndarray, ordinals: np.ndarray, matrix: np.ndarray):
+        # Caller holds the write lock
+        signature = self._signature(base)
+        previous = signature[0] if signature else None
+        generation = (previous or 0) + 1
+        paths = _Paths(base, generation)
+
+        header = MAGIC + np.asarray([matrix.shape[1]], dtype='<u4').tobytes()
+        with open(paths.vectors, 'wb') as f:
+            f.write(header.ljust(HEADER_SIZE, b'\0'))
+            f.write(np.ascontiguousarray(matrix, dtype='<f4').tobytes())
+        meta = np.empty(len(ids), dtype=META_DTYPE)
+        meta['id'] = ids
+        meta['owner'] = owners
+        meta['ordinal'] = ordinals
+        meta.tofile(paths.meta)
+        open(paths.tombstones, 'wb').close()
+
+        # Publish atomically; open mappings of the old generation stay valid
+        with open(base + '.current.tmp', 'w') as f:
+            f.write(str(generation))
+        os.replace(base + '.current.tmp', base + '.current')
+
+        if previous is not None:
+            old = _Paths(base, previous)
+            for path in (old.vectors, old.meta, old.tombstones):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    # Compaction
+
+    def _schedule_compaction(self, base: str):
+        with self._lock:
+            if base in self._pending_compactions:
+                return
+            self._pending_compactions.add(base)
+            if self._compactor is None:
+                self._compactor = threading.Thread(target=self._run_compactions, name='vector-store-compactor', daemon=True)
+                self._compactor.start()
+        self._compactions.put(base)
+
+    def _run_compactions(self):
+        while True:
+            base = self._compactions.get()
+            try:
+                self.compact(base)
+            except Exception as e:
+                logger.warning(f"Vector store compaction of {base} failed: {str(e)}")
+            finally:
+                with self._lock:
+                    self._pending_compactions.discard(base)
+
+    def compact(self, base: str):
+        """Rewrite the live rows into a new generation, sorted by date"""
+        with self._writing(base):
+            signature = self._signature(base)
+            if signature is None:
+                return
+            view = MappedVectors.open(base, signature)
+            rows = np.flatnonzero(view.alive)
+            rows = rows[np.argsort(view.ordinals[rows], kind='stable')]
+            matrix = np.asarray(view.matrix[rows]) if len(rows) else np.empty((0, view.dimensions), dtype=np.float32)
+            self._write_generation(base, view.ids[rows], view.owners[rows], view.ordinals[rows], matrix)
+        logger.info(f"Compacted vector store {base}: {len(rows)} live of {len(view.ids)} rows")
+
+def _prepare_rows(rows: Iterable[Tuple[int, int, date, List[float]]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Arrays of ids, owners, date ordinals and L2-normalized float32 vectors, skipping unusable rows"""
+    ids, owners, ordinals, vectors = [], [], [], []
+    dimensions = None
+    for row_id, owner, effective_date, embedding in rows:
+        if embedding is None or len(embedding) == 0 or effective_date is None:
+            continue
+        if dimensions is None:
+            dimensions = len(embedding)
+        if len(embedding) != dimensions:
+            continue
+        ids.append(row_id)
+        owners.append(owner)
+        ordinals.append(effective_date.toordinal())
+        vectors.append(embedding)
+
+    matrix = np.asarray(vectors, dtype=np.float32).reshape(len(vectors), dimensions or 0)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return (
+        np.asarray(ids, dtype=np.int64), np.asarray(owners, dtype=np.int64),
+        np.asarray(ordinals, dtype=np.int32), matrix
+    )
+
+# Convenience instance for easy import
+vector_store = VectorFileStore()